@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import secrets
+import time
+from typing import Any, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from google.adk.events import Event
+from google.adk.runners import Runner
+from google.genai import types
+from pydantic import BaseModel
+
+from common.config import settings
+from common.context_window import context_window_from_settings
+from common.log import get_logger
+from common.metrics import metrics
+from common.model_selection import wrap_agent_models
+from common.profiling import (freeze_startup_heap, get_profiler, loop_monitor_stats,
+                              start_loop_monitor, stop_loop_monitor)
+from common.session_store import get_session_service
+from common.tracing import trace, traced_events
+from common.utils import extract_response_and_tools
+
+# Specialists that can be served on their own: agent name -> (module, attribute); the agent card is
+# the agent.json next to the module
+SPECIALISTS = {
+    "math_specialist": ("agents.math_agent.math_agent", "math_agent"),
+    "physics_specialist": ("agents.physics_agent.physics_agent", "physics_agent"),
+}
+APP_NAME = "Multi-Agent Tutoring Bot"
+logger = get_logger(__name__)
+
+class RunRequest(BaseModel):
+    input: str
+    session_id: str
+    user_id: str = ""
+
+class RecordRequest(BaseModel):
+    input: str
+    response: str
+    session_id: str
+    user_id: str = ""
+
+def create_agent_app(agent_name: str) -> FastAPI:
+    # Serves one specialist as an A2A endpoint: its agent card, /run, /record for turns the orchestrator
+    # answered itself, and /health with the load figures the orchestrator balances on
+    module = importlib.import_module(SPECIALISTS[agent_name][0])
+    agent = getattr(module, SPECIALISTS[agent_name][1])
+    if context_window := context_window_from_settings(): agent.before_model_callback = context_window.before_model_callback
+    wrap_agent_models([agent])
+    session_service = get_session_service()
+    runner = Runner(agent = agent, session_service = session_service, app_name = APP_NAME)
+    with open(os.path.join(os.path.dirname(module.__file__), "agent.json"), encoding = "utf-8") as f: card = json.load(f)
+    capacity = settings.AGENT_SERVER_MAX_CONCURRENCY
+    slots = asyncio.Semaphore(capacity)
+    load = {"in_flight": 0, "completed": 0, "failed": 0, "rejected": 0, "busy_seconds": 0.0}
+    started_at = time.time()
+    app = FastAPI(title = agent_name)
+
+    async def session_for(user_id: str, session_id: str):
+        session = await session_service.get_session(app_name = APP_NAME, user_id = user_id, session_id = session_id)
+        return session or await session_service.create_session(app_name = APP_NAME, user_id = user_id, session_id = session_id)
+
+    @app.get("/.well-known/agent.json")
+    async def agent_card() -> Dict[str, Any]: return card
+
+    def require_admin(x_admin_token: Optional[str]) -> None:
+        if not settings.ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+            raise HTTPException(status_code = 403, detail = "Admin token required")
+
+    @app.get("/health")
+    async def health() -> Dict[str, Any]:
+        return {"status": "healthy", "agent": agent_name, "capacity": capacity, **load, \
+            "load": load["in_flight"] / capacity, "uptime": time.time() - started_at, "event_loop": loop_monitor_stats()}
+
+    @app.get("/metrics", response_class = PlainTextResponse)
+    async def prometheus_metrics() -> str: return metrics.prometheus()
+
+    @app.post("/profile", response_class = PlainTextResponse)
+    async def profile(seconds: float = 10.0, all_threads: bool = False, \
+        x_admin_token: Optional[str] = Header(default = None)) -> PlainTextResponse:
+        # Same folded-stack capture as the app's /api/admin/profile, for this replica
+        require_admin(x_admin_token)
+        if not 0 < seconds <= settings.PROFILE_MAX_SECONDS:
+            raise HTTPException(status_code = 400, detail = f"seconds must be in (0, {settings.PROFILE_MAX_SECONDS:g}]")
+        capture = await get_profiler().capture(seconds, all_threads)
+        return PlainTextResponse(capture.folded(), headers = {"X-Profile-Samples": str(capture.samples)})
+
+    @app.post("/run")
+    async def run(request: RunRequest) -> Dict[str, Any]:
+        # Requests beyond capacity are turned away at once so the orchestrator can pick another replica
+        if slots.locked():
+            load["rejected"] += 1
+            raise HTTPException(status_code = 503, detail = f"{agent_name} is at capacity")
+        async with slots:
+            load["in_flight"] += 1
+            started = time.perf_counter()
+            try:
+                user_id = request.user_id or request.session_id
+                await session_for(user_id, request.session_id)
+                with trace("run", agent = agent_name) as current:
+                    response, tools_used = await extract_response_and_tools(traced_events(runner.run_async( \
+                        user_id = user_id, session_id = request.session_id, new_message = types.Content(role = "user", \
+                            parts = [types.Part.from_text(text = request.input)])), agent_name))
+                    timings = current.summary()
+                logger.info("Answered run", extra = {"trace_id": timings["trace_id"], "agent": agent_name, \
+                    "total_ms": timings["total_ms"], "stages": timings["stages"]})
+                load["completed"] += 1
+                return {"response": response, "tools_used": tools_used, "agent": agent_name, "session_id": request.session_id}
+            except Exception as e:
+                load["failed"] += 1
+                logger.exception("Agent run failed", extra = {"agent": agent_name})
+                raise HTTPException(status_code = 500, detail = f"{agent_name} failed: {str(e)}")
+            finally:
+                load["in_flight"] -= 1
+                load["busy_seconds"] += time.perf_counter() - started
+
+    @app.post("/record")
+    async def record(request: RecordRequest) -> Dict[str, Any]:
+        session = await session_for(request.user_id or request.session_id, request.session_id)
+        invocation_id = Event.new_id()
+        await session_service.append_event(session, Event(invocation_id = invocation_id, author = "user", \
+            content = types.Content(role = "user", parts = [types.Part.from_text(text = request.input)])))
+        await session_service.append_event(session, Event(invocation_id = invocation_id, author = agent_name, \
+            content = types.Content(role = "model", parts = [types.Part.from_text(text = request.response)])))
+        return {"status": "success", "session_id": request.session_id}
+
+    @app.on_event("startup")
+    async def start_monitors():
+        freeze_startup_heap()
+        start_loop_monitor()
+
+    @app.on_event("shutdown")
+    async def flush_sessions():
+        stop_loop_monitor()
+        if hasattr(session_service, "close"): await session_service.close()
+
+    return app
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Serve one specialist agent as its own A2A service")
+    parser.add_argument("agent", choices = sorted(SPECIALISTS))
+    parser.add_argument("--host", default = settings.HOST)
+    parser.add_argument("--port", type = int, required = True)
+    args = parser.parse_args()
+    # Every replica keeps its own session database; the orchestrator pins each student to one replica
+    root, extension = os.path.splitext(settings.SESSION_DB_PATH)
+    settings.SESSION_DB_PATH = f"{root}.{args.agent}.{args.port}{extension}"
+    logger.info("Serving agent", extra = {"agent": args.agent, "host": args.host, "port": args.port})
+    uvicorn.run(create_agent_app(args.agent), host = args.host, port = args.port)
+
+if __name__ == "__main__": main()
@@ -1,15 +1,33 @@
 import json
+import math
+from typing import List
 
 from google.adk.agents import LlmAgent
 from google.adk.tools import FunctionTool
 
-from tools.calculator import CalculatorTool
+from common.config import settings
+from tools.calculator import MAX_BATCH_SIZE, CalculatorTool, EvaluationPool
 from tools.history import (add_context, get_context, get_progress,
                            update_progress)
 
-calculator = CalculatorTool()
+calculator = CalculatorTool(max_expression_length = settings.CALCULATOR_MAX_EXPRESSION_LENGTH, \
+    max_result_bits = int(settings.CALCULATOR_MAX_RESULT_DIGITS * math.log2(10)), \
+        max_operations = settings.CALCULATOR_MAX_OPERATIONS, max_depth = settings.CALCULATOR_MAX_DEPTH, \
+            inline_work = settings.CALCULATOR_INLINE_WORK, timeout = settings.CALCULATOR_TIMEOUT, \
+                pool = EvaluationPool(settings.CALCULATOR_WORKERS))
 
-def calculate_expression(expression: str) -> dict: return calculator.calculate(expression)
+async def calculate_expression(expression: str) -> dict: return await calculator.calculate_async(expression)
+
+async def calculate_expressions(expressions: List[str]) -> dict:
+    return await calculator.calculate_steps_async(expressions)
+
+async def tabulate_expression(expression: str, variable: str, start: float, stop: float, count: int) -> dict:
+    if not 0 < count <= MAX_BATCH_SIZE:
+        return {"status": "error", "error": f"count must be between 1 and {MAX_BATCH_SIZE}", "expression": expression}
+    values = [start + (stop - start) * i / (count - 1) for i in range(count)] if count > 1 else [start]
+    result = await calculator.calculate_batch_async(expression, {variable: values})
+    if result["status"] == "success": result["inputs"] = values
+    return result
 
 math_agent = LlmAgent(
     name = "math_specialist",
@@ -19,21 +37,22 @@ math_agent = LlmAgent(
     Your capabilities:
     1.  Solve Mathematical Problems: Break down problems step-by-step, showing your reasoning clearly.
     2.  Explain Mathematical Concepts: When asked about a concept (e.g., "What is algebra?", "Explain derivatives"), provide clear, concise, and accurate explanations. Use examples to illustrate complex ideas. You do NOT have a specific tool for this; use your own knowledge.
-    3.  Use the Calculator Tool: For any explicit numerical calculations, arithmetic operations, or evaluation of mathematical expressions (e.g., "What is 5 factorial?", "Calculate 15 * (4+3)/sqrt(25)", "Evaluate 2^10"), you MUST use the `calculate_expression` tool. Clearly state the expression you are passing to the tool. If a student asks to solve an algebraic equation like "solve 2x + 5 = 11", first explain the steps to isolate 'x', then use the `calculate_expression` tool for any resulting arithmetic (e.g., `calculate_expression("(11-5)/2")`).
-    4.  Guidance and Encouragement: Provide educational guidance and maintain a positive, encouraging tone.
-    5.  Clarity: Ensure your explanations and solutions are easy to understand for students at various levels.
+    3.  Use the Calculator Tool: For any explicit numerical calculations, arithmetic operations, or evaluation of mathematical expressions (e.g., "What is 5 factorial?", "Calculate 15 * (4+3)/sqrt(25)", "Evaluate 2^10"), you MUST use the `calculate_expressions` tool. It takes a list of steps of the form "name = expression" and evaluates them in order; a step can use the names of earlier steps. Plan every calculation a solution needs and pass all of them in ONE call instead of calling the tool once per step. For example, for "solve x^2 - 5x + 6 = 0" call `calculate_expressions(["d = (-5)^2 - 4*1*6", "x1 = (5 + sqrt(d))/2", "x2 = (5 - sqrt(d))/2"])`. Clearly state the steps you are passing to the tool.
+    4.  Tabulate Values: When a student wants a table of values or points to plot (e.g., "make a table of sin(x)^2 for x from 0 to 3"), use the `tabulate_expression` tool once with the expression, the variable name, the range and the number of points, instead of calculating every point separately.
+    5.  Guidance and Encouragement: Provide educational guidance and maintain a positive, encouraging tone.
+    6.  Clarity: Ensure your explanations and solutions are easy to understand for students at various levels.
     
     Interaction Flow:
     -   When a student asks a question, first understand if it's a problem to solve, a concept to explain, or requires a calculation.
     -   If it's a conceptual question (e.g., "help me understand calculus", "what are polynomials?"), explain it directly using your knowledge. Do NOT look for a tool for this.
-    -   If it requires calculation, state the calculation and use the `calculate_expression` tool.
+    -   If it requires calculation, state the calculations and make a single `calculate_expressions` call covering all of them.
     -   Always show your work and reasoning.
     -   If a calculation tool returns an error, explain the error to the student and ask for clarification if needed (e.g., "The calculator tool reported an error: [error message]. Could you please check the expression?").
     -   Offer to help with related topics or provide further examples.
 
     """,
     tools = [
-        FunctionTool(calculate_expression), FunctionTool(add_context), \
+        FunctionTool(calculate_expressions), FunctionTool(tabulate_expression), FunctionTool(add_context), \
             FunctionTool(get_context), FunctionTool(update_progress), FunctionTool(get_progress)
     ]
 )
\ No newline at end of file
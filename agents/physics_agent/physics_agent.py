@@ -1,16 +1,22 @@
+from typing import List
+
 from google.adk.agents import LlmAgent
 from google.adk.tools import FunctionTool
 
 from tools.constants import UniversalConstantsTool
+from tools.formulas import FormulaEngine
 from tools.history import (add_context, get_context, get_progress,
                            update_progress)
 
 physics_tool = UniversalConstantsTool()
+formula_engine = FormulaEngine()
 
 def lookup_constant(const_name: str) -> dict: return physics_tool.lookup_constant(const_name) 
 def lookup_formula(formula_name: str) -> dict: return physics_tool.lookup_formula(formula_name)
 def list_constants() -> dict: return physics_tool.list_constants()
 def list_formulas() -> dict: return physics_tool.list_formulas()
+async def solve_formula(formula_name: str, solve_for: str, knowns: List[str], result_unit: str) -> dict:
+    return await formula_engine.solve(formula_name, solve_for, knowns, result_unit)
 
 physics_agent = LlmAgent(
     name = "physics_specialist",
@@ -23,8 +29,9 @@ physics_agent = LlmAgent(
     1.  Explain Physics Concepts and Laws: When a student asks for an explanation of a physics concept, law, or theory (e.g., "What is Newton's second law?", "Explain quantum entanglement", "Tell me about thermodynamics"), provide clear, accurate, and comprehensive explanations. Use analogies and real-world examples where helpful. You do NOT have a specific tool for this; use your own knowledge.
     2.  Solve Physics Problems: Guide students step-by-step through solving physics problems. Clearly outline the principles, equations, and steps involved.
     3.  Use Lookup Tools:
-        * If you need the value of a specific physical constant for an explanation or calculation (e.g., "speed of light", "gravitational constant"), use the `lookup_physics_constant` tool.
+        * If you need the value of a specific physical constant for an explanation or calculation (e.g., "speed of light", "gravitational constant"), use the `lookup_physics_constant` tool. It covers the full CODATA table and accepts full names ("Bohr radius"), common symbols ("c", "G", "ħ") and aliases ("h-bar", "avogadro number").
         * If a student asks for a specific formula or you need it for a problem (e.g., "What's the formula for kinetic energy?", "Ohm's law"), use the `lookup_physics_formula` tool.
+        * To compute a numeric answer from a known formula, use the `solve_formula` tool instead of doing the arithmetic yourself. Pass the formula name, the variable to solve for, the known values as "name = value unit" strings (e.g. ["m = 2 kg", "v = 36 km/h"]) and the unit wanted for the result ("" for SI). Use `lookup_formula` first if you are unsure of the variable names; constants such as g, R and G are filled in automatically when omitted.
         * If a student asks to "list constants" or "list formulas", use the `list_physics_constants` or `list_physics_formulas` tools respectively.
     4.  Connect Theory to Applications: Relate physics principles to practical, real-world applications to enhance understanding and interest.
     5.  Encourage Scientific Thinking: Foster curiosity and critical thinking.
@@ -38,6 +45,6 @@ physics_agent = LlmAgent(
     -   Maintain a supportive and enthusiastic tone.
     """,
     tools = [FunctionTool(lookup_constant), FunctionTool(lookup_formula), \
-        FunctionTool(list_constants), FunctionTool(list_formulas), \
+        FunctionTool(list_constants), FunctionTool(list_formulas), FunctionTool(solve_formula), \
             FunctionTool(get_context), FunctionTool(update_progress), FunctionTool(get_progress)]
 )
@@ -0,0 +1,85 @@
+import re
+from typing import Any, Dict, Optional
+
+from tools.calculator import CalculatorTool
+from tools.constants import UniversalConstantsTool
+
+LOCAL_RESPONDER = "local_responder"
+DIRECT_ANSWER_MODES = ("off", "strict", "relaxed")
+
+# Lead-ins that only ask for a value; anything else ("explain", "why", "solve") goes to the models
+CALCULATION_PATTERN = re.compile(r"^(?:(?:please\s+)?(?P<lead>calculate|compute|evaluate|what\s+is|what's|whats)\s*:?\s+)?" \
+    r"(?P<expr>[\d\s.+\-*/^%(),a-z_]+?)\s*=?\s*[?!.]*$", re.IGNORECASE)
+EXPLICIT_CALCULATION = re.compile(r"calculate|compute|evaluate", re.IGNORECASE)
+EXPRESSION_OPERATOR = re.compile(r"\d\s*[+\-*/^%]|[a-z_]+\s*\(|\)\s*[+\-*/^%]", re.IGNORECASE)
+ARITHMETIC_OPERATOR = re.compile(r"[+\-*/^%]")
+# "2023-2024" or "3-2" is a date range or a score more often than a subtraction
+NUMBER_RANGE = re.compile(r"\d+\s*-\s*\d+")
+TRIG_FUNCTION = re.compile(r"\ba?(?:sin|cos|tan)\s*\(", re.IGNORECASE)
+CONSTANT_VALUE_PATTERN = re.compile(r"^(?:(?:what\s+is|what's|whats|give\s+me|tell\s+me|find)\s+)?" \
+    r"(?:the\s+)?(?:numerical\s+|numeric\s+)?value\s+of\s+(?:the\s+)?(?P<name>.+?)\s*[?!.]*$|" \
+        r"^(?:the\s+)?(?P<suffixed>.+?)\s+value\s*[?!.]*$", re.IGNORECASE)
+CONSTANT_QUESTION_PATTERN = re.compile(r"^(?:(?:what\s+is|what's|whats)\s+)?(?:the\s+)?(?P<name>.+?)\s*[?!.]*$", \
+    re.IGNORECASE)
+CONSTANT_CUE = re.compile(r"\bconstants?\b", re.IGNORECASE)
+
+class DirectAnswerer:
+    # Answers queries that are nothing but an arithmetic expression or a request for a constant's value
+    # without any model call. "strict" only takes unambiguous phrasings ("12*(4+3)/sqrt(25)", "calculate 7*8",
+    # "value of planck constant"), never a bare "2023-2024"; "relaxed" also takes "what is <constant>" or a
+    # bare constant, but only when it is a symbol ("g", "h") or says "constant": "what is gravity" asks for
+    # an explanation, not 9.80665 m/s^2
+    def __init__(self, calculator: CalculatorTool, constants: UniversalConstantsTool, mode: str = "strict") -> None:
+        if mode not in DIRECT_ANSWER_MODES: raise ValueError(f"Unknown direct answer mode: {mode}")
+        self.calculator = calculator
+        self.constants = constants
+        self.mode = mode
+
+    @staticmethod
+    def format_number(value: Any) -> str:
+        return str(value) if isinstance(value, int) else f"{value:.12g}"
+
+    async def answer(self, query: str) -> Optional[Dict[str, Any]]:
+        # Returns {"subject", "response", "tools_used"} or None when the query needs a tutor
+        if self.mode == "off": return None
+        query = re.sub(r"\s+", " ", query).strip()
+        if not query or len(query) > self.calculator.max_expression_length: return None
+        return await self.answer_calculation(query) or self.answer_constant(query)
+
+    async def answer_calculation(self, query: str) -> Optional[Dict[str, Any]]:
+        match = CALCULATION_PATTERN.match(query)
+        if not match or not EXPRESSION_OPERATOR.search(expr := match.group("expr").strip()): return None
+        if not self.is_calculation(expr, match.group("lead")): return None
+        result = await self.calculator.calculate_async(expr)
+        # Failures (unknown names, syntax, cost limits) are left for the math tutor to explain
+        if result["status"] != "success" or isinstance(result["result"], complex): return None
+        # A student thinking in degrees must see that sin(30) was read as 30 radians
+        unit = " (angles in radians)" if TRIG_FUNCTION.search(expr) else ""
+        return {"subject": "math", "response": f"{expr} = {self.format_number(result['result'])}{unit}", \
+            "tools_used": ["calculate_expression"]}
+
+    @staticmethod
+    def is_calculation(expr: str, lead: Optional[str]) -> bool:
+        # "calculate ..." always asks for arithmetic. Otherwise a number range stays with the tutors, and without
+        # any lead-in only a parenthesised or multi-operator expression is taken as one
+        if lead and EXPLICIT_CALCULATION.fullmatch(lead): return True
+        if NUMBER_RANGE.fullmatch(expr): return False
+        return bool(lead) or "(" in expr or len(ARITHMETIC_OPERATOR.findall(expr)) > 1
+
+    def answer_constant(self, query: str) -> Optional[Dict[str, Any]]:
+        match = CONSTANT_VALUE_PATTERN.match(query)
+        name = (match.group("name") or match.group("suffixed")) if match else None
+        if name is None and self.mode == "relaxed":
+            candidate = CONSTANT_QUESTION_PATTERN.match(query).group("name")
+            if self.constants.is_symbol(candidate) or CONSTANT_CUE.search(candidate): name = candidate
+        # "e" and "pi" are the calculator's numbers, not the elementary charge
+        if not name or name.lower() in self.calculator.constants: return None
+        key = self.constants.resolve_constant(name) or self.constants.resolve_constant(re.sub(r"'s\b", "", name))
+        if key is None: return None
+        data = self.constants.constants[key]
+        symbol = f" ({data['symbol']})" if data["symbol"] else ""
+        unit = f" {data['unit']}" if data["unit"] else ""
+        precision = "exact" if data["uncertainty"] == 0 else \
+            f"standard uncertainty {self.format_number(data['uncertainty'])}{unit}"
+        return {"subject": "physics", "response": f"{data['description']}{symbol}: " \
+            f"{self.format_number(data['value'])}{unit} (CODATA 2022, {precision}).", "tools_used": ["lookup_constant"]}
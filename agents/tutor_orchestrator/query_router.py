@@ -0,0 +1,136 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+SEED_QUERIES: Dict[str, List[str]] = {
+    "math": [
+        "solve 2x + 5 = 11", "help me solve 3x - 7 = 2x + 4", "calculate 15 * (4 + 3) / sqrt(25)",
+        "what is 5 factorial", "evaluate 2^10", "what is the derivative of x^2 sin(x)",
+        "integrate 3x^2 dx", "find the integral of e^x from 0 to 1", "simplify (x^2 - 9)/(x - 3)",
+        "factor x^2 + 5x + 6", "what is the square root of 144", "solve the quadratic equation x^2 - 4x + 4 = 0",
+        "how do I find the area of a circle with radius 3", "what is a polynomial", "explain derivatives",
+        "help me understand calculus", "what is the pythagorean theorem", "find the slope of the line y = 3x + 2",
+        "what is 12 percent of 250", "convert 0.75 to a fraction", "what is the log base 2 of 64",
+        "solve the system of equations x + y = 10 and x - y = 2", "what is a prime number",
+        "find the lcm of 12 and 18", "what is the gcd of 48 and 36", "explain matrix multiplication",
+        "what is the determinant of a 2x2 matrix", "how do limits work", "what is the sum of an arithmetic series",
+        "calculate the mean and median of 3 5 7 9", "what is the probability of rolling two sixes",
+        "explain the quadratic formula", "what is algebra", "expand (a + b)^3", "what is sin(pi/6)",
+        "how many degrees are in a triangle", "solve for y in 4y + 8 = 20", "what is 7 times 8",
+        "evaluate log10(1000)", "what is the volume of a sphere of radius 2", "explain trigonometric identities",
+        "how do i compute the variance of a dataset", "what is a function's domain and range",
+    ],
+    "physics": [
+        "what is newton's second law", "explain quantum entanglement", "tell me about thermodynamics",
+        "what is the speed of light", "explain black holes", "what is the formula for kinetic energy",
+        "what is ohm's law", "how does gravity work", "what is the gravitational constant",
+        "a car accelerates at 3 m/s^2 for 5 seconds what is its velocity", "what is momentum",
+        "explain the photoelectric effect", "what is planck's constant", "how do electromagnetic waves propagate",
+        "what is the work energy theorem", "calculate the force on a 10 kg mass accelerating at 2 m/s^2",
+        "what is potential energy", "explain the ideal gas law", "what is entropy",
+        "how does a magnet create a magnetic field", "what is the wave speed formula", "explain special relativity",
+        "what is the boltzmann constant", "what is electric charge", "how does friction affect motion",
+        "what is torque", "explain projectile motion", "what is the mass of an electron",
+        "how do lenses refract light", "what is nuclear fission", "explain conservation of energy",
+        "what is power in physics", "what is the avogadro number", "how does current flow in a circuit",
+        "what is voltage and resistance", "explain centripetal force", "what is a newton of force",
+        "what is the half life of a radioactive sample", "explain the doppler effect", "what is inertia",
+        "how fast does an object fall in free fall", "what is acceleration due to gravity",
+        "a 5 kg block is pushed with a force of 20 n find its acceleration",
+        "a ball is dropped from 20 m how long until it hits the ground",
+        "a 2 kg object moves at 3 m/s what is its kinetic energy",
+        "what current flows through a 10 ohm resistor at 5 volts",
+        "find the wavelength of a 440 hz sound wave", "how much work is done lifting 10 kg by 2 meters",
+    ],
+    "general": [
+        "any tips for studying", "how can i stay motivated", "how do i prepare for exams",
+        "hello", "hi there", "thanks for the help", "how does this tutoring system work",
+        "what can you help me with", "i feel stressed about school", "how should i take notes",
+        "how do i manage my time better", "what is the best way to learn", "can you help me focus",
+        "good morning", "who are you", "how do i improve my memory", "tips for group study",
+        "how many hours should i study a day", "i keep procrastinating what should i do",
+        "how can i get better grades", "what should i study first", "how do i ask good questions in class",
+        "can you recommend study techniques", "how do i avoid burnout", "what is spaced repetition",
+        "goodbye", "thank you", "how do i stay organized", "i am bored", "how do flashcards help",
+        "what is active recall", "how do i make a study schedule", "tell me a fun fact",
+    ],
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z]+|\d+(?:\.\d+)?|[+\-*/^=()]")
+
+class QueryRouter:
+    def __init__(self, examples: Optional[Dict[str, List[str]]] = None, alpha: float = 0.5) -> None:
+        self.alpha = alpha
+        self.labels: List[str] = []
+        self.feature_counts: Dict[str, Counter] = {}
+        self.total_counts: Dict[str, int] = {}
+        self.doc_counts: Dict[str, int] = {}
+        self.vocabulary: set = set()
+        self.temperature = 1.0
+        self.train(examples or SEED_QUERIES)
+
+    @staticmethod
+    def features(text: str) -> List[str]:
+        tokens = ["<num>" if tok[0].isdigit() else tok for tok in TOKEN_PATTERN.findall(text.lower())]
+        bigrams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return tokens + bigrams
+
+    def train(self, examples: Dict[str, List[str]]) -> None:
+        self.labels = list(examples.keys())
+        self.feature_counts = {label: Counter() for label in self.labels}
+        self.doc_counts = {label: len(texts) for label, texts in examples.items()}
+        for label, texts in examples.items():
+            for text in texts: self.feature_counts[label].update(self.features(text))
+        self.total_counts = {label: sum(counts.values()) for label, counts in self.feature_counts.items()}
+        self.vocabulary = set().union(*self.feature_counts.values())
+        self.temperature = self.calibrate(examples)
+
+    def log_scores(self, feats: List[str], exclude: Optional[Tuple[str, Counter]] = None) -> Dict[str, float]:
+        # Multinomial naive Bayes; `exclude` removes one training document for leave-one-out calibration
+        total_docs = sum(self.doc_counts.values()) - (1 if exclude else 0)
+        vocab_size = len(self.vocabulary)
+        scores = {}
+        for label in self.labels:
+            counts, total, docs = self.feature_counts[label], self.total_counts[label], self.doc_counts[label]
+            held_out = exclude[1] if exclude and exclude[0] == label else None
+            if held_out is not None: total, docs = total - sum(held_out.values()), docs - 1
+            score = math.log((docs + 1) / (total_docs + len(self.labels)))
+            denominator = math.log(total + self.alpha * vocab_size)
+            for feat in feats:
+                if feat not in self.vocabulary: continue
+                count = counts[feat] - (held_out[feat] if held_out is not None else 0)
+                score += math.log(count + self.alpha) - denominator
+            scores[label] = score
+        return scores
+
+    @staticmethod
+    def softmax(scores: Dict[str, float], temperature: float) -> Dict[str, float]:
+        peak = max(scores.values())
+        weights = {label: math.exp((score - peak) / temperature) for label, score in scores.items()}
+        norm = sum(weights.values())
+        return {label: weight / norm for label, weight in weights.items()}
+
+    def calibrate(self, examples: Dict[str, List[str]]) -> float:
+        # Temperature scaling fitted on leave-one-out posteriors: raw naive Bayes is overconfident
+        held_out_scores = []
+        for label, texts in examples.items():
+            for text in texts:
+                feats = self.features(text)
+                held_out_scores.append((label, self.log_scores(feats, exclude = (label, Counter(feats)))))
+        best_temperature, best_nll = 1.0, float("inf")
+        for temperature in [0.5 + 0.25 * step for step in range(39)]:
+            nll = -sum(math.log(max(self.softmax(scores, temperature)[label], 1e-12)) \
+                for label, scores in held_out_scores)
+            if nll < best_nll: best_temperature, best_nll = temperature, nll
+        return best_temperature
+
+    def predict_proba(self, query: str) -> Dict[str, float]:
+        return self.softmax(self.log_scores(self.features(query)), self.temperature)
+
+    def route(self, query: str) -> Tuple[str, float]:
+        probabilities = self.predict_proba(query)
+        subject = max(probabilities, key = probabilities.get)
+        return subject, probabilities[subject]
+
+query_router = QueryRouter()
@@ -0,0 +1,54 @@
+import re
+from typing import List, NamedTuple
+
+from agents.tutor_orchestrator.query_router import QueryRouter
+
+QUERY_SPLITTER = "query_splitter"
+SPECIALIST_SUBJECTS = ("math", "physics")
+# Where one request ends and the next begins: sentence ends, semicolons, "and also"/"also", and a bare "and"
+# only when a new question or instruction follows it ("... and calculate 5*5"). "Then" is not a boundary: what
+# follows it is the next step of the same problem
+CLAUSE_BOUNDARY = re.compile(r"(?<=[?.!])\s+|\s*;\s*|,?\s+(?:and also|also)\s+|,?\s+and\s+(?=(?:what|how|why|" \
+    r"when|which|explain|calculate|compute|solve|find|tell|describe|derive|give|show|evaluate|simplify|integrate|" \
+    r"differentiate|define|convert|prove)\b)", re.IGNORECASE)
+LEADING_CONNECTOR = re.compile(r"^(?:and|also|plus)\b[\s,]*", re.IGNORECASE)
+# A later clause that points back at an earlier one ("how high does it go", "then solve for the time") cannot be
+# answered by a specialist that never sees the earlier clause
+REFERS_BACK = re.compile(r"^then\b|\b(?:it|its|that|this|these|those|them|the (?:result|answer|same)|for the time)\b", \
+    re.IGNORECASE)
+# Words that ask for something without saying what: a clause made only of these ("and explain why") has no
+# content of its own
+FILLER_WORDS = {"what", "how", "why", "when", "which", "explain", "calculate", "compute", "solve", "find", "tell",
+    "describe", "derive", "give", "show", "evaluate", "simplify", "integrate", "differentiate", "define", "convert",
+    "prove", "me", "us", "the", "a", "an", "is", "are", "does", "do", "please", "too", "again", "as", "well", "so",
+    "now", "also", "steps", "working", "answer", "more", "about"}
+
+class SubQuestion(NamedTuple):
+    subject: str
+    query: str
+
+def split_clauses(query: str) -> List[str]:
+    clauses = [LEADING_CONNECTOR.sub("", clause.strip(" ,.")) for clause in CLAUSE_BOUNDARY.split(query) if clause]
+    return [clause for clause in clauses if clause]
+
+def depends_on_earlier(clause: str) -> bool:
+    return bool(REFERS_BACK.search(clause)) or not set(re.findall(r"[\w^*/+=-]+", clause.lower())) - FILLER_WORDS
+
+def split_query(query: str, router: QueryRouter, min_share: float = 0.75) -> List[SubQuestion]:
+    # Splits a compound query into one sub-question per specialist subject, keeping the clauses' order.
+    # Every clause must lean clearly to math or physics (at least `min_share` of the two specialists'
+    # probability, and more likely than general), stand on its own, and both subjects must appear;
+    # otherwise nothing is split and the query takes the normal single-subject route
+    clauses, subjects = split_clauses(query), []
+    if len(clauses) < 2 or any(depends_on_earlier(clause) for clause in clauses[1:]): return []
+    for clause in clauses:
+        probabilities = router.predict_proba(clause)
+        subject = max(SPECIALIST_SUBJECTS, key = lambda name: probabilities.get(name, 0.0))
+        specialist_mass = sum(probabilities.get(name, 0.0) for name in SPECIALIST_SUBJECTS)
+        if not specialist_mass or probabilities[subject] / specialist_mass < min_share or \
+            probabilities.get("general", 0.0) >= probabilities[subject]: return []
+        subjects.append(subject)
+    if len(set(subjects)) < 2: return []
+    grouped = {subject: [] for subject in subjects}
+    for subject, clause in zip(subjects, clauses): grouped[subject].append(clause)
+    return [SubQuestion(subject, ". ".join(parts)) for subject, parts in grouped.items()]
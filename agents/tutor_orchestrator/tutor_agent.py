@@ -1,6 +1,6 @@
 import asyncio
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from google.adk.agents import LlmAgent
 from google.adk.runners import InMemoryRunner, Runner
@@ -8,6 +8,11 @@ from google.adk.sessions import InMemorySessionService
 from google.adk.tools import FunctionTool
 from google.genai import types
 
+from agents.tutor_orchestrator.query_router import query_router
+from common.config import settings
+from common.log import get_logger
+from common.session_store import get_session_service
+from common.tracing import traced_events
 from tools.history import (add_context, get_context, get_progress,
                            update_progress)
 
@@ -31,39 +36,54 @@ Query: "Tell me about black holes and also calculate 5*5"
 Response: physics
 """
 
+logger = get_logger(__name__)
 classifier_agent = LlmAgent(name = "internal_query_classifier", \
     model = "gemini-2.5-flash-latest", instruction = QUERY_CLASSIFICATION_INSTRUCTION, tools = [])
-classifier_session_service = InMemorySessionService()
+classifier_session_service = get_session_service()
 classifier_runner = Runner(agent = classifier_agent, \
     session_service = classifier_session_service, app_name = "Multi-Agent Tutoring Bot")
-classifier_sessions: Dict[str, str] = {}
+# Stateless mode gives every classification a throwaway session, so each call sends only the fixed
+# few-shot instruction plus the query and costs the same no matter how long the server has been up
+stateless_classifier_session_service = InMemorySessionService()
+stateless_classifier_runner = Runner(agent = classifier_agent, \
+    session_service = stateless_classifier_session_service, app_name = "Multi-Agent Tutoring Bot")
 
-async def run_classification_agent(query: str, user_id: str = "classifier_user") -> str:
-    session_id: str
-    if user_id not in classifier_sessions:
-        session = await classifier_session_service.create_session(user_id = user_id, app_name = "Multi-Agent Tutoring Bot")
-        classifier_sessions[user_id] = session.id; session_id = session.id
-    else: session_id = classifier_sessions[user_id]
+async def run_classification_agent(query: str, user_id: str = "classifier_user", \
+    stateless: Optional[bool] = None) -> str:
+    if stateless is None: stateless = settings.CLASSIFIER_STATELESS
+    if stateless:
+        session = await stateless_classifier_session_service.create_session(user_id = user_id, \
+            app_name = "Multi-Agent Tutoring Bot")
+        try: return await classify_in_session(stateless_classifier_runner, query, user_id, session.id)
+        finally: await stateless_classifier_session_service.delete_session(app_name = "Multi-Agent Tutoring Bot", \
+            user_id = user_id, session_id = session.id)
+    session_id = f"{user_id}_{classifier_agent.name}"
+    if await classifier_session_service.get_session(app_name = "Multi-Agent Tutoring Bot", \
+        user_id = user_id, session_id = session_id) is None:
+        await classifier_session_service.create_session(user_id = user_id, \
+            app_name = "Multi-Agent Tutoring Bot", session_id = session_id)
+    return await classify_in_session(classifier_runner, query, user_id, session_id)
+
+async def classify_in_session(runner: Runner, query: str, user_id: str, session_id: str) -> str:
     response = ""
-    async for event in classifier_runner.run_async(user_id = user_id, \
+    async for event in traced_events(runner.run_async(user_id = user_id, \
         session_id = session_id, new_message = types.Content(
-                role = 'user', parts = [types.Part.from_text(text = query)])):
+                role = 'user', parts = [types.Part.from_text(text = query)])), classifier_agent.name):
         if getattr(event, "content", None) and event.content.parts:
             for part in event.content.parts:
                 if hasattr(part, 'text') and part.text: response += part.text
     classified_subject = response.strip().lower()
     if classified_subject not in ["math", "physics", "general"]:
-        print(f"Warning: Classifier returned unexpected category: '{classified_subject}' for query: '{query}'. Defaulting to 'general'.")
+        logger.warning("Classifier returned an unexpected category; defaulting to general", \
+            extra = {"category": classified_subject, "query": query})
         return "general"
     return classified_subject
 
 async def classify_student_query(query: str) -> dict:
     try: subject = await run_classification_agent(query)
     except RuntimeError as e:
-        print(f"Error running classification agent asynchronously: {e}. Falling back to keyword classification.")
-        if any(kw in query.lower() for kw in ['math', 'solve', 'equation', 'calculate']): subject = "math"
-        elif any(kw in query.lower() for kw in ['physics', 'force', 'energy', 'law']): subject = "physics"
-        else: subject = "general"
+        logger.warning("Classification agent failed; falling back to the local query router", extra = {"error": str(e)})
+        subject, _ = query_router.route(query)
     return {"subject": subject, "confidence": 1.0}
 
 def tutoring_guidance(user_query_for_context: str) -> dict:
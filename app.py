@@ -1,16 +1,30 @@
-from typing import Optional
+import json
+import math
+import secrets
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 
+from agents.math_agent.math_agent import calculator
+from common.a2a_client import get_a2a_client
+from common.admission import AdmissionQueue, AdmissionRejected, model_limiter_stats
 from common.config import settings
+from common.log import get_logger
+from common.metrics import metrics
+from common.model_selection import model_health_stats
+from common.profiling import (Capture, freeze_startup_heap, get_profiler, loop_monitor_stats,
+                              start_loop_monitor, stop_loop_monitor)
+from common.session_store import get_session_service
 from main import MultiAgentTutoringSystem
 
+logger = get_logger(__name__)
 app = FastAPI(
     title = "Multi-Agent Tutoring Bot",
     description = "Interactive tutoring system with specialized math and physics agents",
@@ -22,22 +36,32 @@ app.add_middleware(CORSMiddleware, allow_origins = settings.CORS_ORIGINS, \
 
 app.mount("/static", StaticFiles(directory = "web_interface/static"), name = "static")
 templates = Jinja2Templates(directory = "web_interface/templates")
-tutoring_system = MultiAgentTutoringSystem()
 
 if not settings.GEMINI_API_KEY:
-    print("FATAL ERROR: Gemini API key not found in environment variables")
+    logger.critical("Gemini API key not found in environment variables")
     class DummyTutor:
-        async def process_student_query(self, query: str, student_id: str):
+        async def process_student_query(self, query: str, student_id: str, use_cache: bool = True, \
+            include_timings: bool = False):
             return {
                 "response": "System is not configured: GEMINI_API_KEY is missing.",
                 "agent": "system_error", "subject": "error", "tools_used": [], "student_id": student_id
             }
+        async def process_student_query_stream(self, query: str, student_id: str, use_cache: bool = True, \
+            include_timings: bool = False):
+            result = await self.process_student_query(query, student_id)
+            yield {"type": "route", "subject": result["subject"], "agent": result["agent"], "routed_by": "system"}
+            yield {"type": "text", "text": result["response"]}
+            yield {"type": "done", **result}
     tutoring_system = DummyTutor()
 else: tutoring_system = MultiAgentTutoringSystem()
 
 class ChatMessage(BaseModel):
     message: str
     student_id: Optional[str] = "web_user"
+    use_cache: Optional[bool] = True
+    priority: Optional[str] = "normal"
+    include_timings: Optional[bool] = False
+    profile: Optional[bool] = False
 
 class ChatResponse(BaseModel):
     response: str
@@ -45,27 +69,103 @@ class ChatResponse(BaseModel):
     subject: str
     tools_used: list[str]
     student_id: str
+    context_tokens_saved: Optional[int] = None
+    bypassed_models: bool = False
+    parts: Optional[list[dict]] = None
+    timings: Optional[dict] = None
+    profile: Optional[str] = None
     error: Optional[str] = None
 
+def is_admin(x_admin_token: Optional[str]) -> bool:
+    return bool(settings.ADMIN_TOKEN and x_admin_token and secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN))
+
+def require_admin(x_admin_token: Optional[str] = Header(default = None)):
+    if not is_admin(x_admin_token): raise HTTPException(status_code = 403, detail = "Admin token required")
+
 @app.get("/", response_class = HTMLResponse)
 async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+# Bounds how many chats are answered at once; the rest queue by priority or get a fast 429
+admission = AdmissionQueue(settings.ADMISSION_MAX_CONCURRENT, settings.ADMISSION_MAX_QUEUE, settings.ADMISSION_QUEUE_TIMEOUT)
+
+def request_priority(chat_message: ChatMessage, x_admin_token: Optional[str]) -> str:
+    # Anyone may ask for "low"; "high" needs the admin token, otherwise it counts as "normal"
+    if chat_message.priority == "low": return "low"
+    if chat_message.priority == "high" and is_admin(x_admin_token): return "high"
+    return "normal"
+
+@contextmanager
+def request_profile(chat_message: ChatMessage, x_admin_token: Optional[str]) -> Iterator[Optional[Capture]]:
+    # Samples the chat's own work on the event loop when an admin flags it with "profile"; otherwise nothing runs
+    if not (chat_message.profile and is_admin(x_admin_token)):
+        yield None
+        return
+    with get_profiler().request() as capture: yield capture
+
+def too_many_requests(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code = 429, detail = str(e), headers = {"Retry-After": str(math.ceil(e.retry_after))})
+
 @app.post("/api/chat", response_model = ChatResponse)
-async def chat_endpoint(chat_message: ChatMessage):
+async def chat_endpoint(chat_message: ChatMessage, x_admin_token: Optional[str] = Header(default = None)):
     try:
-        result = await tutoring_system.process_student_query(query = chat_message.message, \
-            student_id = chat_message.student_id)
+        async with admission.admit(request_priority(chat_message, x_admin_token)):
+            with request_profile(chat_message, x_admin_token) as capture:
+                result = await tutoring_system.process_student_query(query = chat_message.message, \
+                    student_id = chat_message.student_id, use_cache = chat_message.use_cache, \
+                        include_timings = chat_message.include_timings)
         return ChatResponse(response = result["response"], agent = result["agent"], \
             subject = result["subject"], tools_used = result["tools_used"], \
-                student_id = chat_message.student_id)
+                student_id = chat_message.student_id, context_tokens_saved = result.get("context_tokens_saved"), \
+                    bypassed_models = result.get("bypassed_models", False), parts = result.get("parts"), \
+                        timings = result.get("timings"), profile = capture.folded() if capture else None)
+    except AdmissionRejected as e: raise too_many_requests(e)
     except Exception as e:
-        print(f"Error processing chat message: {e}")
+        logger.exception("Error processing chat message")
         raise HTTPException(
             status_code = 500, 
             detail = f"Error processing your question: {str(e)}"
         )
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(chat_message: ChatMessage, x_admin_token: Optional[str] = Header(default = None)):
+    # Server-sent events: "route" first, then "text"/"tool_call"/"tool_response" as produced, then "done".
+    # A full queue is refused with 429 up front; the slot itself is taken once the stream starts
+    priority = request_priority(chat_message, x_admin_token)
+    try: admission.check()
+    except AdmissionRejected as e: raise too_many_requests(e)
+    async def event_source():
+        try:
+            async with admission.admit(priority):
+                with request_profile(chat_message, x_admin_token) as capture:
+                    async for item in tutoring_system.process_student_query_stream(query = chat_message.message, \
+                        student_id = chat_message.student_id, use_cache = chat_message.use_cache, \
+                            include_timings = chat_message.include_timings):
+                        if capture and item["type"] == "done": item = {**item, "profile": capture.folded()}
+                        yield f"event: {item['type']}\ndata: {json.dumps(item)}\n\n"
+        except AdmissionRejected as e:
+            error = {"type": "error", "error": str(e), "retry_after": math.ceil(e.retry_after)}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+        except Exception as e:
+            logger.exception("Error streaming chat message")
+            error = {"type": "error", "error": f"Error processing your question: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+    return StreamingResponse(event_source(), media_type = "text/event-stream", \
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.on_event("startup")
+async def start_monitors():
+    freeze_startup_heap()
+    start_loop_monitor()
+
+@app.on_event("shutdown")
+async def flush_sessions():
+    stop_loop_monitor()
+    if hasattr(session_service := get_session_service(), "close"): await session_service.close()
+    if response_cache := getattr(tutoring_system, "response_cache", None): await response_cache.close()
+    calculator.pool.close()
+    await get_a2a_client().close()
+
 @app.get("/api/health")
 async def health_check():
     return {
@@ -74,13 +174,59 @@ async def health_check():
         "message": "AI Tutoring System is running"
     }
 
+@app.get("/api/metrics")
+async def metrics_snapshot():
+    return {
+        "counters": metrics.snapshot(),
+        "speculation_hit_rate": metrics.ratio("speculation_hits", "speculation_misses"),
+        "response_cache": response_cache.stats() if (response_cache := \
+            getattr(tutoring_system, "response_cache", None)) else None,
+        "sessions": session_service.stats() if hasattr(session_service := get_session_service(), "stats") else None,
+        "coalescing": single_flight.stats() if (single_flight := \
+            getattr(tutoring_system, "single_flight", None)) else None,
+        "admission": admission.stats(),
+        "models": model_limiter_stats(),
+        "model_health": model_health_stats(),
+        "event_loop": loop_monitor_stats(),
+    }
+
+@app.get("/metrics", response_class = PlainTextResponse)
+async def prometheus_metrics():
+    # Counters and per-stage latency histograms in the Prometheus text format
+    return metrics.prometheus()
+
+@app.delete("/api/admin/cache", dependencies = [Depends(require_admin)])
+async def invalidate_cache(subject: Optional[str] = None, query: Optional[str] = None):
+    response_cache = getattr(tutoring_system, "response_cache", None)
+    if response_cache is None: raise HTTPException(status_code = 404, detail = "Response cache is disabled")
+    return {"status": "success", "invalidated": await response_cache.invalidate(subject = subject, query = query)}
+
+@app.post("/api/admin/profile", response_class = PlainTextResponse, dependencies = [Depends(require_admin)])
+async def profile_worker(seconds: float = 10.0, all_threads: bool = False):
+    # Samples this worker for `seconds` and returns folded stacks, ready for flamegraph.pl or speedscope
+    if not 0 < seconds <= settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code = 400, detail = f"seconds must be in (0, {settings.PROFILE_MAX_SECONDS:g}]")
+    capture = await get_profiler().capture(seconds, all_threads)
+    return PlainTextResponse(capture.folded(), headers = {"X-Profile-Samples": str(capture.samples)})
+
+@app.post("/api/admin/sessions/release", dependencies = [Depends(require_admin)])
+async def release_sessions():
+    # Called by the sharding gateway after students move to another worker (see serve.py)
+    session_service = get_session_service()
+    if not hasattr(session_service, "release"): raise HTTPException(status_code = 404, detail = "Session store is not shared")
+    return {"status": "success", "released": await session_service.release()}
+
 @app.get("/api/agents/status")
 async def agents_status():
+    # Every agent with its replicas; remote replicas are probed live for health and load
+    agents = await tutoring_system.agents_status() if hasattr(tutoring_system, "agents_status") else {}
     return {
         "tutor_orchestrator": {"status": "active", "port": settings.TUTOR_PORT},
+        "distributed": settings.DISTRIBUTED_AGENTS,
+        "agents": agents,
     }
 
 if __name__ == "__main__":
-    print(f"Starting Uvicorn server on {settings.HOST}:{settings.TUTOR_PORT}")
+    logger.info("Starting Uvicorn server", extra = {"host": settings.HOST, "port": settings.TUTOR_PORT})
     uvicorn.run("app:app", host = settings.HOST, port = settings.TUTOR_PORT, reload = True)
 
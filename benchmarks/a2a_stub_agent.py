@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Response
+
+from common.a2a_client import A2AClient, AgentPolicy
+
+def create_stub_app(name: str = "stub_agent", delay: float = 0.0, fail_first: int = 0, \
+    fail_status: int = 503) -> FastAPI:
+    # A2A agent stand-in: serves an agent card and echoes /run after `delay` seconds. The first `fail_first`
+    # calls to each endpoint answer `fail_status`, which exercises retries and circuit breaking
+    app = FastAPI()
+    app.state.calls = {"card": 0, "run": 0}
+
+    def failing(endpoint: str) -> bool:
+        app.state.calls[endpoint] += 1
+        return app.state.calls[endpoint] <= fail_first
+
+    @app.get("/.well-known/agent.json")
+    async def agent_card(response: Response) -> Dict[str, Any]:
+        if failing("card"):
+            response.status_code = fail_status
+            return {"error": "injected failure"}
+        return {"name": name, "description": "Stub A2A agent", "url": "/run", "capabilities": {"streaming": False}}
+
+    @app.post("/run")
+    async def run(payload: Dict[str, Any], response: Response) -> Dict[str, Any]:
+        await asyncio.sleep(delay)
+        if failing("run"):
+            response.status_code = fail_status
+            return {"error": "injected failure"}
+        return {"response": f"{name} received: {payload['input']}", "session_id": payload["session_id"]}
+
+    return app
+
+async def start_stub(port: int, **options: Any) -> Tuple[uvicorn.Server, asyncio.Task]:
+    server = uvicorn.Server(uvicorn.Config(create_stub_app(**options), host = "127.0.0.1", port = port, \
+        log_level = "warning", lifespan = "off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started: await asyncio.sleep(0.01)
+    return server, task
+
+async def check(port: int) -> List[Tuple[str, bool, str]]:
+    # Drives A2AClient against local stubs: pooled calls, card caching, retries, fail-fast on a saturated
+    # agent, per-agent timeouts and the circuit breaker on a dead port
+    results = []
+    def record(name: str, passed: bool, detail: Any) -> None: results.append((name, passed, str(detail)))
+    client = A2AClient("http://127.0.0.1", policies = {"slow": AgentPolicy(timeout = 0.2, max_concurrency = 2, \
+        queue_timeout = 0.05)}, retries = 2, retry_backoff = 0.01, breaker_failures = 3, breaker_reset = 0.3, card_ttl = 60)
+    healthy, healthy_task = await start_stub(port)
+    flaky, flaky_task = await start_stub(port + 1, fail_first = 2)
+    slow, slow_task = await start_stub(port + 2, delay = 0.5)
+    try:
+        started = time.perf_counter()
+        replies = await asyncio.gather(*(client.run_agent("healthy", f"q{i}", port) for i in range(50)))
+        record("concurrent runs over pooled connections", all("response" in reply for reply in replies), \
+            f"50 calls in {time.perf_counter() - started:.3f}s")
+        first, second = await client.get_agent_info(port), await client.get_agent_info(port)
+        calls = healthy.config.app.state.calls["card"]
+        record("agent card served from the TTL cache", first == second and calls == 1, f"{calls} card fetch(es)")
+        card = await client.get_agent_info(port + 1)
+        record("idempotent card fetch retried past 503s", card.get("name") == "stub_agent", \
+            f"{flaky.config.app.state.calls['card']} attempts")
+        reply = await client.run_agent("flaky", "q", port + 1)
+        record("non-idempotent run not resent after a 503", reply.get("status") == "http_error", reply)
+        replies = await asyncio.gather(*(client.run_agent("slow", f"q{i}", port + 2) for i in range(6)))
+        statuses = sorted(reply.get("status", "ok") for reply in replies)
+        record("saturated agent fails fast", statuses.count("overloaded") == 4, statuses)
+        record("slow agent hits its timeout", statuses.count("timeout") == 2, statuses)
+        dead_port = port + 3
+        started = time.perf_counter()
+        replies = [await client.run_agent("dead", "q", dead_port) for _ in range(5)]
+        statuses = [reply["status"] for reply in replies]
+        record("circuit opens on a dead agent", statuses[-2:] == ["circuit_open", "circuit_open"], \
+            f"{statuses} in {time.perf_counter() - started:.3f}s")
+        await asyncio.sleep(0.35)
+        dead_server, dead_task = await start_stub(dead_port)
+        reply = await client.run_agent("dead", "q", dead_port)
+        record("half-open probe closes the circuit once the agent is back", "response" in reply, client.stats())
+        dead_server.should_exit = True
+        await dead_task
+    finally:
+        for server in (healthy, flaky, slow): server.should_exit = True
+        await asyncio.gather(healthy_task, flaky_task, slow_task)
+        await client.close()
+    return results
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = "Stub A2A agent server, or a resilience check of A2AClient against stubs")
+    parser.add_argument("--port", type = int, default = 8300)
+    parser.add_argument("--name", default = "stub_agent")
+    parser.add_argument("--delay", type = float, default = 0.0, help = "seconds before /run answers")
+    parser.add_argument("--fail-first", type = int, default = 0, help = "answer the first N calls per endpoint with 503")
+    parser.add_argument("--check", action = "store_true", help = "start stubs on --port.. --port+3 and check the client")
+    args = parser.parse_args()
+    if not args.check:
+        uvicorn.run(create_stub_app(args.name, args.delay, args.fail_first), host = "127.0.0.1", port = args.port)
+        return 0
+    results = asyncio.run(check(args.port))
+    for name, passed, detail in results: print(f"{'PASS' if passed else 'FAIL'} {name}: {detail}")
+    return 0 if all(passed for _, passed, _ in results) else 1
+
+if __name__ == "__main__": sys.exit(main())
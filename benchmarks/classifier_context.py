@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import AsyncGenerator, List
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from agents.tutor_orchestrator import tutor_agent
+
+QUERIES = ["solve 2x + 5 = 11", "what is newton's second law", "any tips for studying?", \
+    "calculate 15 * (4 + 3)", "explain black holes", "how do I stay motivated?"]
+
+class RecordingClassifierLlm(BaseLlm):
+    # Offline stand-in for the classifier model that records how much context each request carries
+    request_sizes: List[int] = []
+
+    async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.request_sizes.append(sum(len(part.text or "") for content in llm_request.contents \
+            for part in content.parts or []))
+        yield LlmResponse(content = types.Content(role = "model", parts = [types.Part.from_text(text = "math")]))
+
+async def run(calls: int, stateless: bool) -> dict:
+    model = RecordingClassifierLlm(model = "recording-classifier")
+    tutor_agent.classifier_agent.model = model
+    latencies = []
+    for i in range(calls):
+        started = time.perf_counter()
+        await tutor_agent.run_classification_agent(QUERIES[i % len(QUERIES)], stateless = stateless)
+        latencies.append(time.perf_counter() - started)
+    decile = max(calls // 10, 1)
+    return {
+        "mode": "stateless" if stateless else "stateful", "calls": calls,
+        "first_decile_context_chars": statistics.mean(model.request_sizes[:decile]),
+        "last_decile_context_chars": statistics.mean(model.request_sizes[-decile:]),
+        "first_decile_ms": statistics.mean(latencies[:decile]) * 1000,
+        "last_decile_ms": statistics.mean(latencies[-decile:]) * 1000,
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = "Per-call classifier cost over many classifications")
+    parser.add_argument("--calls", type = int, default = 10000)
+    parser.add_argument("--stateful-calls", type = int, default = 0, \
+        help = "also run the legacy single-session mode for comparison (grows quadratically, keep it small)")
+    parser.add_argument("--tolerance", type = float, default = 0.25, \
+        help = "allowed relative growth of last-decile over first-decile latency")
+    args = parser.parse_args()
+    results = [asyncio.run(run(args.calls, stateless = True))]
+    if args.stateful_calls: results.append(asyncio.run(run(args.stateful_calls, stateless = False)))
+    for result in results:
+        print(" ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}" \
+            for key, value in result.items()))
+    stateless = results[0]
+    flat_context = stateless["last_decile_context_chars"] <= stateless["first_decile_context_chars"]
+    flat_latency = stateless["last_decile_ms"] <= stateless["first_decile_ms"] * (1 + args.tolerance)
+    if not (flat_context and flat_latency):
+        print("REGRESSION: stateless classification cost grows with the number of calls")
+        return 1
+    return 0
+
+if __name__ == "__main__": sys.exit(main())
@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+# A classroom-like mix: specialist questions, tool-heavy ones, general advice, compound queries and
+# questions the direct answerer takes without a model
+QUERIES = [
+    "Explain kinetic energy and how it depends on speed",
+    "What is the speed of light in a vacuum and why is it constant?",
+    "How does momentum change in an elastic collision?",
+    "Solve 3*(4+5) - 12/4 and explain each step",
+    "Find the derivative of x^2 + 3x and explain the power rule",
+    "What is the area of a circle with radius 3?",
+    "Any tips for studying for my exams?",
+    "How can I stay motivated when practising problems?",
+    "Tell me about black holes and also calculate 5*5",
+    "12*(4+3)/sqrt(25)",
+    "value of planck constant",
+]
+STAGES = ("route", "first_text", "generate", "total")
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples: return {}
+    ordered = sorted(samples)
+    def at(percent: float) -> float: return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+    return {"count": len(ordered), "mean": statistics.fmean(ordered), "p50": at(50), "p95": at(95), "p99": at(99), \
+        "max": ordered[-1]}
+
+def rss_mb(pid: int) -> Optional[float]:
+    # Resident set size from /proc (Linux); None where that is unavailable
+    try:
+        with open(f"/proc/{pid}/status", encoding = "utf-8") as f:
+            return next(int(line.split()[1]) / 1024 for line in f if line.startswith("VmRSS:"))
+    except (OSError, StopIteration, ValueError): return None
+
+class LoadTest:
+    # Drives /api/chat (or /api/chat/stream) with `concurrency` workers. Each worker owns its own students, so a
+    # student never has two turns in flight, and asks them questions from the mix in turn. The streaming
+    # endpoint's events split every request into stages: routing, time to first text, generation and total
+    def __init__(self, url: str, concurrency: int, students: int, requests: int, duration: float, stream: bool, \
+        warmup: int, seed: int, use_cache: bool = False) -> None:
+        self.url = url.rstrip("/")
+        self.concurrency = concurrency
+        self.students = max(students, concurrency)
+        self.requests = requests
+        self.duration = duration
+        self.stream = stream
+        self.warmup = warmup
+        self.use_cache = use_cache
+        self.random = random.Random(seed)
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Counter = Counter()
+        self.agents: Counter = Counter()
+        self.issued = 0
+
+    def next_query(self) -> Optional[str]:
+        if self.requests and self.issued >= self.requests + self.warmup: return None
+        self.issued += 1
+        return self.random.choice(QUERIES)
+
+    async def ask(self, client: httpx.AsyncClient, query: str, student_id: str, record: bool) -> None:
+        payload = {"message": query, "student_id": student_id, "use_cache": self.use_cache}
+        started, stages, outcome = time.perf_counter(), {}, "ok"
+        try:
+            if not self.stream:
+                response = await client.post(f"{self.url}/api/chat", json = payload)
+                outcome = {200: "ok", 429: "rejected"}.get(response.status_code, f"http_{response.status_code}")
+                if outcome == "ok": self.agents[response.json()["agent"]] += record
+            else:
+                async with client.stream("POST", f"{self.url}/api/chat/stream", json = payload) as response:
+                    if response.status_code != 200: outcome = {429: "rejected"}.get(response.status_code, f"http_{response.status_code}")
+                    event = None
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: "): event = line[7:]
+                        if not line.startswith("data: "): continue
+                        elapsed = time.perf_counter() - started
+                        if event == "route": stages["route"] = elapsed
+                        elif event == "text": stages.setdefault("first_text", elapsed)
+                        elif event == "done": self.agents[json.loads(line[6:])["agent"]] += record
+                        elif event == "error": outcome = "rejected" if "retry_after" in json.loads(line[6:]) else "error"
+        except httpx.HTTPError as e: outcome = type(e).__name__
+        total = time.perf_counter() - started
+        if not record: return
+        self.outcomes[outcome] += 1
+        if outcome != "ok": return
+        self.timings["total"].append(total)
+        for stage, elapsed in stages.items(): self.timings[stage].append(elapsed)
+        if "first_text" in stages: self.timings["generate"].append(total - stages["first_text"])
+
+    async def worker(self, client: httpx.AsyncClient, index: int, deadline: float) -> None:
+        students = [f"load-student-{i}" for i in range(index, self.students, self.concurrency)]
+        turn = 0
+        while time.perf_counter() < deadline and (query := self.next_query()) is not None:
+            record = self.issued > self.warmup
+            await self.ask(client, query, students[turn % len(students)], record)
+            turn += 1
+
+    async def run(self, pid: Optional[int], memory_interval: float) -> Dict[str, Any]:
+        memory: List[List[float]] = []
+        async def sample_memory() -> None:
+            while pid:
+                if (mb := rss_mb(pid)) is not None: memory.append([round(time.perf_counter() - started, 2), round(mb, 1)])
+                await asyncio.sleep(memory_interval)
+        limits = httpx.Limits(max_connections = self.concurrency * 2, max_keepalive_connections = self.concurrency)
+        async with httpx.AsyncClient(timeout = httpx.Timeout(120.0), limits = limits) as client:
+            started = time.perf_counter()
+            deadline = started + (self.duration or float("inf"))
+            sampler = asyncio.create_task(sample_memory())
+            await asyncio.gather(*(self.worker(client, index, deadline) for index in range(self.concurrency)))
+            elapsed = time.perf_counter() - started
+            sampler.cancel()
+        completed = sum(self.outcomes.values())
+        return {"config": {"concurrency": self.concurrency, "students": self.students, "stream": self.stream, \
+            "warmup": self.warmup, "use_cache": self.use_cache}, "requests": completed, \
+                "outcomes": dict(self.outcomes), "elapsed": elapsed, \
+                    "throughput_rps": self.outcomes["ok"] / elapsed if elapsed else 0.0, \
+                    "stages": {stage: percentiles(self.timings[stage]) for stage in STAGES if self.timings[stage]}, \
+                        "agents": dict(self.agents), "memory": memory_report(memory)}
+
+def memory_report(samples: List[List[float]]) -> Dict[str, Any]:
+    if not samples: return {}
+    values = [mb for _, mb in samples]
+    return {"start_mb": values[0], "peak_mb": max(values), "end_mb": values[-1], "growth_mb": values[-1] - values[0], \
+        "samples": samples}
+
+def start_server(port: int, workdir: str, extra_env: Dict[str, str]) -> subprocess.Popen:
+    # The app under test runs on the fake LLM backend with throwaway session and cache databases
+    env = {**os.environ, "LLM_BACKEND": "fake", "LOG_LEVEL": "WARNING", "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY") or "offline", \
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY") or "offline", \
+            "SESSION_DB_PATH": os.path.join(workdir, "sessions.sqlite3"), \
+                "RESPONSE_CACHE_DISK_PATH": os.path.join(workdir, "responses.sqlite3"), **extra_env}
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), \
+        "--log-level", "warning"], cwd = ROOT, env = env, stdout = subprocess.DEVNULL)
+
+async def wait_ready(url: str, process: Optional[subprocess.Popen], timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process and process.poll() is not None: raise RuntimeError("Server exited during startup")
+            try:
+                if (await client.get(f"{url}/api/health", timeout = 2.0)).status_code == 200: return
+            except httpx.HTTPError: pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout:g}s")
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta: float = 0.01) -> List[str]:
+    # Latency percentiles and memory growth may rise, and throughput fall, by `tolerance` before it counts;
+    # latencies must also grow by `min_delta` seconds, so millisecond jitter on fast stages is not flagged
+    regressions = []
+    for stage, figures in baseline.get("stages", {}).items():
+        for percentile in ("p50", "p95", "p99"):
+            before, after = figures.get(percentile), report["stages"].get(stage, {}).get(percentile)
+            if before and after and after > before * (1 + tolerance) and after - before > min_delta:
+                regressions.append(f"{stage} {percentile} {before * 1000:.0f}ms -> {after * 1000:.0f}ms")
+    if report["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['throughput_rps']:.2f} -> {report['throughput_rps']:.2f} req/s")
+    before, after = baseline.get("memory", {}).get("growth_mb"), report["memory"].get("growth_mb")
+    if before is not None and after is not None and after > max(before, 0) * (1 + tolerance) + 20:
+        regressions.append(f"memory growth {before:.1f}MB -> {after:.1f}MB")
+    return regressions
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{report['requests']} requests in {report['elapsed']:.1f}s: {report['throughput_rps']:.2f} req/s, " \
+        f"outcomes {report['outcomes']}")
+    for stage, figures in report["stages"].items():
+        print(f"  {stage:<10} " + " ".join(f"{name}={figures[name] * 1000:.0f}ms" for name in ("p50", "p95", "p99", "max")))
+    if report["memory"]:
+        memory = report["memory"]
+        print(f"  memory     start={memory['start_mb']:.0f}MB peak={memory['peak_mb']:.0f}MB " \
+            f"end={memory['end_mb']:.0f}MB growth={memory['growth_mb']:+.1f}MB")
+    print(f"  answered by {report['agents']}")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = "End-to-end load test of /api/chat on the fake LLM backend")
+    parser.add_argument("--url", help = "test a running server instead of starting one (set --pid to sample its memory)")
+    parser.add_argument("--pid", type = int, help = "process to sample memory from when --url is given")
+    parser.add_argument("--port", type = int, default = 8400)
+    parser.add_argument("--concurrency", type = int, default = 16)
+    parser.add_argument("--students", type = int, default = 64)
+    parser.add_argument("--requests", type = int, default = 400, help = "measured requests (0: run for --duration)")
+    parser.add_argument("--duration", type = float, default = 0.0, help = "seconds to run (0: until --requests)")
+    parser.add_argument("--warmup", type = int, default = 20, help = "requests sent before measuring")
+    parser.add_argument("--no-stream", action = "store_true", help = "use /api/chat, which only reports total latency")
+    parser.add_argument("--use-cache", action = "store_true", help = "let repeated questions hit the response cache")
+    parser.add_argument("--memory-interval", type = float, default = 1.0)
+    parser.add_argument("--env", action = "append", default = [], metavar = "NAME=VALUE", \
+        help = "extra settings for the started server, e.g. --env FAKE_LLM_MODELS='{...}'")
+    parser.add_argument("--seed", type = int, default = 7)
+    parser.add_argument("--output", help = "write the full JSON report here")
+    parser.add_argument("--save-baseline", metavar = "NAME", help = f"save the report as {BASELINE_DIR}/NAME.json")
+    parser.add_argument("--compare", metavar = "NAME", help = "compare against a saved baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type = float, default = 0.2)
+    parser.add_argument("--min-delta-ms", type = float, default = 10.0, help = "ignore latency changes smaller than this")
+    args = parser.parse_args()
+    if not args.requests and not args.duration: parser.error("set --requests or --duration")
+    test = LoadTest(args.url or f"http://127.0.0.1:{args.port}", args.concurrency, args.students, args.requests, \
+        args.duration, not args.no_stream, args.warmup, args.seed, args.use_cache)
+    with tempfile.TemporaryDirectory() as workdir:
+        process = None if args.url else start_server(args.port, workdir, dict(item.split("=", 1) for item in args.env))
+        try:
+            asyncio.run(wait_ready(test.url, process))
+            report = asyncio.run(test.run(process.pid if process else args.pid, args.memory_interval))
+        finally:
+            if process:
+                process.terminate()
+                process.wait(timeout = 30)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding = "utf-8") as f: json.dump(report, f, indent = 2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok = True)
+        with open(os.path.join(BASELINE_DIR, f"{args.save_baseline}.json"), "w", encoding = "utf-8") as f:
+            json.dump(report, f, indent = 2)
+        print(f"Saved baseline {args.save_baseline}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), encoding = "utf-8") as f: baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms / 1000)
+        for regression in regressions: print(f"REGRESSION: {regression}")
+        if regressions: return 1
+        print(f"No regressions against baseline {args.compare}")
+    return 0
+
+if __name__ == "__main__": sys.exit(main())
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import re
+import statistics
+import sys
+from typing import AsyncGenerator, Dict, List
+
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import FunctionTool
+from google.genai import types
+
+from agents.math_agent import math_agent as math_module
+
+# The arithmetic each solution needs, in the order a tutor works through it
+TRANSCRIPTS: Dict[str, List[str]] = {
+    "solve 2x + 5 = 11": ["rhs = 11 - 5", "x = rhs / 2"],
+    "solve x^2 - 5x + 6 = 0": ["d = (-5)^2 - 4*1*6", "x1 = (5 + sqrt(d))/2", "x2 = (5 - sqrt(d))/2"],
+    "area and circumference of a circle with radius 3": ["area = pi*3^2", "circumference = 2*pi*3"],
+    "compound interest on 1000 at 5% for 10 years": ["growth = (1 + 0.05)^10", "amount = 1000*growth", \
+        "interest = amount - 1000"],
+    "mean and standard deviation of 2, 4, 4, 4, 5, 5, 7, 9": ["mean = (2+4+4+4+5+5+7+9)/8", \
+        "var = ((2-mean)^2 + 3*(4-mean)^2 + 2*(5-mean)^2 + (7-mean)^2 + (9-mean)^2)/8", "sd = sqrt(var)"],
+    "perimeter and area of a 3-4-5 right triangle": ["c = sqrt(3^2 + 4^2)", "perimeter = 3 + 4 + c", "area = 3*4/2"],
+    "what is 5 factorial": ["f = factorial(5)"],
+}
+
+class ScriptedMathLlm(BaseLlm):
+    # Offline stand-in for the math model. With calculate_expressions it plans every step into one call;
+    # with the legacy single-expression tool it issues one call per step, substituting earlier results
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        question = next(part.text for content in llm_request.contents if content.role == "user" \
+            for part in content.parts or [] if part.text)
+        steps = TRANSCRIPTS[question]
+        responses = [part.function_response.response for content in llm_request.contents \
+            for part in content.parts or [] if part.function_response]
+        if "calculate_expressions" in llm_request.tools_dict:
+            if not responses:
+                yield self.call("calculate_expressions", {"expressions": steps}); return
+            answers = [step["result"] for step in responses[-1]["results"]]
+        else:
+            if len(responses) < len(steps):
+                values = {}
+                for step, response in zip(steps, responses): values[step.split("=")[0].strip()] = response["result"]
+                expression = steps[len(responses)].split("=", 1)[1]
+                for name, value in values.items(): expression = re.sub(rf"\b{name}\b", f"({value!r})", expression)
+                yield self.call("calculate_expression", {"expression": expression.strip()}); return
+            answers = [response["result"] for response in responses]
+        yield LlmResponse(content = types.Content(role = "model", parts = [types.Part.from_text( \
+            text = "Results: " + ", ".join(f"{answer:.6g}" for answer in answers))]))
+
+    @staticmethod
+    def call(name: str, args: dict) -> LlmResponse:
+        return LlmResponse(content = types.Content(role = "model", parts = [types.Part( \
+            function_call = types.FunctionCall(name = name, args = args))]))
+
+async def run(batched: bool) -> dict:
+    model = ScriptedMathLlm(model = "scripted-math")
+    calculator_tool = FunctionTool(math_module.calculate_expressions if batched else math_module.calculate_expression)
+    agent = LlmAgent(name = "math_specialist", model = model, instruction = math_module.math_agent.instruction, \
+        tools = [calculator_tool] + [tool for tool in math_module.math_agent.tools \
+            if getattr(tool, "name", None) not in ("calculate_expressions", "calculate_expression")])
+    session_service = InMemorySessionService()
+    runner = Runner(agent = agent, app_name = "round_trip_benchmark", session_service = session_service)
+    round_trips, answers = [], {}
+    for question in TRANSCRIPTS:
+        session = await session_service.create_session(app_name = "round_trip_benchmark", user_id = "student")
+        before = model.calls
+        async for event in runner.run_async(user_id = "student", session_id = session.id, \
+            new_message = types.Content(role = "user", parts = [types.Part.from_text(text = question)])):
+            if event.is_final_response() and event.content: answers[question] = event.content.parts[0].text
+        round_trips.append(model.calls - before)
+    return {"mode": "batched" if batched else "single", "problems": len(round_trips), \
+        "mean_round_trips": statistics.mean(round_trips), "max_round_trips": max(round_trips), "answers": answers}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = "LLM round trips per solved problem for the math agent's calculator tools")
+    parser.parse_args()
+    single, batched = asyncio.run(run(batched = False)), asyncio.run(run(batched = True))
+    for result in (single, batched):
+        print(" ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}" \
+            for key, value in result.items() if key != "answers"))
+    if single["answers"] != batched["answers"]:
+        print("MISMATCH: batched and single-step calculations disagree")
+        return 1
+    if batched["mean_round_trips"] >= single["mean_round_trips"]:
+        print("REGRESSION: batched calculator does not reduce round trips")
+        return 1
+    return 0
+
+if __name__ == "__main__": sys.exit(main())
@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import timeit
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from google.adk.events import Event
+from google.genai import types
+
+from common.utils import extract_response_and_tools
+from tools.calculator import COMPILED_CACHE_SIZE, CalculatorTool
+from tools.constants import CODATA_PATH, UniversalConstantsTool
+from tools.history import ConversationHistoryTool
+from tools.history_store import HistoryStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+# A case is a name and a zero-argument callable; building it (fixtures, catalogs, histories) is not timed
+Case = Tuple[str, Callable[[], Any]]
+
+EXPRESSIONS = {
+    "arithmetic": "3*(4+5) - 12/4",
+    "functions": "sqrt(16) + sin(pi/4)^2 + log10(1000) + factorial(10)",
+    "big_power": "2^64 * 3^40 - 7^30",
+    "nested": "(" * 20 + "1" + "+1)" * 20,
+    "long_sum": "+".join(str(i) for i in range(1, 120)),
+    "unknown_variable": "x + 1",
+    "over_limit": "9^9^9",
+}
+TOPICS = ["kinetic energy", "newton's laws", "quadratic equations", "derivatives", "momentum", "black holes", \
+    "probability", "electric fields", "integration by parts", "thermodynamics", "vectors", "optics"]
+
+def calculator_cases() -> Iterator[Case]:
+    calculator = CalculatorTool()
+    for shape, expression in EXPRESSIONS.items(): yield f"calculator.{shape}", lambda e = expression: calculator.calculate(e)
+    # Twice as many distinct expressions as the compile cache holds, so every call parses and compiles
+    uncached = [f"{i} * ({i % 97} + 3.5) - {i} / 7" for i in range(COMPILED_CACHE_SIZE * 2)]
+    cursor = itertools.cycle(uncached)
+    yield "calculator.uncached", lambda: calculator.calculate(next(cursor))
+
+def grown_catalog(directory: str, factor: int) -> str:
+    # CODATA plus (factor - 1) synthetic copies of every row under new names, symbols and aliases
+    path = os.path.join(directory, f"codata_x{factor}.tsv.gz")
+    with gzip.open(CODATA_PATH, "rt", encoding = "utf-8") as source:
+        rows = [line for line in source if line.strip() and not line.startswith("#")]
+    with gzip.open(path, "wt", encoding = "utf-8") as target:
+        target.writelines(rows)
+        for copy in range(1, factor):
+            for row in rows:
+                name, value, uncertainty, unit, symbol, aliases = row.rstrip("\n").split("\t")
+                renamed = ",".join(f"{alias} v{copy}" for alias in filter(None, aliases.split(",")))
+                target.write("\t".join([f"{name} variant {copy}", value, uncertainty, unit, \
+                    f"{symbol}_{copy}" if symbol else "", renamed]) + "\n")
+    return path
+
+def constants_cases(directory: str, factors: List[int]) -> Iterator[Case]:
+    for factor in factors:
+        tool = UniversalConstantsTool(grown_catalog(directory, factor))
+        tool.formulas.update({f"synthetic_formula_{i}": f"y_{i} = k_{i} * x" \
+            for i in range(len(tool.formulas) * (factor - 1))})
+        # Indexes are built here so the first timed call does not pay for them
+        tool.constant_index.search("warm up"), tool.formula_index.search("warm up")
+        size = len(tool.constants)
+        yield f"constants.lookup_constant.hit_name[{size}]", lambda t = tool: t.lookup_constant("speed of light in vacuum")
+        yield f"constants.lookup_constant.hit_symbol[{size}]", lambda t = tool: t.lookup_constant("G")
+        yield f"constants.lookup_constant.fuzzy[{size}]", lambda t = tool: t.lookup_constant("plank constnt")
+        yield f"constants.lookup_constant.miss[{size}]", lambda t = tool: t.lookup_constant("qqqq zzzz")
+        size = len(tool.formulas)
+        yield f"constants.lookup_formula.hit[{size}]", lambda t = tool: t.lookup_formula("kinetic energy")
+        yield f"constants.lookup_formula.fuzzy[{size}]", lambda t = tool: t.lookup_formula("kinetc enrgy")
+        yield f"constants.lookup_formula.miss[{size}]", lambda t = tool: t.lookup_formula("qqqq zzzz")
+
+def history_cases(lengths: List[int]) -> Iterator[Case]:
+    generator = random.Random(3)
+    for length in lengths:
+        context = SimpleNamespace(state = {})
+        history = HistoryStore(context.state)
+        for i in range(length): history.add(generator.choice(TOPICS), f"key point {i} about {generator.choice(TOPICS)}")
+        get_context = ConversationHistoryTool.get_context
+        yield f"history.get_context.recent[{length}]", lambda c = context: get_context(None, c)
+        yield f"history.get_context.topic_hit[{length}]", lambda c = context: get_context("momentum", c)
+        yield f"history.get_context.topic_miss[{length}]", lambda c = context: get_context("chemistry", c)
+        yield f"history.get_context.short_topic[{length}]", lambda c = context: get_context("em", c)
+
+def synthetic_events(count: int) -> List[Event]:
+    # Mostly streamed text chunks, with a tool call and its response every tenth event
+    events = []
+    for i in range(count):
+        if i % 10 == 8: part = types.Part(function_call = types.FunctionCall(name = "calculate_expressions", \
+            args = {"expressions": ["1+1"]}))
+        elif i % 10 == 9: part = types.Part(function_response = types.FunctionResponse(name = "calculate_expressions", \
+            response = {"status": "success"}))
+        else: part = types.Part.from_text(text = f"chunk {i} of the streamed explanation. ")
+        events.append(Event(author = "math_specialist", content = types.Content(role = "model", parts = [part]), \
+            partial = i % 10 < 8))
+    return events
+
+def extraction_cases(lengths: List[int]) -> Iterator[Case]:
+    loop = asyncio.new_event_loop()
+    async def replay(events: List[Event]):
+        for event in events: yield event
+    for length in lengths:
+        events = synthetic_events(length)
+        yield f"extract_response_and_tools[{length}]", \
+            lambda e = events: loop.run_until_complete(extract_response_and_tools(replay(e)))
+
+def suite(quick: bool, directory: str) -> Iterator[Case]:
+    # Grown catalogs are written to `directory`, which must outlive every case in the suite
+    yield from calculator_cases()
+    yield from constants_cases(directory, [1, 10] if quick else [1, 10, 100])
+    yield from history_cases([10, 100, 1000] if quick else [10, 100, 1000, 10_000, 100_000])
+    yield from extraction_cases([100, 1000] if quick else [100, 1000, 10_000, 100_000])
+
+def measure(fn: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    # timeit picks the loop count (at least 0.2s per repeat); the best repeat is the least disturbed one
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    per_call = [seconds / loops * 1e6 for seconds in timer.repeat(repeats, loops)]
+    return {"best_us": min(per_call), "median_us": sorted(per_call)[len(per_call) // 2], "loops": loops, "repeats": repeats}
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for name, before in baseline["results"].items():
+        after = results.get(name)
+        if after and after["best_us"] > before["best_us"] * (1 + tolerance):
+            regressions.append(f"{name} {before['best_us']:.2f}us -> {after['best_us']:.2f}us " \
+                f"({after['best_us'] / before['best_us']:.2f}x)")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = "Microbenchmarks for the calculator, constants, history and event extraction")
+    parser.add_argument("--filter", default = "", help = "only run cases whose name contains this")
+    parser.add_argument("--quick", action = "store_true", help = "skip the largest catalogs, histories and event streams")
+    parser.add_argument("--repeats", type = int, default = 5)
+    parser.add_argument("--output", help = "write the results as JSON here ('-' for stdout)")
+    parser.add_argument("--save-baseline", metavar = "NAME", help = f"save the results as {BASELINE_DIR}/NAME.json")
+    parser.add_argument("--compare", metavar = "NAME", help = "compare against a saved baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type = float, default = 0.25, help = "allowed relative slowdown of a case's best time")
+    args = parser.parse_args()
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory(prefix = "microbench_") as directory:
+        for name, fn in suite(args.quick, directory):
+            if args.filter not in name: continue
+            results[name] = measure(fn, args.repeats)
+            if args.output != "-":
+                print(f"{name:<52} best {results[name]['best_us']:>12.2f}us  median {results[name]['median_us']:>12.2f}us")
+    report = {"python": platform.python_version(), "machine": platform.machine(), "quick": args.quick, "results": results}
+    if args.output == "-": json.dump(report, sys.stdout, indent = 2)
+    elif args.output:
+        with open(args.output, "w", encoding = "utf-8") as f: json.dump(report, f, indent = 2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok = True)
+        with open(os.path.join(BASELINE_DIR, f"{args.save_baseline}.json"), "w", encoding = "utf-8") as f:
+            json.dump(report, f, indent = 2)
+        print(f"Saved baseline {args.save_baseline}", file = sys.stderr)
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), encoding = "utf-8") as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions: print(f"REGRESSION: {regression}", file = sys.stderr)
+        if regressions: return 1
+        print(f"No regressions against baseline {args.compare}", file = sys.stderr)
+    return 0
+
+if __name__ == "__main__": sys.exit(main())
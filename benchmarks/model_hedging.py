@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import Any, List, Tuple
+
+from google.adk.agents import LlmAgent
+from google.adk.models.llm_request import LlmRequest
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from common.config import settings
+from common.metrics import metrics
+from common.model_selection import HedgedLlm, model_health
+from common.speculation import SpeculationBudget
+from common.standin_llm import StandInLlm
+
+def hedged(*models: StandInLlm, hedge_delay: float = 0.5, min_samples: int = 20) -> HedgedLlm:
+    return HedgedLlm(model = models[0].model, candidates = list(models), budget = SpeculationBudget(100000), \
+        hedge_delay = hedge_delay, min_samples = min_samples)
+
+async def call(llm: Any, text: str = "q") -> Tuple[float, str]:
+    request = LlmRequest(model = llm.model, contents = [types.Content(role = "user", parts = [types.Part.from_text(text = text)])])
+    started = time.perf_counter()
+    responses = [response async for response in llm.generate_content_async(request)]
+    return time.perf_counter() - started, responses[-1].content.parts[0].text
+
+async def latencies(llm: Any, calls: int, concurrency: int) -> List[float]:
+    results = []
+    for start in range(0, calls, concurrency):
+        results += [seconds for seconds, _ in await asyncio.gather(*(call(llm) for _ in range(start, min(start + concurrency, calls))))]
+    return results
+
+def p99(samples: List[float]) -> float: return statistics.quantiles(samples, n = 100)[98]
+
+async def check(calls: int, concurrency: int) -> List[Tuple[str, bool, str]]:
+    # Drives HedgedLlm against stand-in models: a tail-latency spike, a failing model that gets demoted and
+    # comes back through a probe, and a hedged agent answering through an ADK Runner
+    results = []
+    def record(name: str, passed: bool, detail: Any) -> None: results.append((name, passed, str(detail)))
+    spiky = "standin/spiky?latency=0.05&tail=0.08&tail_latency=2"
+    baseline = await latencies(StandInLlm(model = spiky), calls, concurrency)
+    primary, alternate = StandInLlm(model = spiky + "&run=hedged"), StandInLlm(model = "standin/steady?latency=0.08")
+    hedges = metrics.get("model_hedges")
+    with_hedging = await latencies(hedged(primary, alternate), calls, concurrency)
+    hedges, health = metrics.get("model_hedges") - hedges, model_health(primary.model)
+    record("hedging cuts the p99 of a spiky model", p99(with_hedging) < p99(baseline) / 2, \
+        f"p50 {statistics.median(baseline):.3f}s -> {statistics.median(with_hedging):.3f}s, " \
+            f"p99 {p99(baseline):.3f}s -> {p99(with_hedging):.3f}s")
+    record("hedges stay near the tail fraction", hedges <= calls * 0.2 and health.stats()["state"] == "closed", \
+        f"{hedges:g} hedges for {calls} calls, primary p95 {health.percentile(95):.3f}s")
+
+    settings.MODEL_DEMOTE_SECONDS = 0.3
+    failing, backup = StandInLlm(model = "standin/failing?latency=0.01&error_rate=1"), StandInLlm(model = "standin/backup?latency=0.01")
+    llm = hedged(failing, backup)
+    answers = [text for _, text in [await call(llm) for _ in range(10)]]
+    record("failed calls fall back to the next model", all(text.startswith("[backup]") for text in answers), answers[-1])
+    record("failing model is demoted", failing.calls == settings.MODEL_DEMOTE_FAILURES, \
+        f"{failing.calls} calls reached it, {model_health(failing.model).stats()}")
+    failing.overrides = {"error_rate": 0.0}
+    await asyncio.sleep(0.35)
+    _, text = await call(llm)
+    record("recovered model is promoted again after a probe", text.startswith("[failing]"), \
+        model_health(failing.model).stats()["state"])
+
+    crawling, quick = StandInLlm(model = "standin/crawling?latency=1"), StandInLlm(model = "standin/quick?latency=0.01")
+    llm = hedged(crawling, quick, hedge_delay = 0.05)
+    for _ in range(settings.MODEL_HEDGE_MIN_SAMPLES): await call(llm)
+    calls_before = crawling.calls
+    _, text = await call(llm)
+    record("model that keeps losing hedges is demoted", crawling.calls == calls_before and text.startswith("[quick]"), \
+        model_health(crawling.model).stats())
+
+    agent = LlmAgent(name = "hedged_agent", model = hedged(StandInLlm(model = "standin/stuck?latency=30"), \
+        StandInLlm(model = "standin/rescue?latency=0.01"), hedge_delay = 0.1), instruction = "Answer the question.")
+    session_service = InMemorySessionService()
+    session = await session_service.create_session(app_name = "hedging_check", user_id = "student")
+    runner = Runner(agent = agent, app_name = "hedging_check", session_service = session_service)
+    started, answer = time.perf_counter(), None
+    async for event in runner.run_async(user_id = "student", session_id = session.id, \
+        new_message = types.Content(role = "user", parts = [types.Part.from_text(text = "what is inertia")])):
+        if event.is_final_response() and event.content: answer = event.content.parts[0].text
+    elapsed = time.perf_counter() - started
+    record("agent answers past a stuck model", answer == "[rescue] what is inertia" and elapsed < 1, \
+        f"{answer!r} in {elapsed:.3f}s")
+    return results
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = "Check hedged model calls and fallback against stand-in models")
+    parser.add_argument("--calls", type = int, default = 300)
+    parser.add_argument("--concurrency", type = int, default = 30)
+    args = parser.parse_args()
+    results = asyncio.run(check(args.calls, args.concurrency))
+    for name, passed, detail in results: print(f"{'PASS' if passed else 'FAIL'} {name}: {detail}")
+    return 0 if all(passed for _, passed, _ in results) else 1
+
+if __name__ == "__main__": sys.exit(main())
@@ -1,41 +1,219 @@
-from typing import Any, Dict, Optional
+import asyncio
+import importlib.util
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, NamedTuple, Optional, Tuple
 
 import httpx
 
+from common.config import settings
+from common.log import get_logger
+from common.metrics import metrics
+
+# Failures that happen before the request reaches the agent, so even a POST is safe to resend
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRYABLE_STATUS = {502, 503, 504}
+logger = get_logger(__name__)
+
+class AgentPolicy(NamedTuple):
+    # Per-agent limits: request timeout, concurrent requests in flight, and how long a caller may wait
+    # for a slot before failing fast instead of queueing behind a slow agent
+    timeout: float = 30.0
+    max_concurrency: int = 16
+    queue_timeout: float = 1.0
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive failures and rejects calls for `reset_timeout` seconds;
+    # then a single probe is let through (half-open) and its outcome closes or re-opens the circuit
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None: return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed": return True
+        if state == "open" or self.probing: return False
+        self.probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures, self.opened_at, self.probing = 0, None, False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold: self.opened_at = time.monotonic()
+        self.probing = False
+
+    def trip(self) -> None:
+        self.opened_at, self.probing = time.monotonic(), False
+
+    def abandon_probe(self) -> None:
+        # The probe was cancelled before it had an outcome; the next call may probe instead
+        self.probing = False
 
 class A2AClient:
-    def __init__(self, base_url: str) -> None:
+    # One pooled, keep-alive connection set shared by every agent call. Each target agent gets its own
+    # concurrency limit, timeout and circuit breaker, so a slow or dead agent fails fast instead of
+    # holding sockets and callers; agent cards are cached for `card_ttl` seconds
+    def __init__(self, base_url: str, policies: Optional[Dict[str, AgentPolicy]] = None, \
+        default_policy: AgentPolicy = AgentPolicy(), connect_timeout: float = 2.0, max_connections: int = 100, \
+            max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0, http2: bool = False, \
+                retries: int = 2, retry_backoff: float = 0.2, breaker_failures: int = 5, breaker_reset: float = 30.0, \
+                    card_ttl: float = 300.0, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
         self.base_url = base_url.rstrip("/")
-        self.client = httpx.AsyncClient()
-    
+        self.policies = policies or {}
+        self.default_policy = default_policy
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.card_ttl = card_ttl
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.in_flight: Counter = Counter()
+        self.cards: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # HTTP/2 needs the optional h2 package; without it the client stays on HTTP/1.1 keep-alive
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        if http2 and not self.http2: logger.warning("A2A_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+        self.client = httpx.AsyncClient(http2 = self.http2, transport = transport, \
+            limits = httpx.Limits(max_connections = max_connections, \
+                max_keepalive_connections = max_keepalive_connections, keepalive_expiry = keepalive_expiry), \
+                    timeout = httpx.Timeout(default_policy.timeout, connect = connect_timeout, pool = connect_timeout))
+
+    def policy(self, target_agent: str) -> AgentPolicy: return self.policies.get(target_agent, self.default_policy)
+
+    def breaker(self, target: str) -> CircuitBreaker:
+        if target not in self.breakers: self.breakers[target] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+        return self.breakers[target]
+
+    def semaphore(self, target: str, max_concurrency: int) -> asyncio.Semaphore:
+        if target not in self.semaphores: self.semaphores[target] = asyncio.Semaphore(max_concurrency)
+        return self.semaphores[target]
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many callers instead of synchronising them
+        return random.uniform(0, self.retry_backoff * 2 ** attempt)
+
+    async def request(self, target_agent: str, method: str, url: str, idempotent: bool, \
+        **kwargs: Any) -> Dict[str, Any]:
+        # Breakers and semaphores are keyed by the agent and URL's origin, so each replica trips on its own
+        target = f"{target_agent}@{httpx.URL(url).netloc.decode()}"
+        policy, breaker = self.policy(target_agent), self.breaker(target)
+        if not breaker.allow():
+            metrics.increment("a2a_circuit_rejections")
+            return {"error": f"Circuit open for {target_agent}; not calling it for now", "status": "circuit_open"}
+        # A half-open call is the breaker's only probe. If it ends without an outcome (no free slot, or
+        # cancelled) the probe is handed back; otherwise the target would answer "circuit_open" forever
+        probe = breaker.state == "half_open"
+        try:
+            semaphore = self.semaphore(target, policy.max_concurrency)
+            try: await asyncio.wait_for(semaphore.acquire(), policy.queue_timeout)
+            except asyncio.TimeoutError:
+                metrics.increment("a2a_overloaded")
+                return {"error": f"{target_agent} has {policy.max_concurrency} requests in flight", "status": "overloaded"}
+            timeout = httpx.Timeout(policy.timeout, connect = self.connect_timeout, pool = self.connect_timeout)
+            self.in_flight[target] += 1
+            try:
+                for attempt in range(self.retries + 1):
+                    try:
+                        response = await self.client.request(method, url, timeout = timeout, **kwargs)
+                        if response.status_code in RETRYABLE_STATUS and idempotent and attempt < self.retries:
+                            await asyncio.sleep(self.backoff(attempt)); continue
+                        response.raise_for_status()
+                        breaker.record_success()
+                        return response.json()
+                    except UNSENT_ERRORS + ((httpx.TimeoutException, httpx.RemoteProtocolError) if idempotent else ()) as e:
+                        if attempt < self.retries:
+                            metrics.increment("a2a_retries")
+                            await asyncio.sleep(self.backoff(attempt)); continue
+                        breaker.record_failure()
+                        status = "timeout" if isinstance(e, httpx.TimeoutException) else "connection_error"
+                        return {"error": f"Failed to connect to {target_agent}: {str(e) or type(e).__name__}", "status": status}
+                    except httpx.TimeoutException as e:
+                        breaker.record_failure()
+                        return {"error": f"{target_agent} timed out after {policy.timeout:g}s: {type(e).__name__}", \
+                            "status": "timeout"}
+                    except httpx.RequestError as e:
+                        breaker.record_failure()
+                        return {"error": f"Failed to connect to {target_agent}: {str(e)}", "status": "connection_error"}
+                    except httpx.HTTPStatusError as e:
+                        # 4xx means the request was wrong and 503 that the agent is shedding load, not that it is unhealthy
+                        if e.response.status_code >= 500 and e.response.status_code != 503: breaker.record_failure()
+                        else: breaker.record_success()
+                        return {"error": f"HTTP error from {target_agent}: {e.response.status_code}", "status": "http_error", \
+                            "status_code": e.response.status_code}
+                    except ValueError as e:
+                        breaker.record_failure()
+                        return {"error": f"Invalid response from {target_agent}: {str(e)}", "status": "http_error"}
+            finally:
+                self.in_flight[target] -= 1
+                semaphore.release()
+        finally:
+            # Nothing awaits between recording an outcome and this point, so a probe still marked here is ours
+            if probe and breaker.probing: breaker.abandon_probe()
+
     async def run_agent(self, target_agent: str, user_input: str, \
-        port: int, session_id: Optional[str] = None) -> Dict[str, Any]:
-        url = f"{self.base_url}:{port}/run"
+        port: int, session_id: Optional[str] = None, idempotent: bool = False) -> Dict[str, Any]:
+        return await self.run_at(target_agent, f"{self.base_url}:{port}", user_input, session_id, idempotent)
+
+    async def run_at(self, target_agent: str, agent_url: str, user_input: str, session_id: Optional[str] = None, \
+        idempotent: bool = False, **fields: Any) -> Dict[str, Any]:
+        # A run is only resent when it never reached the agent, unless the caller marks it idempotent
         payload = {
             "input": user_input,
-            "session_id": session_id or f"default_{target_agent}"
+            "session_id": session_id or f"default_{target_agent}",
+            **fields
         }
-        try:
-            response = await self.client.post(url, json = payload, \
-                headers = {"Content-Type": "application/json"}
-            )
-            response.raise_for_status(); return response.json()
-        except httpx.RequestError as e:
-            return {
-                "error": f"Failed to connect to {target_agent}: {str(e)}",
-                "status": "connection_error"
-            }
-        except httpx.HTTPStatusError as e:
-            return {
-                "error": f"HTTP error from {target_agent}: {e.response.status_code}",
-                "status": "http_error"
-            }
-    
-    async def get_agent_info(self, port: int = 8000) -> Dict[str, Any]:
-        url = f"{self.base_url}:{port}/.well-known/agent.json"
-        try:
-            response = await self.client.get(url); response.raise_for_status()
-            return response.json()
-        except Exception as e: return {"error": str(e), "status": "info_error"}
-    
+        return await self.request(target_agent, "POST", f"{agent_url.rstrip('/')}/run", idempotent, json = payload, \
+            headers = {"Content-Type": "application/json"})
+
+    async def post(self, target_agent: str, url: str, payload: Dict[str, Any], idempotent: bool = False) -> Dict[str, Any]:
+        return await self.request(target_agent, "POST", url, idempotent, json = payload)
+
+    async def get_health(self, target_agent: str, agent_url: str) -> Dict[str, Any]:
+        return await self.request(target_agent, "GET", f"{agent_url.rstrip('/')}/health", idempotent = True)
+
+    async def get_agent_info(self, port: int = 8000, refresh: bool = False) -> Dict[str, Any]:
+        return await self.get_agent_card(f"{self.base_url}:{port}", refresh)
+
+    async def get_agent_card(self, agent_url: str, refresh: bool = False) -> Dict[str, Any]:
+        url = f"{agent_url.rstrip('/')}/.well-known/agent.json"
+        cached = self.cards.get(url)
+        if cached and not refresh and cached[0] > time.monotonic(): return cached[1]
+        card = await self.request("agent_card", "GET", url, idempotent = True)
+        if "error" in card: return {"error": card["error"], "status": "info_error"}
+        self.cards[url] = (time.monotonic() + self.card_ttl, card)
+        return card
+
+    def stats(self) -> Dict[str, Any]:
+        return {target: {"circuit": breaker.state, "consecutive_failures": breaker.failures, \
+            "in_flight": self.in_flight[target]} for target, breaker in self.breakers.items()}
+
     async def close(self): await self.client.aclose()
+
+_a2a_client: Optional[A2AClient] = None
+
+def get_a2a_client() -> A2AClient:
+    # One process-wide client so every dispatch shares the same connection pool, breakers and card cache
+    global _a2a_client
+    if _a2a_client is None:
+        default_policy = AgentPolicy(settings.A2A_TIMEOUT, settings.A2A_MAX_CONCURRENCY, settings.A2A_QUEUE_TIMEOUT)
+        _a2a_client = A2AClient(settings.A2A_BASE_URL, policies = {agent: default_policy._replace(timeout = timeout) \
+            for agent, timeout in settings.A2A_AGENT_TIMEOUTS.items()}, default_policy = default_policy, \
+                connect_timeout = settings.A2A_CONNECT_TIMEOUT, max_connections = settings.A2A_MAX_CONNECTIONS, \
+                    max_keepalive_connections = settings.A2A_MAX_KEEPALIVE_CONNECTIONS, \
+                        keepalive_expiry = settings.A2A_KEEPALIVE_EXPIRY, http2 = settings.A2A_HTTP2, \
+                            retries = settings.A2A_RETRIES, retry_backoff = settings.A2A_RETRY_BACKOFF, \
+                                breaker_failures = settings.A2A_BREAKER_FAILURES, breaker_reset = settings.A2A_BREAKER_RESET, \
+                                    card_ttl = settings.A2A_CARD_TTL)
+    return _a2a_client
@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+
+from common.config import settings
+from common.context_window import estimate_tokens
+from common.metrics import metrics
+from common.utils import model_layers
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+class AdmissionRejected(Exception):
+    # Raised instead of queueing; callers answer 429 with a Retry-After of `retry_after` seconds
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RateLimiter:
+    # Async token bucket: `acquire` waits until `amount` fits. Amounts larger than the bucket are let
+    # through once it is full, and `debit` charges usage learned after the fact (it may go negative)
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.refill_rate = self.capacity / 60.0
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float) -> None:
+        if self.capacity <= 0: return
+        async with self._lock:
+            while True:
+                self.refill()
+                needed = min(amount, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((needed - self.tokens) / self.refill_rate)
+
+    def debit(self, amount: float) -> None:
+        if self.capacity <= 0: return
+        self.refill()
+        self.tokens -= amount
+
+class ModelLimiter:
+    # Caps one model's concurrent calls, requests per minute and tokens per minute (0 disables a limit)
+    def __init__(self, model: str, max_concurrency: int, requests_per_minute: float, tokens_per_minute: float) -> None:
+        self.model = model
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.requests = RateLimiter(requests_per_minute)
+        self.tokens = RateLimiter(tokens_per_minute)
+        self.in_flight = 0
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await self.slots.acquire()
+            try:
+                await self.requests.acquire(1)
+                await self.tokens.acquire(estimated_tokens)
+            except BaseException:
+                self.slots.release()
+                raise
+        finally: self.waiting -= 1
+        metrics.increment(f"model_wait_seconds.{self.model}", time.perf_counter() - started)
+        self.in_flight += 1
+        try: yield
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {"in_flight": self.in_flight, "waiting": self.waiting, "request_tokens": self.requests.tokens, \
+            "token_budget": self.tokens.tokens}
+
+class AdmissionControlledLlm(BaseLlm):
+    # Wraps an agent's model so every call goes through that model's shared limiter. The input tokens are
+    # reserved before the call, and output tokens are charged from the usage metadata once it returns
+    inner: BaseLlm
+    limiter: ModelLimiter
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        async with self.limiter.slot(estimate_tokens(llm_request.contents)):
+            async for response in self.inner.generate_content_async(llm_request, stream):
+                usage = response.usage_metadata
+                if usage and usage.candidates_token_count and not response.partial:
+                    self.limiter.tokens.debit(usage.candidates_token_count)
+                yield response
+
+_model_limiters: Dict[str, ModelLimiter] = {}
+
+def model_limiter(model: str) -> ModelLimiter:
+    # One limiter per model name, shared by every agent that uses the model; MODEL_LIMITS overrides defaults
+    if model not in _model_limiters:
+        limits = settings.MODEL_LIMITS.get(model, {})
+        _model_limiters[model] = ModelLimiter(model, int(limits.get("max_concurrency", settings.MODEL_MAX_CONCURRENCY)), \
+            limits.get("requests_per_minute", settings.MODEL_REQUESTS_PER_MINUTE), \
+                limits.get("tokens_per_minute", settings.MODEL_TOKENS_PER_MINUTE))
+    return _model_limiters[model]
+
+def limit_llm(llm: BaseLlm) -> AdmissionControlledLlm:
+    return AdmissionControlledLlm(model = llm.model, inner = llm, limiter = model_limiter(llm.model))
+
+def limit_agent_model(agent: LlmAgent) -> None:
+    # A limiter anywhere in the chain counts: a second limiter would take a second slot from the same model's
+    # semaphore for one call, and deadlock once every slot is held by a call waiting for another
+    if any(isinstance(layer, AdmissionControlledLlm) for layer in model_layers(agent.model)): return
+    agent.model = limit_llm(agent.model if isinstance(agent.model, BaseLlm) else LLMRegistry.new_llm(agent.model))
+
+def model_limiter_stats() -> Dict[str, Dict[str, float]]:
+    return {model: limiter.stats() for model, limiter in _model_limiters.items()}
+
+class AdmissionQueue:
+    # Bounds the requests being answered at once. Up to `max_queue` more wait in priority order (FIFO within
+    # a priority); beyond that, or after waiting `queue_timeout`, requests are rejected with a Retry-After
+    # estimated from recent service times
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+        self.service_time = 1.0
+
+    def retry_after(self) -> float:
+        return max(1.0, self.service_time * (len(self.waiters) + 1) / max(self.max_concurrent, 1))
+
+    def check(self) -> None:
+        if self.running >= self.max_concurrent and len(self.waiters) >= self.max_queue:
+            metrics.increment("admission_rejected")
+            raise AdmissionRejected("Too many requests in progress, please retry shortly", self.retry_after())
+
+    async def acquire(self, priority: str = "normal") -> float:
+        if self.running < self.max_concurrent and not self.waiters:
+            self.running += 1
+            return time.monotonic()
+        self.check()
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (PRIORITIES.get(priority, PRIORITIES["normal"]), next(self.sequence), waiter)
+        heapq.heappush(self.waiters, entry)
+        metrics.increment("admission_queued")
+        try: await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done(): return time.monotonic()
+            self.waiters.remove(entry); heapq.heapify(self.waiters)
+            waiter.cancel()
+            metrics.increment("admission_timed_out")
+            raise AdmissionRejected("Timed out waiting for capacity, please retry shortly", self.retry_after())
+        except asyncio.CancelledError:
+            # A slot handed to a caller that went away is passed straight on
+            if waiter.done() and not waiter.cancelled(): self.release(None)
+            elif entry in self.waiters: self.waiters.remove(entry); heapq.heapify(self.waiters)
+            raise
+        return time.monotonic()
+
+    def release(self, started: Optional[float]) -> None:
+        if started is not None: self.service_time = 0.9 * self.service_time + 0.1 * (time.monotonic() - started)
+        while self.waiters:
+            _, _, waiter = heapq.heappop(self.waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    @asynccontextmanager
+    async def admit(self, priority: str = "normal"):
+        started = await self.acquire(priority)
+        try: yield
+        finally: self.release(started)
+
+    def stats(self) -> Dict[str, float]:
+        return {"running": self.running, "queued": len(self.waiters), "max_concurrent": self.max_concurrent, \
+            "max_queue": self.max_queue, "service_time": self.service_time}
+
+class StudentLocks:
+    # Serializes each student's turns so two requests never run against the same ADK session at once.
+    # At most `max_pending` turns per student may wait; more are rejected rather than piling up
+    def __init__(self, max_pending: int) -> None:
+        self.max_pending = max_pending
+        self.locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, student_id: str):
+        lock, users = self.locks.get(student_id, (None, 0))
+        if lock is None: lock = asyncio.Lock()
+        if users > self.max_pending:
+            metrics.increment("student_turns_rejected")
+            raise AdmissionRejected("Your previous questions are still being answered", 1.0)
+        self.locks[student_id] = (lock, users + 1)
+        try:
+            async with lock: yield
+        finally:
+            lock, users = self.locks[student_id]
+            if users == 1: del self.locks[student_id]
+            else: self.locks[student_id] = (lock, users - 1)
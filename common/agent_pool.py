@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.a2a_client import A2AClient
+from common.log import get_logger
+from common.metrics import metrics
+
+# Outcomes where the replica never ran the request, so another replica may take it
+REJECTED_STATUSES = {"connection_error", "circuit_open", "overloaded"}
+logger = get_logger(__name__)
+
+class Replica:
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+        self.in_flight = 0
+        self.down_until = 0.0
+        self.latency: Optional[float] = None
+
+    @property
+    def available(self) -> bool: return time.monotonic() >= self.down_until
+
+    def observe(self, seconds: float) -> None:
+        # Exponentially weighted latency, reported on the status endpoint
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+
+class RemoteAgentPool:
+    # Client-side load balancing over the replicas of each remote specialist. A student sticks to the
+    # replica that rendezvous hashing picks for them, because that replica holds their session; when it
+    # is down or rejects the request the next replica in the student's ranking takes over
+    def __init__(self, topology: Dict[str, List[str]], client: A2AClient, down_seconds: float = 10.0) -> None:
+        self.replicas = {agent: [Replica(url) for url in urls] for agent, urls in topology.items() if urls}
+        self.client = client
+        self.down_seconds = down_seconds
+
+    def serves(self, agent_name: str) -> bool: return agent_name in self.replicas
+
+    def ranked(self, agent_name: str, student_id: str) -> List[Replica]:
+        def weight(replica: Replica) -> int:
+            return int.from_bytes(hashlib.blake2b(f"{student_id}|{replica.url}".encode(), digest_size = 8).digest(), "big")
+        ranked = sorted(self.replicas[agent_name], key = weight, reverse = True)
+        return [replica for replica in ranked if replica.available] + [replica for replica in ranked if not replica.available]
+
+    async def call(self, agent_name: str, student_id: str, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"error": f"No replicas configured for {agent_name}", "status": "connection_error"}
+        for replica in self.ranked(agent_name, student_id):
+            replica.in_flight += 1
+            started = time.perf_counter()
+            try:
+                if path == "/run": result = await self.client.run_at(agent_name, replica.url, **payload)
+                else: result = await self.client.post(agent_name, f"{replica.url}{path}", payload)
+            finally: replica.in_flight -= 1
+            if "error" not in result:
+                replica.observe(time.perf_counter() - started)
+                return result
+            if result["status"] not in REJECTED_STATUSES and result.get("status_code") != 503: return result
+            # A busy replica is only skipped for this request; an unreachable one for down_seconds
+            if result["status"] in ("connection_error", "circuit_open"): replica.down_until = time.monotonic() + self.down_seconds
+            metrics.increment("a2a_failovers")
+        return result
+
+    async def run(self, agent_name: str, query: str, student_id: str, session_id: str) -> Tuple[str, List[str]]:
+        result = await self.call(agent_name, student_id, "/run", \
+            {"user_input": query, "session_id": session_id, "user_id": student_id})
+        if "error" in result: raise RuntimeError(result["error"])
+        return result["response"], result.get("tools_used", [])
+
+    async def record(self, agent_name: str, student_id: str, session_id: str, query: str, response: str) -> None:
+        result = await self.call(agent_name, student_id, "/record", \
+            {"input": query, "response": response, "session_id": session_id, "user_id": student_id})
+        if "error" in result: logger.warning("Could not record turn", extra = {"agent": agent_name, "error": result["error"]})
+
+    async def status(self) -> Dict[str, List[Dict[str, Any]]]:
+        # Polls every replica's /health concurrently and merges it with what this process has observed
+        async def probe(agent_name: str, replica: Replica) -> Dict[str, Any]:
+            health = await self.client.get_health(agent_name, replica.url)
+            healthy = "error" not in health
+            if healthy: replica.down_until = 0.0
+            return {"url": replica.url, "status": "healthy" if healthy else health["status"], \
+                "in_flight_from_here": replica.in_flight, "latency": replica.latency, \
+                    "load": health.get("load"), "capacity": health.get("capacity"), \
+                        "in_flight": health.get("in_flight"), "completed": health.get("completed"), \
+                            "error": health.get("error")}
+        agents = list(self.replicas)
+        reports = await asyncio.gather(*(asyncio.gather(*(probe(agent, replica) \
+            for replica in self.replicas[agent])) for agent in agents))
+        return dict(zip(agents, reports))
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from common.log import get_logger
+from common.metrics import metrics
+
+logger = get_logger(__name__)
+
+HISTORY_DEPENDENT_PATTERN = re.compile(
+    r"\b(previous|earlier|before|again|above|continue|you (said|mentioned|told)|my (last|previous|earlier)|"
+    r"last (answer|question|one|step|problem)|next (step|one|part)|that (one|answer|question|problem|equation|formula)|"
+    r"same (one|problem|question)|what about|and then)\b", re.IGNORECASE)
+
+def normalize_query(query: str) -> str:
+    normalized = re.sub(r"\s+", " ", query.lower()).strip()
+    normalized = re.sub(r"\s*([+\-*/^=(),])\s*", r"\1", normalized)
+    return normalized.rstrip(" ?!.")
+
+def depends_on_history(query: str) -> bool: return bool(HISTORY_DEPENDENT_PATTERN.search(query))
+
+class ResponseCache:
+    # LRU + TTL memory tier bounded by entry count and bytes, in front of an SQLite disk tier. Disk writes are
+    # buffered and written behind in batches, and expired or surplus rows are pruned on a timer; every disk
+    # access runs in a thread so a busy database file (shared by every serve.py worker) never stalls the loop
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 16 * 1024 * 1024, \
+        ttl_seconds: float = 900, disk_path: Optional[str] = None, disk_max_entries: int = 20000, \
+            flush_interval: float = 1.0, prune_interval: float = 60.0) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_entries = disk_max_entries
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+        self.entries: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self.size_bytes = 0
+        self.pending: Dict[str, Tuple[str, str, float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.disk: Optional[sqlite3.Connection] = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok = True)
+            self.disk = sqlite3.connect(disk_path, check_same_thread = False)
+            self.disk.execute("PRAGMA journal_mode=WAL")
+            self.disk.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, subject TEXT, " \
+                "query TEXT, expires_at REAL, value TEXT)")
+            self.disk.execute("CREATE INDEX IF NOT EXISTS responses_expiry ON responses (expires_at)")
+            self.disk.commit()
+
+    @staticmethod
+    def make_key(subject: str, agent: str, model: str, query: str) -> str:
+        raw = json.dumps([subject, agent, model, normalize_query(query)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                metrics.increment("response_cache_hits")
+                return entry[2]
+            if entry: self._drop(key)
+            # Written recently but already pushed out of memory, before it reached the disk
+            if key in self.pending and self.pending[key][2] > now:
+                metrics.increment("response_cache_hits")
+                return self.pending[key][3]
+        if self.disk is not None:
+            row = await asyncio.to_thread(self._read, key)
+            if row and row[0] > now:
+                value = json.loads(row[1])
+                with self._lock: self._store(key, row[0], value)
+                metrics.increment("response_cache_hits"); metrics.increment("response_cache_disk_hits")
+                return value
+        metrics.increment("response_cache_misses")
+        return None
+
+    def put(self, key: str, subject: str, query: str, value: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, expires_at, value)
+            if self.disk is not None: self.pending[key] = (subject, normalize_query(query), expires_at, value)
+        if self.disk is not None: self._ensure_worker()
+
+    async def invalidate(self, subject: Optional[str] = None, query: Optional[str] = None) -> int:
+        # Drops every entry matching the given subject and/or query; no filters clears the cache
+        def matches(value_subject: Optional[str], value_query: str) -> bool:
+            return (subject is None or value_subject == subject) and \
+                (query is None or normalize_query(value_query) == normalize_query(query))
+        with self._lock:
+            matched = [key for key, (_, _, value) in self.entries.items() \
+                if matches(value.get("subject"), value.get("query", ""))]
+            for key in matched: self._drop(key)
+            for key in [key for key, row in self.pending.items() if matches(row[0], row[1])]: del self.pending[key]
+        removed = len(matched)
+        if self.disk is not None:
+            # Batches already on their way to disk land first, so they cannot bring matching rows back
+            await self.flush()
+            removed = max(removed, await asyncio.to_thread(self._delete, subject, \
+                normalize_query(query) if query is not None else None))
+        metrics.increment("response_cache_invalidations", removed)
+        return removed
+
+    async def flush(self) -> None:
+        if self._flush_lock is None: self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            with self._lock: batch, self.pending = self.pending, {}
+            if batch: await asyncio.to_thread(self._write, batch)
+
+    async def close(self) -> None:
+        if self._worker: self._worker.cancel()
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries), "bytes": self.size_bytes,
+            "hits": metrics.get("response_cache_hits"), "misses": metrics.get("response_cache_misses"),
+            "hit_rate": metrics.ratio("response_cache_hits", "response_cache_misses"),
+        }
+
+    def _store(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        if key in self.entries: self._drop(key)
+        size = len(json.dumps(value))
+        if size > self.max_bytes: return
+        self.entries[key] = (expires_at, size, value)
+        self.size_bytes += size
+        while len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            metrics.increment("response_cache_evictions")
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self.entries.pop(key)
+        self.size_bytes -= size
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run_worker())
+
+    async def _run_worker(self) -> None:
+        pruned = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - pruned >= self.prune_interval:
+                    pruned = time.monotonic()
+                    await asyncio.to_thread(self._prune)
+            except Exception: logger.exception("Response cache disk maintenance failed")
+
+    def _read(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            return self.disk.execute("SELECT expires_at, value FROM responses WHERE key = ?", (key,)).fetchone()
+
+    def _write(self, batch: Dict[str, Tuple[str, str, float, Dict[str, Any]]]) -> None:
+        with self._db_lock:
+            self.disk.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", \
+                [(key, subject, query, expires_at, json.dumps(value)) for key, (subject, query, expires_at, value) \
+                    in batch.items()])
+            self.disk.commit()
+
+    def _prune(self) -> None:
+        with self._db_lock:
+            self.disk.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self.disk.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses " \
+                "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)", (self.disk_max_entries,))
+            self.disk.commit()
+
+    def _delete(self, subject: Optional[str], query: Optional[str]) -> int:
+        clauses, params = [], []
+        if subject is not None: clauses.append("subject = ?"); params.append(subject)
+        if query is not None: clauses.append("query = ?"); params.append(query)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._db_lock:
+            removed = self.disk.execute(f"DELETE FROM responses{where}", params).rowcount
+            self.disk.commit()
+        return removed
@@ -0,0 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from common.metrics import metrics
+
+
+class SingleFlight:
+    # Coalesces identical work that is in flight at the same time: the first caller for a key (the leader)
+    # runs it and every caller that arrives before it finishes gets the same result. If the leader fails or
+    # is cancelled its followers are not failed with it; one of them takes over and runs the work again
+    def __init__(self) -> None:
+        self.flights: Dict[str, asyncio.Future] = {}
+        self.saved = 0
+
+    async def join(self, key: str) -> Optional[Any]:
+        # The result of the in-flight run for `key`, or None when there is none to join
+        while (flight := self.flights.get(key)) is not None:
+            await asyncio.wait({flight})
+            if not flight.cancelled():
+                self.saved += 1
+                metrics.increment("upstream_calls_saved")
+                return flight.result()
+        return None
+
+    @asynccontextmanager
+    async def lead(self, key: Optional[str]):
+        # Registers the caller as the leader for `key` (None runs uncoalesced); the caller publishes its
+        # result with `flight.set_result`, and leaving without one lets the followers retry
+        flight = asyncio.get_running_loop().create_future()
+        if key is not None: self.flights[key] = flight
+        try: yield flight
+        finally:
+            if not flight.done(): flight.cancel()
+            if key is not None and self.flights.get(key) is flight: del self.flights[key]
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        # Returns (result, shared); `shared` is True when the result came from another caller's run
+        shared = await self.join(key)
+        if shared is not None: return shared, True
+        async with self.lead(key) as flight:
+            result = await work()
+            flight.set_result(result)
+        return result, False
+
+    def stats(self) -> Dict[str, int]: return {"in_flight": len(self.flights), "upstream_calls_saved": self.saved}
@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -11,8 +11,102 @@ class Settings(BaseSettings):
     GOOGLE_GENAI_USE_VERTEXAI: bool = False
     HOST: str = "0.0.0.0"
     TUTOR_PORT: int = 8000
+    WORKERS: int = 0
+    WORKER_BASE_PORT: int = 9100
+    GATEWAY_VNODES: int = 128
+    GATEWAY_DRAIN_TIMEOUT: float = 30.0
     A2A_BASE_URL: str = "http://localhost"
+    A2A_CONNECT_TIMEOUT: float = 2.0
+    A2A_TIMEOUT: float = 60.0
+    A2A_AGENT_TIMEOUTS: Dict[str, float] = {}
+    A2A_MAX_CONCURRENCY: int = 16
+    A2A_QUEUE_TIMEOUT: float = 1.0
+    A2A_MAX_CONNECTIONS: int = 100
+    A2A_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    A2A_KEEPALIVE_EXPIRY: float = 30.0
+    A2A_HTTP2: bool = False
+    A2A_RETRIES: int = 2
+    A2A_RETRY_BACKOFF: float = 0.2
+    A2A_BREAKER_FAILURES: int = 5
+    A2A_BREAKER_RESET: float = 30.0
+    A2A_CARD_TTL: float = 300.0
+    DISTRIBUTED_AGENTS: bool = False
+    AGENT_TOPOLOGY: Dict[str, List[str]] = {"math_specialist": ["http://localhost:8001"], \
+        "physics_specialist": ["http://localhost:8002"]}
+    AGENT_SERVER_MAX_CONCURRENCY: int = 32
+    AGENT_REPLICA_DOWN_SECONDS: float = 10.0
     CORS_ORIGINS: List[str] = ["http://localhost:8000", "http://127.0.0.1:8000"]
+    ROUTER_ENABLED: bool = True
+    ROUTER_CONFIDENCE_THRESHOLD: float = 0.9
+    DIRECT_ANSWER_MODE: str = "strict"
+    FANOUT_ENABLED: bool = True
+    FANOUT_MIN_SHARE: float = 0.75
+    ADMISSION_MAX_CONCURRENT: int = 32
+    ADMISSION_MAX_QUEUE: int = 128
+    ADMISSION_QUEUE_TIMEOUT: float = 30.0
+    STUDENT_MAX_PENDING: int = 1
+    MODEL_LIMITS_ENABLED: bool = True
+    MODEL_MAX_CONCURRENCY: int = 16
+    MODEL_REQUESTS_PER_MINUTE: float = 1000
+    MODEL_TOKENS_PER_MINUTE: float = 1_000_000
+    MODEL_LIMITS: Dict[str, Dict[str, float]] = {}
+    LLM_BACKEND: str = "gemini"
+    FAKE_LLM_MODELS: Dict[str, str] = {"tutor_orchestrator": "fake/tutor?latency=0.4&sigma=0.4", \
+        "internal_query_classifier": "fake/classifier?latency=0.25&sigma=0.3", \
+            "math_specialist": "fake/math?latency=0.8&sigma=0.5&words=120&chunks=8&chunk_latency=0.05", \
+                "physics_specialist": "fake/physics?latency=0.9&sigma=0.5&words=150&chunks=8&chunk_latency=0.05"}
+    MODEL_HEDGING_ENABLED: bool = True
+    MODEL_FALLBACKS: Dict[str, List[str]] = {"tutor_orchestrator": ["gemini-2.0-flash"], \
+        "internal_query_classifier": ["gemini-2.0-flash"], "math_specialist": ["gemini-1.5-flash-latest"], \
+            "physics_specialist": ["gemini-2.0-flash"]}
+    MODEL_HEDGE_PERCENTILE: float = 95.0
+    MODEL_HEDGE_DELAY: float = 8.0
+    MODEL_HEDGE_MIN_SAMPLES: int = 20
+    MODEL_HEDGE_BUDGET_PER_MINUTE: int = 120
+    MODEL_LATENCY_WINDOW: int = 200
+    MODEL_DEMOTE_FAILURES: int = 3
+    MODEL_DEMOTE_SECONDS: float = 60.0
+    MODEL_DEMOTE_HEDGE_RATE: float = 0.5
+    SPECULATIVE_DISPATCH: bool = False
+    SPECULATION_MIN_CONFIDENCE: float = 0.6
+    SPECULATION_BUDGET_PER_MINUTE: int = 60
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    RESPONSE_CACHE_TTL: float = 900
+    RESPONSE_CACHE_DISK_PATH: Optional[str] = ".cache/responses.sqlite3"
+    RESPONSE_CACHE_FLUSH_INTERVAL: float = 1.0
+    RESPONSE_CACHE_PRUNE_INTERVAL: float = 60.0
+    COALESCE_REQUESTS: bool = True
+    TRACING_ENABLED: bool = True
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    PROFILE_SAMPLE_INTERVAL: float = 0.005
+    PROFILE_MAX_SECONDS: float = 60
+    LOOP_MONITOR_ENABLED: bool = False
+    LOOP_MONITOR_INTERVAL: float = 0.05
+    LOOP_LAG_THRESHOLD: float = 0.1
+    GC_FREEZE_AT_STARTUP: bool = True
+    ADMIN_TOKEN: Optional[str] = None
+    SESSION_BACKEND: str = "sqlite"
+    SESSION_DB_PATH: str = ".cache/sessions.sqlite3"
+    MAX_SESSIONS: int = 1000
+    SESSION_TIMEOUT: float = 3600
+    SESSION_FLUSH_INTERVAL: float = 2.0
+    SESSION_FLUSH_BATCH_SIZE: int = 256
+    CLASSIFIER_STATELESS: bool = True
+    CONTEXT_WINDOW_ENABLED: bool = True
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {"tutor_orchestrator": 4000, "math_specialist": 8000, "physics_specialist": 8000}
+    CONTEXT_KEEP_TURNS: int = 6
+    CONTEXT_SUMMARY_MAX_TOKENS: int = 600
+    CONTEXT_SUMMARY_MODEL: Optional[str] = None
+    CALCULATOR_MAX_EXPRESSION_LENGTH: int = 500
+    CALCULATOR_MAX_RESULT_DIGITS: int = 3000
+    CALCULATOR_MAX_OPERATIONS: int = 500
+    CALCULATOR_MAX_DEPTH: int = 50
+    CALCULATOR_INLINE_WORK: float = 50_000
+    CALCULATOR_TIMEOUT: float = 2.0
+    CALCULATOR_WORKERS: int = 2
     model_config = SettingsConfigDict(env_file = ".env", env_file_encoding = "utf-8", \
         extra = "ignore", case_sensitive = False)
 settings = Settings()
@@ -0,0 +1,131 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from common.config import settings
+from common.log import get_logger
+
+logger = get_logger(__name__)
+Summarizer = Callable[[str, List[types.Content]], Awaitable[str]]
+
+def estimate_tokens(contents: List[types.Content]) -> int:
+    # ~4 characters per token is close enough for budgeting without a tokenizer round trip
+    chars = 0
+    for content in contents:
+        for part in content.parts or []:
+            if part.text: chars += len(part.text)
+            if part.function_call: chars += len(str(part.function_call.args or {})) + len(part.function_call.name or "")
+            if part.function_response: chars += len(str(part.function_response.response or {}))
+    return chars // 4 + 1
+
+def split_turns(contents: List[types.Content]) -> List[List[types.Content]]:
+    # A turn starts at each user message carrying text, so tool call/response pairs stay together
+    turns: List[List[types.Content]] = []
+    for content in contents:
+        starts_turn = content.role == "user" and any(part.text for part in content.parts or [])
+        if starts_turn or not turns: turns.append([])
+        turns[-1].append(content)
+    return turns
+
+async def extractive_summarizer(previous_summary: str, contents: List[types.Content]) -> str:
+    lines = [previous_summary] if previous_summary else []
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                first_sentence = part.text.strip().split("\n")[0].split(". ")[0][:200]
+                if first_sentence: lines.append(f"{'Student' if content.role == 'user' else 'Tutor'}: {first_sentence}")
+            elif part.function_call: lines.append(f"Tutor used tool {part.function_call.name}")
+    return "\n".join(lines)
+
+class SessionSummary:
+    def __init__(self) -> None:
+        self.text = ""
+        self.folded = 0
+        self.task: Optional[asyncio.Task] = None
+
+class ContextWindowManager:
+    # Keeps each agent's request under its token budget: the last turns go verbatim, older turns are
+    # folded into a running summary that is extended in the background as turns age out of the window
+    def __init__(self, token_budgets: Dict[str, int], keep_turns: int = 6, summary_max_tokens: int = 600, \
+        summarizer: Optional[Summarizer] = None, max_sessions: int = 1000) -> None:
+        self.token_budgets = token_budgets
+        self.keep_turns = keep_turns
+        self.summary_max_chars = summary_max_tokens * 4
+        self.summarizer = summarizer or extractive_summarizer
+        self.max_sessions = max_sessions
+        self.summaries: "OrderedDict[str, SessionSummary]" = OrderedDict()
+        self.tokens_saved: Dict[str, int] = {}
+
+    async def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        budget = self.token_budgets.get(callback_context.agent_name)
+        if not budget: return None
+        session_id = callback_context._invocation_context.session.id
+        original_tokens = estimate_tokens(llm_request.contents)
+        if original_tokens <= budget: return None
+        turns = split_turns(llm_request.contents)
+        kept = turns[-self.keep_turns:]
+        while len(kept) > 1 and sum(estimate_tokens(turn) for turn in kept) > budget: kept = kept[1:]
+        older = [content for turn in turns[:len(turns) - len(kept)] for content in turn]
+        if not older: return None
+        summary = self.summary_for(session_id)
+        if summary.folded > len(older): summary.text, summary.folded = "", 0
+        gap = older[summary.folded:]
+        summary_text = summary.text
+        if gap:
+            summary_text = await extractive_summarizer(summary_text, gap)
+            self.schedule_fold(summary, older)
+        summary_text = summary_text[-self.summary_max_chars:]
+        llm_request.contents = [
+            types.Content(role = "user", parts = [types.Part.from_text(text = \
+                f"Summary of our earlier conversation:\n{summary_text}")]),
+            types.Content(role = "model", parts = [types.Part.from_text(text = "Thanks, I'll keep that in mind.")]),
+        ] + [content for turn in kept for content in turn]
+        saved = original_tokens - estimate_tokens(llm_request.contents)
+        self.tokens_saved[session_id] = self.tokens_saved.get(session_id, 0) + max(saved, 0)
+        return None
+
+    def summary_for(self, session_id: str) -> SessionSummary:
+        summary = self.summaries.get(session_id)
+        if summary is None:
+            summary = self.summaries[session_id] = SessionSummary()
+            if len(self.summaries) > self.max_sessions: self.summaries.popitem(last = False)
+        self.summaries.move_to_end(session_id)
+        return summary
+
+    def schedule_fold(self, summary: SessionSummary, older: List[types.Content]) -> None:
+        # Only one fold per session runs at a time; a request arriving meanwhile uses the inline digest
+        if summary.task and not summary.task.done(): return
+        async def fold() -> None:
+            # A failed summarizer call falls back to the inline digest, so the summary still moves forward
+            target = len(older)
+            gap = older[summary.folded:target]
+            try: text = await self.summarizer(summary.text, gap)
+            except Exception:
+                logger.exception("Summarizing older turns failed; using the extractive digest")
+                text = await extractive_summarizer(summary.text, gap)
+            summary.text, summary.folded = text[-self.summary_max_chars:], target
+        summary.task = asyncio.get_running_loop().create_task(fold())
+
+    def take_tokens_saved(self, session_id: str) -> int: return self.tokens_saved.pop(session_id, 0)
+
+def llm_summarizer(model: str) -> Summarizer:
+    async def summarize(previous_summary: str, contents: List[types.Content]) -> str:
+        from google import genai
+        transcript = "\n".join(f"{content.role}: {part.text}" for content in contents \
+            for part in content.parts or [] if part.text)
+        response = await genai.Client().aio.models.generate_content(model = model, contents = \
+            "Update this running summary of a tutoring conversation with the new turns. Keep key facts, " \
+            f"results and the student's difficulties, in under 150 words.\n\nSummary so far:\n{previous_summary}\n\n" \
+            f"New turns:\n{transcript}")
+        return response.text or previous_summary
+    return summarize
+
+def context_window_from_settings() -> Optional[ContextWindowManager]:
+    if not settings.CONTEXT_WINDOW_ENABLED: return None
+    return ContextWindowManager(settings.CONTEXT_TOKEN_BUDGETS, keep_turns = settings.CONTEXT_KEEP_TURNS, \
+        summary_max_tokens = settings.CONTEXT_SUMMARY_MAX_TOKENS, summarizer = llm_summarizer(settings.CONTEXT_SUMMARY_MODEL) \
+            if settings.CONTEXT_SUMMARY_MODEL else None, max_sessions = settings.MAX_SESSIONS)
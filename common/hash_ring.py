@@ -0,0 +1,47 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List
+
+
+def ring_hash(key: str) -> int: return int.from_bytes(hashlib.blake2b(key.encode(), digest_size = 8).digest(), "big")
+
+class HashRing:
+    # Consistent hashing with virtual nodes: adding or removing a node only moves the keys in the arcs it
+    # gains or loses (about 1/N of them) and leaves every other key on the node it was on
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 128) -> None:
+        self.vnodes = vnodes
+        self.points: List[int] = []
+        self.owners: Dict[int, str] = {}
+        for node in nodes: self.add(node)
+
+    @property
+    def nodes(self) -> List[str]: return sorted(set(self.owners.values()))
+
+    def add(self, node: str) -> None:
+        for replica in range(self.vnodes):
+            point = ring_hash(f"{node}#{replica}")
+            if point in self.owners: continue
+            self.owners[point] = node
+            bisect.insort(self.points, point)
+
+    def remove(self, node: str) -> None:
+        self.points = [point for point in self.points if self.owners[point] != node]
+        self.owners = {point: owner for point, owner in self.owners.items() if owner != node}
+
+    def node_for(self, key: str) -> str:
+        if not self.points: raise LookupError("Hash ring has no nodes")
+        index = bisect.bisect(self.points, ring_hash(key)) % len(self.points)
+        return self.owners[self.points[index]]
+
+    def shares(self) -> Dict[str, float]:
+        # Fraction of the key space each node owns
+        space, shares = 2 ** 64, {node: 0.0 for node in self.nodes}
+        for index, point in enumerate(self.points):
+            previous = self.points[index - 1] if index else self.points[-1] - space
+            shares[self.owners[point]] += (point - previous) / space
+        return shares
+
+    def copy(self) -> "HashRing":
+        ring = HashRing(vnodes = self.vnodes)
+        ring.points, ring.owners = list(self.points), dict(self.owners)
+        return ring
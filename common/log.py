@@ -0,0 +1,66 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from common.config import settings
+from common.tracing import current_ids
+
+# Attributes every LogRecord has; anything else on a record came from `extra` and is logged as a field
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+class StructuredFormatter(logging.Formatter):
+    # One record per line: time, level, logger and message, the trace and span the record was logged in,
+    # and every `extra` field; as JSON (LOG_FORMAT=json) or as "key=value" pairs after the message (text)
+    def __init__(self, json_lines: bool = True) -> None:
+        super().__init__()
+        self.json_lines = json_lines
+
+    def fields(self, record: logging.LogRecord) -> Dict[str, Any]:
+        fields = {**current_ids(), **{name: value for name, value in vars(record).items() if name not in RECORD_ATTRIBUTES}}
+        if record.exc_info: fields["exception"] = self.formatException(record.exc_info)
+        return fields
+
+    def format(self, record: logging.LogRecord) -> str:
+        timestamp = datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec = "milliseconds")
+        if self.json_lines:
+            return json.dumps({"time": timestamp, "level": record.levelname, "logger": record.name, \
+                "message": record.getMessage(), **self.fields(record)}, default = str)
+        fields = " ".join(f"{name}={value}" for name, value in self.fields(record).items() if name != "exception")
+        line = f"{timestamp} {record.levelname} {record.name}: {record.getMessage()}" + (f" [{fields}]" if fields else "")
+        return f"{line}\n{self.formatException(record.exc_info)}" if record.exc_info else line
+
+class FormattedQueueHandler(logging.handlers.QueueHandler):
+    # Formats on the calling thread, where the trace context is visible, and leaves the write to the listener
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        prepared = logging.makeLogRecord({"name": record.name, "levelno": record.levelno, \
+            "levelname": record.levelname, "created": record.created})
+        prepared.msg = self.format(record)
+        return prepared
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging() -> None:
+    # Records go through a queue to a background thread, so logging never blocks the event loop on I/O
+    global _listener
+    if _listener is not None: return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = FormattedQueueHandler(records)
+    handler.setFormatter(StructuredFormatter(settings.LOG_FORMAT == "json"))
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(logging.Formatter("%(message)s"))
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+    atexit.register(_listener.stop)
+    root = logging.getLogger("tutor")
+    root.setLevel(settings.LOG_LEVEL.upper())
+    root.addHandler(handler)
+    root.propagate = False
+
+def get_logger(name: str) -> logging.Logger:
+    configure_logging()
+    return logging.getLogger(f"tutor.{name}")
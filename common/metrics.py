@@ -0,0 +1,81 @@
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Upper bounds (seconds) of the latency histograms; Prometheus' defaults stretched to cover slow model calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        with self._lock: self.counters[name] += amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self.histograms: self.histograms[key] = Histogram(LATENCY_BUCKETS)
+            self.histograms[key].observe(value)
+
+    def get(self, name: str) -> float: return self.counters.get(name, 0)
+
+    def ratio(self, numerator: str, *others: str) -> float:
+        # numerator / (numerator + others), 0.0 when nothing was counted yet
+        hits = self.get(numerator)
+        total = hits + sum(self.get(name) for name in others)
+        return hits / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock: return dict(self.counters)
+
+    def prometheus(self, prefix: str = "tutor") -> str:
+        # Prometheus text exposition format. Counters named "<metric>.<key>" (per-model or per-agent
+        # counters) become one metric with a `key` label; histograms are cumulative per label set
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: (list(h.counts), h.sum, h.count) for key, h in self.histograms.items()}
+        families: Dict[str, List[str]] = defaultdict(list)
+        for name, value in sorted(counters.items()):
+            base, _, key = name.partition(".")
+            metric = f"{prefix}_{metric_name(base)}_total"
+            families[f"# TYPE {metric} counter"].append(f"{metric}{format_labels((('key', key),) if key else ())} {value:g}")
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            metric = f"{prefix}_{metric_name(name)}"
+            lines, cumulative = families[f"# TYPE {metric} histogram"], 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{metric}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+        return "".join(f"{header}\n" + "".join(f"{line}\n" for line in lines) for header, lines in families.items())
+
+def metric_name(name: str) -> str: return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+def format_labels(labels: Labels) -> str:
+    if not labels: return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f"{metric_name(name)}=\"{value}\"" for (name, _), value in zip(labels, escaped)) + "}"
+
+metrics = MetricsRegistry()
@@ -0,0 +1,204 @@
+import asyncio
+import time
+from collections import Counter, deque
+from typing import AsyncGenerator, Dict, Iterable, List, Optional, Set, Tuple
+
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+
+from common.a2a_client import CircuitBreaker
+from common.admission import limit_agent_model, limit_llm
+from common.config import settings
+from common.log import get_logger
+from common.metrics import metrics
+from common.speculation import SpeculationBudget
+from common.standin_llm import apply_llm_backend, is_offline_model
+from common.tracing import trace_agent_model, trace_llm
+from common.utils import model_layers
+
+logger = get_logger(__name__)
+
+class ModelHealth:
+    # Rolling time-to-first-response of one model, plus a breaker that demotes the model after consecutive
+    # errors, or once at least `demote_hedge_rate` of its recent calls lost a hedge. A demoted model is
+    # passed over for `demote_seconds`, then one call probes it and decides whether it is promoted again
+    def __init__(self, model: str, window: int, demote_failures: int, demote_seconds: float, \
+        demote_hedge_rate: float, min_samples: int) -> None:
+        self.model = model
+        self.latencies: deque = deque(maxlen = window)
+        self.hedges_lost: deque = deque(maxlen = window)
+        self.breaker = CircuitBreaker(demote_failures, demote_seconds)
+        self.demote_hedge_rate = demote_hedge_rate
+        self.min_samples = min_samples
+        self.counts: Counter = Counter()
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self.latencies: return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+    def record_success(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+        self.hedges_lost.append(False)
+        self.breaker.record_success()
+        self.counts["succeeded"] += 1
+
+    def record_error(self) -> None:
+        self.breaker.record_failure()
+        self.counts["errors"] += 1
+        if self.breaker.state == "open": metrics.increment(f"model_demoted.{self.model}")
+
+    def record_lost_hedge(self, seconds: float) -> None:
+        # The call took at least `seconds`, so that still joins the latency window
+        self.latencies.append(seconds)
+        self.hedges_lost.append(True)
+        self.counts["hedges_lost"] += 1
+        if self.breaker.probing: self.breaker.record_failure()
+        elif len(self.hedges_lost) >= self.min_samples and \
+            sum(self.hedges_lost) >= self.demote_hedge_rate * len(self.hedges_lost):
+            self.breaker.trip()
+            self.hedges_lost.clear()
+            metrics.increment(f"model_demoted.{self.model}")
+
+    def stats(self) -> Dict[str, float]:
+        return {"p50": self.percentile(50), "p99": self.percentile(99), "samples": len(self.latencies), \
+            "state": "demoted" if self.breaker.state == "open" else self.breaker.state, **self.counts}
+
+_model_health: Dict[str, ModelHealth] = {}
+
+def model_health(model: str) -> ModelHealth:
+    # One health record per model name, shared by every agent that can use the model
+    if model not in _model_health:
+        _model_health[model] = ModelHealth(model, settings.MODEL_LATENCY_WINDOW, settings.MODEL_DEMOTE_FAILURES, \
+            settings.MODEL_DEMOTE_SECONDS, settings.MODEL_DEMOTE_HEDGE_RATE, settings.MODEL_HEDGE_MIN_SAMPLES)
+    return _model_health[model]
+
+def model_health_stats() -> Dict[str, Dict[str, float]]:
+    return {model: health.stats() for model, health in _model_health.items()}
+
+Racer = Tuple[BaseLlm, AsyncGenerator[LlmResponse, None], float]
+
+class HedgedLlm(BaseLlm):
+    # Runs each call on the first healthy model in `candidates` (in preference order). If no response has
+    # arrived once the call passes that model's `hedge_percentile` latency, a duplicate goes to the next
+    # healthy model and the first to respond wins; the other is cancelled. A model that fails is replaced
+    # by the next one at once. Hedges draw on a shared budget so a slow provider cannot double the load
+    candidates: List[BaseLlm]
+    budget: SpeculationBudget
+    hedge_percentile: float = 95.0
+    hedge_delay: float = 8.0
+    min_samples: int = 20
+
+    def hedge_after(self, llm: BaseLlm) -> float:
+        health = model_health(llm.model)
+        if len(health.latencies) < max(self.min_samples, 1): return self.hedge_delay
+        return health.percentile(self.hedge_percentile)
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        remaining = list(self.candidates)
+        racers: Dict[asyncio.Task, Racer] = {}
+
+        def next_candidate() -> Optional[BaseLlm]:
+            # Demoted models are skipped while any healthy one is left
+            for llm in remaining:
+                if model_health(llm.model).breaker.allow():
+                    remaining.remove(llm)
+                    return llm
+            return remaining.pop(0) if remaining else None
+
+        def launch(llm: BaseLlm) -> float:
+            request = llm_request.model_copy(update = {"model": llm.model, "contents": list(llm_request.contents)})
+            responses = llm.generate_content_async(request, stream)
+            racers[asyncio.ensure_future(responses.__anext__())] = (llm, responses, time.monotonic())
+            return time.monotonic() + self.hedge_after(llm)
+
+        primary = next_candidate()
+        hedge_at, hedged, error = launch(primary), False, None
+        winner: Optional[Tuple[BaseLlm, AsyncGenerator[LlmResponse, None], Optional[LlmResponse]]] = None
+        try:
+            while winner is None:
+                timeout = None if hedged or not remaining else max(hedge_at - time.monotonic(), 0.0)
+                done, _ = await asyncio.wait(racers, timeout = timeout, return_when = asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if self.budget.try_acquire() and (alternate := next_candidate()):
+                        metrics.increment("model_hedges")
+                        launch(alternate)
+                    continue
+                for task in done:
+                    llm, responses, started = racers.pop(task)
+                    failure, first = task.exception(), None
+                    # A model that returns no response at all has still answered
+                    if isinstance(failure, StopAsyncIteration): failure = None
+                    elif failure is None: first = task.result()
+                    if failure is None and winner is None:
+                        model_health(llm.model).record_success(time.monotonic() - started)
+                        winner = (llm, responses, first)
+                        continue
+                    if failure is not None:
+                        error = failure
+                        model_health(llm.model).record_error()
+                    await responses.aclose()
+                if winner is None and not racers:
+                    # Every model tried so far failed outright: fall back to the next one without waiting
+                    if not (primary := next_candidate()): raise error
+                    logger.warning("Model call failed; falling back", extra = {"error": str(error), "fallback": primary.model})
+                    metrics.increment("model_fallbacks")
+                    hedge_at, hedged = launch(primary), False
+        finally:
+            for task, (llm, responses, started) in racers.items():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions = True)
+                await responses.aclose()
+                health = model_health(llm.model)
+                if winner is not None and llm is primary: health.record_lost_hedge(time.monotonic() - started)
+                else: health.breaker.abandon_probe()
+        llm, responses, first = winner
+        if llm is not primary: metrics.increment("model_hedges_won")
+        try:
+            if first is None: return
+            yield first
+            async for response in responses: yield response
+        finally: await responses.aclose()
+
+def resolve_llm(model: str) -> BaseLlm:
+    llm = LLMRegistry.new_llm(model)
+    return trace_llm(limit_llm(llm) if settings.MODEL_LIMITS_ENABLED else llm)
+
+def configured_fallbacks(agent_name: str) -> List[str]:
+    # With the fake backend only offline alternates are kept, so nothing reaches the network
+    alternates = settings.MODEL_FALLBACKS.get(agent_name, [])
+    return [model for model in alternates if is_offline_model(model)] if settings.LLM_BACKEND == "fake" else alternates
+
+def hedge_agent_model(agent: LlmAgent, alternates: List[str]) -> None:
+    # Gives the agent alternate models to hedge to and fall back on; its current model stays preferred
+    if not alternates or any(isinstance(layer, HedgedLlm) for layer in model_layers(agent.model)): return
+    primary = agent.model if isinstance(agent.model, BaseLlm) else resolve_llm(agent.model)
+    agent.model = HedgedLlm(model = primary.model, candidates = [primary] + [resolve_llm(model) for model in alternates], \
+        budget = hedge_budget(), hedge_percentile = settings.MODEL_HEDGE_PERCENTILE, \
+            hedge_delay = settings.MODEL_HEDGE_DELAY, min_samples = settings.MODEL_HEDGE_MIN_SAMPLES)
+
+# Agents are module-level objects, so their models are wrapped once per process, however many systems or
+# agent apps are built on them. Wrapping again would nest a second hedging layer inside new limiters and
+# tracers: two sets of hedge timers per call, and the hedge budget spent twice
+_wrapped_agents: Set[str] = set()
+
+def wrap_agent_models(agents: Iterable[LlmAgent]) -> None:
+    # Backend, then per-model limits, tracing and hedging, outermost last
+    for agent in agents:
+        if agent.name in _wrapped_agents: continue
+        apply_llm_backend([agent])
+        if settings.MODEL_LIMITS_ENABLED: limit_agent_model(agent)
+        if settings.TRACING_ENABLED: trace_agent_model(agent)
+        if settings.MODEL_HEDGING_ENABLED: hedge_agent_model(agent, configured_fallbacks(agent.name))
+        _wrapped_agents.add(agent.name)
+
+_hedge_budget: Optional[SpeculationBudget] = None
+
+def hedge_budget() -> SpeculationBudget:
+    global _hedge_budget
+    if _hedge_budget is None: _hedge_budget = SpeculationBudget(settings.MODEL_HEDGE_BUDGET_PER_MINUTE)
+    return _hedge_budget
@@ -0,0 +1,239 @@
+import asyncio
+import gc
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import CodeType, FrameType
+from typing import Any, Dict, Iterator, List, Optional
+
+from common.config import settings
+from common.log import get_logger
+from common.metrics import metrics
+from common.tracing import restore, task_trace_id
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+logger = get_logger(__name__)
+
+class Capture:
+    # Stacks sampled for one profile, kept as folded stacks ("root;...;leaf count"): the format that
+    # flamegraph.pl, inferno and speedscope read
+    def __init__(self, name: str, all_threads: bool = False) -> None:
+        self.name = name
+        self.all_threads = all_threads
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+
+    def folded(self) -> str: return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "samples": self.samples, "stacks": len(self.stacks), \
+            "seconds": round((self.ended or time.perf_counter()) - self.started, 3)}
+
+# The capture a flagged request is being profiled into; tasks the request starts inherit it
+_profiled: ContextVar[Optional[Capture]] = ContextVar("profiled", default = None)
+
+class SamplingProfiler:
+    # Samples the event loop thread's stack (or every thread's) from a background thread while at least
+    # one capture is open. With none open there is no thread, so an idle profiler costs nothing
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.captures: List[Capture] = []
+        self.labels: Dict[CodeType, str] = {}
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[int] = None
+
+    def start(self, capture: Capture) -> None:
+        # Called on the event loop, which is the thread that gets sampled
+        with self.lock:
+            self.loop, self.loop_thread = asyncio.get_running_loop(), threading.get_ident()
+            self.captures.append(capture)
+            if self.thread is None:
+                self.thread = threading.Thread(target = self.run, name = "sampling-profiler", daemon = True)
+                self.thread.start()
+
+    def stop(self, capture: Capture) -> None:
+        with self.lock:
+            if capture in self.captures: self.captures.remove(capture)
+        capture.ended = time.perf_counter()
+
+    async def capture(self, seconds: float, all_threads: bool = False) -> Capture:
+        current = Capture("timed", all_threads)
+        self.start(current)
+        try: await asyncio.sleep(seconds)
+        finally: self.stop(current)
+        return current
+
+    @contextmanager
+    def request(self) -> Iterator[Capture]:
+        # Profiles one request: only samples taken while one of its tasks runs on the loop count. Work it
+        # hands to other threads or processes is not sampled
+        current = Capture("request")
+        token = _profiled.set(current)
+        self.start(current)
+        try: yield current
+        finally:
+            self.stop(current)
+            restore(_profiled, token, None)
+
+    def run(self) -> None:
+        while True:
+            with self.lock:
+                if not self.captures:
+                    self.thread = None
+                    return
+                captures = list(self.captures)
+            self.sample(captures)
+            time.sleep(self.interval)
+
+    def sample(self, captures: List[Capture]) -> None:
+        frames = sys._current_frames()
+        loop_frame = frames.get(self.loop_thread)
+        task = asyncio.current_task(self.loop)
+        owner = task.get_context().get(_profiled) if task else None
+        loop_stack = self.folded(loop_frame) if loop_frame else None
+        thread_stacks = None
+        for current in captures:
+            if current.name == "request":
+                if owner is not current or loop_stack is None: continue
+                current.stacks[loop_stack] += 1
+            elif current.all_threads:
+                if thread_stacks is None:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    thread_stacks = [f"{names.get(ident, ident)};{self.folded(frame)}" \
+                        for ident, frame in frames.items() if ident != threading.get_ident()]
+                current.stacks.update(thread_stacks)
+            elif loop_stack is not None: current.stacks[loop_stack] += 1
+            current.samples += 1
+
+    def folded(self, frame: FrameType) -> str:
+        labels = []
+        while frame is not None:
+            labels.append(self.label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def label(self, code: CodeType) -> str:
+        # "function (path:first line)": one label per function, with paths relative to this repo or to
+        # the package directory for library code
+        label = self.labels.get(code)
+        if label is None:
+            path = code.co_filename
+            path = os.path.relpath(path, ROOT) if path.startswith(ROOT) else os.path.join(*path.split(os.sep)[-2:])
+            label = self.labels[code] = f"{code.co_qualname} ({path}:{code.co_firstlineno})"
+        return label
+
+class LoopLagMonitor:
+    # A heartbeat on the event loop measures how late each tick runs. A watchdog thread notices when the
+    # heartbeat stops, and logs the stack the loop thread is stuck in while the blocking call is still running.
+    # Garbage collection holds the GIL, so the watchdog cannot look until it ends; time spent collecting is
+    # counted separately and reported with the stall
+    def __init__(self, interval: float, threshold: float) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.beat = time.monotonic()
+        self.gc_seconds = 0.0
+        self.gc_at_beat = 0.0
+        self.gc_started: Optional[float] = None
+        self.stalls = 0
+        self.max_lag = 0.0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[int] = None
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        self.stopping = threading.Event()
+
+    def start(self) -> None:
+        self.loop, self.loop_thread = asyncio.get_running_loop(), threading.get_ident()
+        self.beat = time.monotonic()
+        self.heartbeat_task = self.loop.create_task(self.heartbeat(), name = "loop-lag-heartbeat")
+        gc.callbacks.append(self.collecting)
+        threading.Thread(target = self.watch, name = "loop-lag-watchdog", daemon = True).start()
+
+    def stop(self) -> None:
+        self.stopping.set()
+        if self.heartbeat_task: self.heartbeat_task.cancel()
+        if self.collecting in gc.callbacks: gc.callbacks.remove(self.collecting)
+
+    def collecting(self, phase: str, info: Dict[str, Any]) -> None:
+        if phase == "start": self.gc_started = time.monotonic()
+        elif self.gc_started is not None:
+            self.gc_seconds += time.monotonic() - self.gc_started
+            self.gc_started = None
+
+    async def heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.beat, self.gc_at_beat = time.monotonic(), self.gc_seconds
+            lag = max(self.beat - expected, 0.0)
+            metrics.observe("event_loop_lag_seconds", lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self.stalls += 1
+                metrics.increment("event_loop_stalls")
+
+    def watch(self) -> None:
+        reported = None
+        while not self.stopping.wait(self.threshold / 2):
+            beat, gc_at_beat = self.beat, self.gc_at_beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or beat == reported: continue
+            # Once per stall; the stack is where the loop thread is right now, inside the blocking call. A loop
+            # found waiting in select was held up by another thread keeping the GIL, or resumed before we looked;
+            # gc_ms says how much of the stall was garbage collection
+            reported = beat
+            frame = sys._current_frames().get(self.loop_thread)
+            task = asyncio.current_task(self.loop)
+            logger.warning("Event loop blocked", extra = {"blocked_ms": round(blocked * 1000, 1), \
+                "task": task.get_name() if task else None, **({"trace_id": trace_id} \
+                    if task and (trace_id := task_trace_id(task)) else {}), "loop_idle": self.idle(frame), \
+                        "gc_ms": round((self.gc_seconds - gc_at_beat) * 1000, 1), \
+                            "stack": "".join(traceback.format_stack(frame)) if frame else None})
+
+    @staticmethod
+    def idle(frame: Optional[FrameType]) -> bool:
+        while frame is not None:
+            if frame.f_code.co_filename.endswith("selectors.py"): return True
+            frame = frame.f_back
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"threshold": self.threshold, "stalls": self.stalls, "max_lag": self.max_lag, "gc_seconds": self.gc_seconds}
+
+_profiler: Optional[SamplingProfiler] = None
+_loop_monitor: Optional[LoopLagMonitor] = None
+
+def get_profiler() -> SamplingProfiler:
+    global _profiler
+    if _profiler is None: _profiler = SamplingProfiler(settings.PROFILE_SAMPLE_INTERVAL)
+    return _profiler
+
+def freeze_startup_heap() -> None:
+    # Everything imported at startup (ADK, genai, pydantic models) lives for the whole process. Freezing it
+    # keeps full collections from walking it again, which otherwise stalls the loop for hundreds of ms
+    if not settings.GC_FREEZE_AT_STARTUP: return
+    gc.collect()
+    gc.freeze()
+
+def start_loop_monitor() -> None:
+    # Runs on the event loop at startup; with LOOP_MONITOR_ENABLED off nothing is started
+    global _loop_monitor
+    if not settings.LOOP_MONITOR_ENABLED or _loop_monitor is not None: return
+    _loop_monitor = LoopLagMonitor(settings.LOOP_MONITOR_INTERVAL, settings.LOOP_LAG_THRESHOLD)
+    _loop_monitor.start()
+
+def stop_loop_monitor() -> None:
+    global _loop_monitor
+    if _loop_monitor is not None: _loop_monitor.stop()
+    _loop_monitor = None
+
+def loop_monitor_stats() -> Optional[Dict[str, Any]]:
+    return _loop_monitor.stats() if _loop_monitor else None
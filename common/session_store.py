@@ -0,0 +1,221 @@
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session
+from google.adk.sessions.base_session_service import (GetSessionConfig,
+                                                      ListSessionsResponse)
+
+from common.config import settings
+from common.log import get_logger
+
+SessionKey = Tuple[str, str, str]
+logger = get_logger(__name__)
+
+class SQLiteSessionService(BaseSessionService):
+    # Hot sessions live in a bounded LRU; new events are buffered and written behind in batches, idle or
+    # overflowing sessions are flushed and dropped from memory, and evicted sessions rehydrate on next access
+    def __init__(self, db_path: str, max_sessions_in_memory: int = 1000, idle_timeout: float = 3600, \
+        flush_interval: float = 2.0, flush_batch_size: int = 256) -> None:
+        self.db_path = db_path
+        self.max_sessions_in_memory = max_sessions_in_memory
+        self.idle_timeout = idle_timeout
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.hot: "OrderedDict[SessionKey, Session]" = OrderedDict()
+        self.last_access: Dict[SessionKey, float] = {}
+        self.pending_events: Dict[SessionKey, List[Event]] = {}
+        self.dirty: set = set()
+        # Keys whose batch is being written; until the write returns the database still holds older rows
+        self.flushing: set = set()
+        self._db_lock = threading.Lock()
+        self._worker: Optional[asyncio.Task] = None
+        # Created on first use, on the loop that serves requests: this service is a process-wide singleton
+        self._flush_lock: Optional[asyncio.Lock] = None
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok = True)
+        self.db = sqlite3.connect(db_path, check_same_thread = False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS sessions (app_name TEXT, user_id TEXT, session_id TEXT, " \
+            "state TEXT, last_update_time REAL, PRIMARY KEY (app_name, user_id, session_id))")
+        self.db.execute("CREATE TABLE IF NOT EXISTS events (app_name TEXT, user_id TEXT, session_id TEXT, " \
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, event TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS events_session ON events (app_name, user_id, session_id, seq)")
+        self.db.commit()
+
+    async def create_session(self, *, app_name: str, user_id: str, \
+        state: Optional[Dict[str, Any]] = None, session_id: Optional[str] = None) -> Session:
+        self._ensure_worker()
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        session = Session(app_name = app_name, user_id = user_id, id = session_id, \
+            state = state or {}, last_update_time = time.time())
+        key = (app_name, user_id, session_id)
+        self._remember(key, session)
+        self.pending_events[key] = []
+        self.dirty.add(key)
+        await self._evict_overflow()
+        return copy.deepcopy(session)
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str, \
+        config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        self._ensure_worker()
+        key = (app_name, user_id, session_id)
+        session = self.hot.get(key)
+        if session is None:
+            session = await asyncio.to_thread(self._load, key)
+            if session is None: return None
+            self._remember(key, session)
+            await self._evict_overflow()
+        else: self._remember(key, session)
+        copied = copy.deepcopy(session)
+        if config:
+            if config.num_recent_events: copied.events = copied.events[-config.num_recent_events:]
+            if config.after_timestamp:
+                copied.events = [ev for ev in copied.events if ev.timestamp >= config.after_timestamp]
+        return copied
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        await self.flush()
+        with self._db_lock:
+            rows = self.db.execute("SELECT session_id, last_update_time FROM sessions " \
+                "WHERE app_name = ? AND user_id = ?", (app_name, user_id)).fetchall()
+        return ListSessionsResponse(sessions = [Session(app_name = app_name, user_id = user_id, \
+            id = session_id, last_update_time = updated) for session_id, updated in rows])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self.hot.pop(key, None); self.last_access.pop(key, None)
+        self.pending_events.pop(key, None); self.dirty.discard(key)
+        # Under the flush lock, so a batch already being written cannot put the session back afterwards
+        async with self.flush_lock(): await asyncio.to_thread(self._delete, key)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        await super().append_event(session = session, event = event)
+        if event.partial: return event
+        session.last_update_time = event.timestamp
+        key = (session.app_name, session.user_id, session.id)
+        stored = self.hot.get(key)
+        if stored is None:
+            stored = await asyncio.to_thread(self._load, key)
+            if stored is None: return event
+            self._remember(key, stored)
+        await super().append_event(session = stored, event = event)
+        stored.last_update_time = event.timestamp
+        self._remember(key, stored)
+        self.pending_events.setdefault(key, []).append(event)
+        self.dirty.add(key)
+        if len(self.dirty) >= self.flush_batch_size: await self.flush()
+        return event
+
+    async def flush(self) -> None:
+        # Serialized so event batches reach the database in the order they were appended
+        async with self.flush_lock():
+            if not self.dirty: return
+            batch = []
+            for key in list(self.dirty):
+                session = self.hot.get(key)
+                if session is None: continue
+                batch.append((key, json.dumps(session.state), session.last_update_time, \
+                    [ev.model_dump_json(exclude_none = True) for ev in self.pending_events.pop(key, [])]))
+            self.flushing, self.dirty = set(self.dirty), set()
+            try: await asyncio.to_thread(self._write, batch)
+            finally: self.flushing = set()
+
+    def flush_lock(self) -> asyncio.Lock:
+        if self._flush_lock is None: self._flush_lock = asyncio.Lock()
+        return self._flush_lock
+
+    async def evict_idle(self) -> int:
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [key for key, accessed in self.last_access.items() if accessed < cutoff]
+        await self._evict(idle)
+        return len(idle)
+
+    async def release(self) -> int:
+        # Flushes and forgets every hot session, so the next access re-reads the database. Used when another
+        # process that shares the database takes over some students
+        await self.flush()
+        released = len(self.hot)
+        await self._evict(list(self.hot.keys()))
+        return released
+
+    async def close(self) -> None:
+        if self._worker: self._worker.cancel()
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "sessions_in_memory": len(self.hot), "dirty_sessions": len(self.dirty), \
+            "max_sessions_in_memory": self.max_sessions_in_memory}
+
+    def _remember(self, key: SessionKey, session: Session) -> None:
+        self.hot[key] = session
+        self.hot.move_to_end(key)
+        self.last_access[key] = time.monotonic()
+
+    async def _evict_overflow(self) -> None:
+        overflow = len(self.hot) - self.max_sessions_in_memory
+        if overflow > 0: await self._evict(list(self.hot.keys())[:overflow])
+
+    async def _evict(self, keys: List[SessionKey]) -> None:
+        # A key is only dropped once its changes are in the database: flushing waits for a write in flight
+        if not keys: return
+        if any(key in self.dirty or key in self.flushing for key in keys): await self.flush()
+        for key in keys:
+            if key in self.dirty or key in self.flushing: continue
+            self.hot.pop(key, None); self.last_access.pop(key, None)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run_worker())
+
+    async def _run_worker(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                await self.evict_idle()
+            except Exception: logger.exception("Session store maintenance failed")
+
+    def _write(self, batch: List[Tuple[SessionKey, str, float, List[str]]]) -> None:
+        with self._db_lock:
+            for key, state, updated, events in batch:
+                self.db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)", (*key, state, updated))
+                self.db.executemany("INSERT INTO events (app_name, user_id, session_id, event) VALUES (?, ?, ?, ?)", \
+                    [(*key, event) for event in events])
+            self.db.commit()
+
+    def _delete(self, key: SessionKey) -> None:
+        with self._db_lock:
+            self.db.execute("DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+            self.db.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+            self.db.commit()
+
+    def _load(self, key: SessionKey) -> Optional[Session]:
+        with self._db_lock:
+            row = self.db.execute("SELECT state, last_update_time FROM sessions " \
+                "WHERE app_name = ? AND user_id = ? AND session_id = ?", key).fetchone()
+            if row is None: return None
+            events = self.db.execute("SELECT event FROM events WHERE app_name = ? AND user_id = ? " \
+                "AND session_id = ? ORDER BY seq", key).fetchall()
+        return Session(app_name = key[0], user_id = key[1], id = key[2], state = json.loads(row[0]), \
+            last_update_time = row[1], events = [Event.model_validate_json(ev) for (ev,) in events])
+
+_session_service: Optional[BaseSessionService] = None
+
+def get_session_service() -> BaseSessionService:
+    # One process-wide session service, chosen by SESSION_BACKEND
+    global _session_service
+    if _session_service is None:
+        if settings.SESSION_BACKEND == "sqlite":
+            _session_service = SQLiteSessionService(settings.SESSION_DB_PATH, \
+                max_sessions_in_memory = settings.MAX_SESSIONS, idle_timeout = settings.SESSION_TIMEOUT, \
+                    flush_interval = settings.SESSION_FLUSH_INTERVAL, flush_batch_size = settings.SESSION_FLUSH_BATCH_SIZE)
+        else: _session_service = InMemorySessionService()
+    return _session_service
@@ -0,0 +1,21 @@
+import threading
+import time
+
+
+class SpeculationBudget:
+    # Token bucket shared by the whole deployment: each speculative specialist run costs one token
+    def __init__(self, runs_per_minute: int) -> None:
+        self.capacity = float(max(runs_per_minute, 0))
+        self.tokens = self.capacity
+        self.refill_rate = self.capacity / 60.0
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, runs: int = 1) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+            self.updated_at = now
+            if self.tokens < runs: return False
+            self.tokens -= runs
+            return True
@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+import math
+import random
+import re
+from typing import Any, AsyncGenerator, Callable, Dict, Iterable, List, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+
+from common.config import settings
+
+# Latency profile of a stand-in model; every field can be overridden in the model name. The first response
+# arrives after `latency` seconds (+/- `jitter`, or log-normal around it when `sigma` is set), or after
+# `tail_latency` for a `tail` fraction of calls. Streamed text comes in `chunks` pieces `chunk_latency` apart
+DEFAULT_PROFILE = {"latency": 0.1, "jitter": 0.2, "sigma": 0.0, "tail": 0.0, "tail_latency": 5.0, "error_rate": 0.0, \
+    "words": 0, "chunks": 1, "chunk_latency": 0.0}
+ARITHMETIC = re.compile(r"[\d.(][\d.\s+\-*/^()]*[+\-*/^][\d.\s+\-*/^()]*[\d.)]")
+CONSTANT_NAMES = ("speed of light", "planck", "gravitational constant", "boltzmann", "avogadro", "elementary charge", \
+    "electron mass", "proton mass")
+
+# A script turns the conversation so far into the model's next move: ("call", (tool, args)) or ("text", text)
+Move = Tuple[str, Any]
+Script = Callable[[str, List[Dict[str, Any]], Iterable[str]], Move]
+
+def tutor_script(question: str, responses: List[Dict[str, Any]], tools: Iterable[str]) -> Move:
+    if "classify_student_query" in tools and not responses: return "call", ("classify_student_query", {"query": question})
+    subject = responses[-1].get("subject", "general") if responses else "general"
+    if subject in ("math", "physics"): return "text", f"Let me get our {subject} specialist for this. Classification: {subject}"
+    return "text", "Handling this general query: break the topic into small steps and practise each one."
+
+def classifier_script(question: str, responses: List[Dict[str, Any]], tools: Iterable[str]) -> Move:
+    from agents.tutor_orchestrator.query_router import query_router
+    return "text", query_router.route(question)[0]
+
+def math_script(question: str, responses: List[Dict[str, Any]], tools: Iterable[str]) -> Move:
+    expression = ARITHMETIC.search(question)
+    if expression and "calculate_expressions" in tools and not responses:
+        return "call", ("calculate_expressions", {"expressions": [f"result = {expression.group().strip()}"]})
+    if responses and responses[-1].get("status") == "success":
+        return "text", f"Working it through step by step, the result is {responses[-1]['results'][-1]['result']}."
+    return "text", f"Let's work through this together: {question}"
+
+def physics_script(question: str, responses: List[Dict[str, Any]], tools: Iterable[str]) -> Move:
+    from tools.formulas import FORMULAS
+    lowered = question.lower()
+    if not responses:
+        constant = next((name for name in CONSTANT_NAMES if name in lowered), None)
+        if constant and "lookup_constant" in tools: return "call", ("lookup_constant", {"const_name": constant})
+        formula = next((name for name in FORMULAS if name.replace("_", " ") in lowered), None)
+        if formula and "lookup_formula" in tools: return "call", ("lookup_formula", {"formula_name": formula})
+    if responses: return "text", f"From the reference data: {str(responses[-1])[:200]}"
+    return "text", f"Here is the physics behind it: {question}"
+
+# "fake/<label>" models follow the script for their label; any other label echoes the question
+SCRIPTS: Dict[str, Script] = {"tutor": tutor_script, "classifier": classifier_script, "math": math_script, \
+    "physics": physics_script}
+
+class StandInLlm(BaseLlm):
+    # Local stand-in backend for exercising the service without network calls. "standin/<label>?..." models
+    # echo the question; "fake/<label>?..." models follow the script for their label, including tool calls
+    # against the real tools. Both take the latency and failure profile from the name, for example
+    # "standin/slow?latency=0.5&tail=0.05&tail_latency=8&error_rate=0.1"; `overrides` changes it at run time
+    calls: int = 0
+    overrides: Dict[str, float] = {}
+
+    @classmethod
+    def supported_models(cls) -> list[str]: return [r"standin/.*", r"fake/.*"]
+
+    @property
+    def label(self) -> str: return urlsplit(self.model).path.split("/", 1)[-1]
+
+    def profile(self) -> Dict[str, float]:
+        options = dict(parse_qsl(urlsplit(self.model).query))
+        return {name: float(self.overrides.get(name, options.get(name, default))) for name, default in DEFAULT_PROFILE.items()}
+
+    @staticmethod
+    def delay(profile: Dict[str, float]) -> float:
+        if random.random() < profile["tail"]: return profile["tail_latency"]
+        if profile["sigma"] > 0: return profile["latency"] * math.exp(random.gauss(0.0, profile["sigma"]))
+        return max(profile["latency"] * random.uniform(1 - profile["jitter"], 1 + profile["jitter"]), 0.0)
+
+    def next_move(self, llm_request: LlmRequest, profile: Dict[str, float]) -> Move:
+        # Only this turn counts: the last user message and the tool responses that came after it
+        asked = max((index for index, content in enumerate(llm_request.contents) if content.role == "user" \
+            and any(part.text for part in content.parts or [])), default = -1)
+        question = next((part.text for part in llm_request.contents[asked].parts if part.text), "") if asked >= 0 else ""
+        responses = [part.function_response.response for content in llm_request.contents[asked + 1:] \
+            for part in content.parts or [] if part.function_response]
+        script = SCRIPTS.get(self.label) if self.model.startswith("fake/") else None
+        kind, move = script(question, responses, llm_request.tools_dict) if script else ("text", f"[{self.label}] {question}")
+        if kind == "text" and profile["words"]:
+            # Pads answers to a realistic length for streaming and token accounting
+            filler = itertools.cycle(question.split() or ["answer"])
+            move = f"{move} " + " ".join(next(filler) for _ in range(int(profile["words"])))
+        return kind, move
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        profile = self.profile()
+        await asyncio.sleep(self.delay(profile))
+        if random.random() < profile["error_rate"]: raise ConnectionError(f"{self.model} failed (injected)")
+        kind, move = self.next_move(llm_request, profile)
+        prompt_tokens = sum(len(part.text or "") for content in llm_request.contents for part in content.parts or []) // 4
+        if kind == "call":
+            yield LlmResponse(content = types.ModelContent(parts = [types.Part(function_call = types.FunctionCall( \
+                name = move[0], args = move[1]))]), usage_metadata = types.GenerateContentResponseUsageMetadata( \
+                    prompt_token_count = prompt_tokens, candidates_token_count = 10))
+            return
+        chunks = max(int(profile["chunks"]), 1) if stream else 1
+        if chunks > 1:
+            size = math.ceil(len(move) / chunks)
+            for start in range(0, len(move), size):
+                if start: await asyncio.sleep(profile["chunk_latency"])
+                yield LlmResponse(content = types.ModelContent(parts = [types.Part.from_text(text = move[start:start + size])]), \
+                    partial = True)
+        yield LlmResponse(content = types.ModelContent(parts = [types.Part.from_text(text = move)]), \
+            usage_metadata = types.GenerateContentResponseUsageMetadata(prompt_token_count = prompt_tokens, \
+                candidates_token_count = len(move) // 4))
+
+LLMRegistry.register(StandInLlm)
+
+def is_offline_model(model: str) -> bool: return model.startswith(("standin/", "fake/"))
+
+def apply_llm_backend(agents: Iterable[LlmAgent]) -> None:
+    # LLM_BACKEND=fake swaps every agent onto its scripted stand-in from FAKE_LLM_MODELS, so the whole
+    # service runs without network access (for load tests and local development)
+    if settings.LLM_BACKEND != "fake": return
+    for agent in agents: agent.model = settings.FAKE_LLM_MODELS.get(agent.name, f"fake/{agent.name}")
@@ -0,0 +1,176 @@
+import asyncio
+import itertools
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Iterator, List, Optional
+
+from google.adk.agents import LlmAgent
+from google.adk.events import Event
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+
+from common.config import settings
+from common.metrics import metrics
+from common.utils import model_layers
+
+# Span attributes that also label the stage's latency histogram on /metrics (all have few distinct values)
+EXPORTED_LABELS = ("agent", "model", "tool")
+ENDED_EARLY = (asyncio.CancelledError, GeneratorExit)
+
+class Span:
+    # One timed stage of a request; `attributes` say what it worked on (agent, model, tokens, outcome)
+    __slots__ = ("name", "span_id", "parent_id", "started", "ended", "attributes")
+    ids = itertools.count(1)
+
+    def __init__(self, name: str, parent_id: Optional[int], started: float, attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.span_id = next(self.ids)
+        self.parent_id = parent_id
+        self.started = started
+        self.ended: Optional[float] = None
+        self.attributes = attributes
+
+    def set(self, **attributes: Any) -> None: self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float: return (self.ended or time.perf_counter()) - self.started
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {"name": self.name, "span_id": self.span_id, "parent_id": self.parent_id, \
+            "start_ms": round((self.started - origin) * 1000, 2), "duration_ms": round(self.duration * 1000, 2), \
+                **self.attributes}
+
+class Trace:
+    # The spans finished while answering one request, in the order they finished
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.trace_id = os.urandom(8).hex()
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+
+    def summary(self) -> Dict[str, Any]:
+        # Stages are totalled by name, so parallel branches add up and nested stages overlap their parent
+        stages: Dict[str, float] = defaultdict(float)
+        for finished in self.spans: stages[finished.name] += finished.duration * 1000
+        return {"trace_id": self.trace_id, "total_ms": round((time.perf_counter() - self.started) * 1000, 2), \
+            "stages": {name: round(ms, 2) for name, ms in stages.items()}, \
+                "spans": [finished.to_dict(self.started) for finished in self.spans]}
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default = None)
+_span: ContextVar[Optional[Span]] = ContextVar("span", default = None)
+
+def current_ids() -> Dict[str, Any]:
+    current_trace, current_span = _trace.get(), _span.get()
+    if current_trace is None: return {}
+    return {"trace_id": current_trace.trace_id, **({"span_id": current_span.span_id} if current_span else {})}
+
+def task_trace_id(task: asyncio.Task) -> Optional[str]:
+    # The trace a task is working for; readable from other threads, unlike current_ids()
+    current_trace = task.get_context().get(_trace)
+    return current_trace.trace_id if current_trace else None
+
+def finish(finished: Span, current_trace: Optional[Trace], ended: Optional[float] = None) -> None:
+    finished.ended = ended or time.perf_counter()
+    labels = {name: str(finished.attributes[name]) for name in EXPORTED_LABELS if name in finished.attributes}
+    metrics.observe("stage_seconds", finished.ended - finished.started, stage = finished.name, **labels)
+    if current_trace is not None: current_trace.spans.append(finished)
+
+def restore(variable: ContextVar, token: Any, previous: Any) -> None:
+    # A generator closed from another task cannot reset its token; putting the old value back is equivalent
+    try: variable.reset(token)
+    except ValueError: variable.set(previous)
+
+@contextmanager
+def trace(name: str, **attributes: Any) -> Iterator[Trace]:
+    # Starts a request's trace; stages timed while it is open (in this task or tasks it starts) join it
+    current_trace = Trace(name)
+    if not settings.TRACING_ENABLED:
+        yield current_trace
+        return
+    token = _trace.set(current_trace)
+    try:
+        with span(name, **attributes): yield current_trace
+    finally: restore(_trace, token, None)
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    # Times a stage; stages started inside it are its children
+    parent = _span.get()
+    current = Span(name, parent.span_id if parent else None, time.perf_counter(), attributes)
+    if not settings.TRACING_ENABLED:
+        yield current
+        return
+    current_trace, token = _trace.get(), _span.set(current)
+    try: yield current
+    except BaseException as e:
+        current.set(status = "cancelled" if isinstance(e, ENDED_EARLY) else "error", error = type(e).__name__)
+        raise
+    finally:
+        restore(_span, token, parent)
+        finish(current, current_trace)
+
+def record_span(name: str, started: float, ended: Optional[float] = None, **attributes: Any) -> None:
+    # For leaf stages that were timed by hand (model calls, ADK events, tool calls)
+    if not settings.TRACING_ENABLED: return
+    parent = _span.get()
+    finish(Span(name, parent.span_id if parent else None, started, attributes), _trace.get(), ended)
+
+def usage_attributes(response: LlmResponse) -> Dict[str, int]:
+    usage = response.usage_metadata
+    if not usage: return {}
+    return {"input_tokens": usage.prompt_token_count or 0, "output_tokens": usage.candidates_token_count or 0}
+
+async def traced_events(events: AsyncGenerator[Event, None], agent_name: str, **attributes: Any) -> AsyncIterator[Event]:
+    # Times an agent run and each event it yields. A function response arrives once its tool calls have
+    # run, so the time since the previous event is recorded as a "tool" span per call
+    with span("agent", agent = agent_name, **attributes) as run:
+        previous, events_seen = time.perf_counter(), 0
+        try:
+            async for event in events:
+                now, events_seen = time.perf_counter(), events_seen + 1
+                responses = event.get_function_responses()
+                for response in responses:
+                    status = response.response.get("status") if isinstance(response.response, dict) else None
+                    record_span("tool", previous, now, agent = agent_name, tool = response.name, \
+                        **({"status": status} if status else {}))
+                if not responses:
+                    kind = "function_call" if event.get_function_calls() else "text"
+                    record_span("event", previous, now, agent = agent_name, author = event.author, kind = kind, \
+                        partial = bool(event.partial), **usage_attributes(event))
+                previous = now
+                yield event
+        finally:
+            run.set(events = events_seen)
+            await events.aclose()
+
+class TracedLlm(BaseLlm):
+    # Wraps a model so each call records a "model" span with time to first response and token usage,
+    # and adds the tokens to per-model counters
+    inner: BaseLlm
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        started, attributes = time.perf_counter(), {"model": self.model}
+        try:
+            async for response in self.inner.generate_content_async(llm_request, stream):
+                attributes.setdefault("first_response_ms", round((time.perf_counter() - started) * 1000, 2))
+                if not response.partial and (usage := usage_attributes(response)):
+                    attributes.update(usage)
+                    for name, count in usage.items(): metrics.increment(f"model_{name}.{self.model}", count)
+                yield response
+        except BaseException as e:
+            attributes.update(status = "cancelled" if isinstance(e, ENDED_EARLY) else "error", error = type(e).__name__)
+            raise
+        finally: record_span("model", started, **attributes)
+
+def trace_llm(llm: BaseLlm) -> BaseLlm:
+    # A tracer anywhere in the chain already records this model's calls; a second would count each twice
+    if not settings.TRACING_ENABLED or any(isinstance(layer, TracedLlm) for layer in model_layers(llm)): return llm
+    return TracedLlm(model = llm.model, inner = llm)
+
+def trace_agent_model(agent: LlmAgent) -> None:
+    agent.model = trace_llm(agent.model if isinstance(agent.model, BaseLlm) else LLMRegistry.new_llm(agent.model))
@@ -11,3 +11,25 @@ async def extract_response_and_tools(events):
         function_responses = ev.get_function_responses()
         if function_responses: tools_used.extend(response.name for response in function_responses)
     return response_text, tools_used
+
+async def stream_response_and_tools(events):
+    # Streaming counterpart of extract_response_and_tools: yields text deltas and tool calls as they arrive.
+    # With SSE streaming the runner emits partial text chunks followed by one merged, non-partial event
+    # repeating them, so text of that merged event is skipped once its chunks were forwarded
+    streamed_partial = False
+    async for ev in events:
+        if getattr(ev, "content", None) and ev.content.parts:
+            if ev.partial or not streamed_partial:
+                for part in ev.content.parts:
+                    if hasattr(part, 'text') and part.text: yield {"type": "text", "text": part.text}
+        streamed_partial = bool(ev.partial)
+        for call in ev.get_function_calls() or []: yield {"type": "tool_call", "name": call.name}
+        for response in ev.get_function_responses() or []: yield {"type": "tool_response", "name": response.name}
+
+def model_layers(model):
+    # An agent's model followed by every model it wraps: limiters and tracers keep theirs in `inner`, and a
+    # hedged model puts its preferred one first in `candidates`
+    while model is not None:
+        yield model
+        candidates = getattr(model, "candidates", None)
+        model = getattr(model, "inner", None) or (candidates[0] if candidates else None)
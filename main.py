@@ -3,18 +3,41 @@ import random
 import re
 import string
 import time
-from typing import Any, Dict, Optional
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional
 
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.events import Event
 from google.adk.runners import InMemoryRunner, Runner
-from google.adk.sessions import InMemorySessionService
 from google.genai import types
 
-from agents.math_agent.math_agent import math_agent
-from agents.physics_agent.physics_agent import physics_agent
-from agents.tutor_orchestrator.tutor_agent import tutor_orchestrator
+from agents.math_agent.math_agent import calculator, math_agent
+from agents.physics_agent.physics_agent import physics_agent, physics_tool
+from agents.tutor_orchestrator.direct_answer import LOCAL_RESPONDER, DirectAnswerer
+from agents.tutor_orchestrator.query_router import query_router
+from agents.tutor_orchestrator.query_splitter import (QUERY_SPLITTER,
+                                                      SubQuestion,
+                                                      split_query)
+from agents.tutor_orchestrator.tutor_agent import classifier_agent, tutor_orchestrator
+from common.a2a_client import get_a2a_client
+from common.admission import StudentLocks
+from common.agent_pool import RemoteAgentPool
+from common.cache import ResponseCache, depends_on_history
+from common.coalescing import SingleFlight
 from common.config import settings
-from common.utils import extract_response_and_tools
+from common.context_window import context_window_from_settings
+from common.log import get_logger
+from common.metrics import metrics
+from common.model_selection import wrap_agent_models
+from common.session_store import get_session_service
+from common.speculation import SpeculationBudget
+from common.tracing import span, trace, traced_events
+from common.utils import (extract_response_and_tools,
+                          stream_response_and_tools)
 
+APP_NAME = "Multi-Agent Tutoring Bot"
+logger = get_logger(__name__)
 
 class MultiAgentTutoringSystem:
     def __init__(self):
@@ -22,74 +45,431 @@ class MultiAgentTutoringSystem:
         self.tutor = tutor_orchestrator
         self.math  = math_agent
         self.phys  = physics_agent
-        self.session_service = InMemorySessionService()
+        self.session_service = get_session_service()
         self.runners = {
             self.tutor.name: Runner(agent = self.tutor, \
-                session_service = self.session_service, app_name = "Multi-Agent Tutoring Bot"),
+                session_service = self.session_service, app_name = APP_NAME),
             self.math.name: Runner(agent = self.math, \
-                session_service = self.session_service, app_name = "Multi-Agent Tutoring Bot"),
+                session_service = self.session_service, app_name = APP_NAME),
             self.phys.name : Runner(agent = self.phys, \
-                session_service = self.session_service, app_name = "Multi-Agent Tutoring Bot"),
+                session_service = self.session_service, app_name = APP_NAME),
         }
-        self.sessions: dict[str, str] = {}
+        self.known_sessions: "OrderedDict[str, None]" = OrderedDict()
+        self.context_window = context_window_from_settings()
+        if self.context_window:
+            for agent in (self.tutor, self.math, self.phys):
+                agent.before_model_callback = self.context_window.before_model_callback
+        wrap_agent_models((self.tutor, self.math, self.phys, classifier_agent))
+        self.student_locks = StudentLocks(self.settings.STUDENT_MAX_PENDING)
+        self.single_flight = SingleFlight()
+        self.speculation_budget = SpeculationBudget(self.settings.SPECULATION_BUDGET_PER_MINUTE)
+        self.response_cache = ResponseCache(max_entries = self.settings.RESPONSE_CACHE_MAX_ENTRIES, \
+            max_bytes = self.settings.RESPONSE_CACHE_MAX_BYTES, ttl_seconds = self.settings.RESPONSE_CACHE_TTL, \
+                disk_path = self.settings.RESPONSE_CACHE_DISK_PATH or None, \
+                    flush_interval = self.settings.RESPONSE_CACHE_FLUSH_INTERVAL, \
+                        prune_interval = self.settings.RESPONSE_CACHE_PRUNE_INTERVAL) \
+                    if self.settings.RESPONSE_CACHE_ENABLED else None
+        # In distributed mode the specialists named in AGENT_TOPOLOGY run as separate A2A services
+        self.remote_agents = RemoteAgentPool(self.settings.AGENT_TOPOLOGY, get_a2a_client(), \
+            down_seconds = self.settings.AGENT_REPLICA_DOWN_SECONDS) if self.settings.DISTRIBUTED_AGENTS else None
+        self.direct_answerer = DirectAnswerer(calculator, physics_tool, self.settings.DIRECT_ANSWER_MODE)
 
     async def get_session_id(self, student_id: str, agent_for_session: str) -> str:
-        session_key = f"{student_id}_{agent_for_session}"
-        if session_key not in self.sessions:
-            session = await self.session_service.create_session(user_id = student_id, app_name = "Multi-Agent Tutoring Bot")
-            self.sessions[session_key] = session.id
-        return self.sessions[session_key]
-
-    async def process_student_query(self, query: str, student_id: str = "student") -> Dict[str, Any]:
-        tutor_session_id = await self.get_session_id(student_id, self.tutor.name)
-        print(f"Sending query to Tutor Orchestrator for classification: {self.tutor.name}")
-        init_tutor_events = self.runners[self.tutor.name].run_async(user_id = student_id, \
-            session_id = tutor_session_id, new_message = types.Content(
-                role = 'user', parts = [types.Part.from_text(text = query)]))
-        init_tutor_response, tutor_tools_used = await extract_response_and_tools(init_tutor_events)
-        print(f"Tutor Orchestrator initial response: {init_tutor_response}")
-        subject = "general"
+        # Session ids are derived from the student and agent, so the session store is the only state;
+        # known_sessions is a bounded memo that skips the existence check for recently active students
+        session_id = f"{student_id}_{agent_for_session}"
+        if session_id in self.known_sessions:
+            self.known_sessions.move_to_end(session_id)
+            return session_id
+        if await self.session_service.get_session(app_name = APP_NAME, \
+            user_id = student_id, session_id = session_id) is None:
+            await self.session_service.create_session(user_id = student_id, app_name = APP_NAME, session_id = session_id)
+        self.known_sessions[session_id] = None
+        if len(self.known_sessions) > self.settings.MAX_SESSIONS: self.known_sessions.popitem(last = False)
+        return session_id
+
+    def agent_events(self, agent_name: str, session_id: str, query: str, student_id: str, \
+        run_config: Optional[RunConfig] = None):
+        return traced_events(self.runners[agent_name].run_async(user_id = student_id, \
+            session_id = session_id, new_message = types.Content(
+                role = 'user', parts = [types.Part.from_text(text = query)]), run_config = run_config or RunConfig()), \
+                    agent_name)
+
+    def is_remote(self, agent_name: str) -> bool:
+        return self.remote_agents is not None and self.remote_agents.serves(agent_name)
+
+    async def run_agent(self, agent_name: str, query: str, student_id: str) -> tuple[str, list[str]]:
+        if self.is_remote(agent_name):
+            with span("agent", agent = agent_name, remote = True):
+                return await self.remote_agents.run(agent_name, query, student_id, f"{student_id}_{agent_name}")
+        session_id = await self.get_session_id(student_id, agent_name)
+        return await extract_response_and_tools(self.agent_events(agent_name, session_id, query, student_id))
+
+    async def stream_agent(self, agent_name: str, query: str, student_id: str) -> AsyncIterator[Dict[str, Any]]:
+        if self.is_remote(agent_name):
+            # Remote specialists answer in one piece; it is replayed as the same event shapes
+            response, tools_used = await self.run_agent(agent_name, query, student_id)
+            for name in tools_used: yield {"type": "tool_call", "name": name}
+            yield {"type": "text", "text": response}
+            return
+        session_id = await self.get_session_id(student_id, agent_name)
+        events = self.agent_events(agent_name, session_id, query, student_id, \
+            run_config = RunConfig(streaming_mode = StreamingMode.SSE))
+        async for item in stream_response_and_tools(events): yield item
+
+    async def run_agent_coalesced(self, agent_name: str, query: str, student_id: str, \
+        key: Optional[str]) -> tuple[str, list[str]]:
+        # Students asking the same self-contained question at the same time share one agent run; the turn
+        # is recorded in the session of every student who joined it
+        if key is None: return await self.run_agent(agent_name, query, student_id)
+        (response, tools_used), shared = await self.single_flight.do(key, \
+            lambda: self.run_agent(agent_name, query, student_id))
+        if shared:
+            logger.debug("Joined an identical in-flight request", extra = {"agent": agent_name})
+            await self.record_turn(student_id, agent_name, query, response)
+        return response, tools_used
+
+    async def stream_agent_coalesced(self, agent_name: str, query: str, student_id: str, \
+        key: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+        # Streaming callers lead like any other; one that joins a run in flight gets its answer in one piece
+        shared = await self.single_flight.join(key) if key else None
+        if shared:
+            response, tools_used = shared
+            logger.debug("Joined an identical in-flight request", extra = {"agent": agent_name})
+            await self.record_turn(student_id, agent_name, query, response)
+            for name in tools_used: yield {"type": "tool_call", "name": name}
+            yield {"type": "text", "text": response}
+            return
+        async with self.single_flight.lead(key) as flight:
+            response, tools_used = "", []
+            async for item in self.stream_agent(agent_name, query, student_id):
+                if item["type"] == "text": response += item["text"]
+                else: tools_used.append(item["name"])
+                yield item
+            flight.set_result((response, tools_used))
+
+    def coalesce_key(self, subject: str, agent_name: str, query: str) -> Optional[str]:
+        # Only queries that read the same without the student's history can share a run
+        if not self.settings.COALESCE_REQUESTS or depends_on_history(query): return None
+        return self.answer_key(subject, agent_name, query)
+
+    def answer_key(self, subject: str, agent_name: str, query: str) -> str:
+        model = self.runners[agent_name].agent.model
+        return ResponseCache.make_key(subject, agent_name, getattr(model, "model", model), query)
+
+    def specialist_for(self, subject: str) -> Optional[str]:
+        return {"math": self.math.name, "physics": self.phys.name}.get(subject)
+
+    def local_route(self, probabilities: Dict[str, float]) -> Optional[Dict[str, Any]]:
+        if not probabilities: return None
+        routed_subject = max(probabilities, key = probabilities.get)
+        confidence = probabilities[routed_subject]
+        routed_agent = self.specialist_for(routed_subject)
+        if routed_agent and confidence >= self.settings.ROUTER_CONFIDENCE_THRESHOLD:
+            logger.debug("Local router routed the query directly", extra = {"subject": routed_subject, \
+                "confidence": round(confidence, 3), "agent": routed_agent})
+            return {"subject": routed_subject, "agent": routed_agent, "routed_by": "local_router"}
+        return None
+
+    async def tutor_route(self, query: str, student_id: str) -> Dict[str, Any]:
+        # When the tutor answers itself its response is already complete and is carried in the route
+        with span("route.tutor"):
+            init_tutor_response, tutor_tools_used = await self.run_agent_coalesced(self.tutor.name, query, student_id, \
+                self.coalesce_key("unrouted", self.tutor.name, query))
+        logger.debug("Tutor Orchestrator responded", extra = {"response": init_tutor_response})
+        tutor_route = {"subject": "general", "agent": self.tutor.name, "routed_by": self.tutor.name, \
+            "response": init_tutor_response, "tools_used": tutor_tools_used}
         match = re.search(r"Classification:\s*(math|physics|general)", \
             init_tutor_response, re.IGNORECASE)
         if match: subject = match.group(1).lower()
         elif "handling this general query" in init_tutor_response.lower(): subject = "general"
         else:
-            print(f"Could not reliably parse subject from tutor response. Defaulting to 'general'. Response was: {init_tutor_response}")
-            return {
-                "response": init_tutor_response,
-                "agent": self.tutor.name,
-                "subject": "general",
-                "tools_used": tutor_tools_used,
-                "student_id": student_id
-            }
-        print(f"[DEBUG] Query classified as: {subject} based on Tutor response.")
-        chosen_agent: str
-        final_response = init_tutor_response 
-        final_tools = tutor_tools_used
-        final_agent = self.tutor.name
-        if subject == "math":
-            chosen_agent = self.math.name
-            print(f"[DEBUG] Routing original query to Math Agent: {self.math.name}")
-            math_session_id = await self.get_session_id(student_id, self.math.name)
-            math_events = self.runners[self.math.name].run_async(user_id = student_id, \
-                session_id = math_session_id, new_message = types.Content(
-                    role = 'user', parts = [types.Part.from_text(text = query)]))
-            final_response, final_tools = await extract_response_and_tools(math_events)
-            final_agent = self.math.name
-        elif subject == "physics":
-            chosen_agent = self.phys.name
-            print(f"[DEBUG] Routing original query to Physics Agent: {self.phys.name}")
-            phys_session_id = await self.get_session_id(student_id, self.phys.name)
-            phys_events = self.runners[self.phys.name].run_async(user_id = student_id, \
-                session_id = phys_session_id, new_message = types.Content(
-                    role = 'user', parts = [types.Part.from_text(text = query)]))
-            final_response, final_tools = await extract_response_and_tools(phys_events)
-            final_agent = self.phys.name
-        elif subject == "general":
-            print(f"[DEBUG] Handled by Tutor Orchestrator as general query: {self.tutor.name}")
-            pass 
-        return {"response": final_response, "agent": final_agent, \
-            "subject": subject, "tools_used": final_tools, "student_id": student_id}
+            logger.warning("Could not parse a subject from the tutor response; treating it as general", \
+                extra = {"response": init_tutor_response})
+            return tutor_route
+        chosen_agent = self.specialist_for(subject)
+        logger.debug("Tutor classified the query", extra = {"subject": subject, "agent": chosen_agent or self.tutor.name})
+        if not chosen_agent: return tutor_route
+        return {"subject": subject, "agent": chosen_agent, "routed_by": self.tutor.name}
+
+    def router_probabilities(self, query: str) -> Dict[str, float]:
+        if not self.settings.ROUTER_ENABLED: return {}
+        with span("route.local"): return query_router.predict_proba(query)
+
+    async def route_query(self, query: str, student_id: str) -> Dict[str, Any]:
+        return self.local_route(self.router_probabilities(query)) or await self.tutor_route(query, student_id)
+
+    def speculation_candidates(self, probabilities: Dict[str, float]) -> list[str]:
+        # Speculate on the router's favourite specialist when it leans clearly enough, otherwise on both
+        specialists = {subject: self.specialist_for(subject) for subject in ("math", "physics")}
+        if probabilities:
+            likely = max(specialists, key = lambda subject: probabilities.get(subject, 0.0))
+            if probabilities.get(likely, 0.0) >= self.settings.SPECULATION_MIN_CONFIDENCE:
+                return [specialists[likely]]
+        return list(specialists.values())
+
+    async def fork_session(self, student_id: str, agent_name: str, fork_id: str) -> None:
+        # Speculative turns run on a scratch copy so a cancelled run never touches the student's session
+        base = await self.session_service.get_session(app_name = APP_NAME, \
+            user_id = student_id, session_id = await self.get_session_id(student_id, agent_name))
+        fork = await self.session_service.create_session(app_name = APP_NAME, \
+            user_id = student_id, state = dict(base.state), session_id = fork_id)
+        for event in base.events: await self.session_service.append_event(fork, event)
+
+    async def commit_fork(self, student_id: str, agent_name: str, fork_id: str) -> None:
+        # Replays the events the winning speculative turn produced onto the student's real session
+        session_id = await self.get_session_id(student_id, agent_name)
+        base = await self.session_service.get_session(app_name = APP_NAME, \
+            user_id = student_id, session_id = session_id)
+        fork = await self.session_service.get_session(app_name = APP_NAME, \
+            user_id = student_id, session_id = fork_id)
+        for event in fork.events[len(base.events):]: await self.session_service.append_event(base, event)
+
+    async def speculate(self, agent_name: str, fork_id: str, query: str, student_id: str) -> tuple[str, list[str]]:
+        await self.fork_session(student_id, agent_name, fork_id)
+        events = self.agent_events(agent_name, fork_id, query, student_id)
+        try: return await extract_response_and_tools(events)
+        finally: await events.aclose()
+
+    async def process_speculatively(self, query: str, student_id: str, \
+        probabilities: Dict[str, float], use_cache: bool = True) -> Dict[str, Any]:
+        candidates = self.speculation_candidates(probabilities)
+        if not self.speculation_budget.try_acquire(len(candidates)):
+            metrics.increment("speculation_budget_exhausted")
+            return await self.answer(query, student_id, await self.tutor_route(query, student_id), use_cache)
+        forks = {agent: f"{student_id}_{agent}_speculative_{uuid.uuid4().hex[:8]}" for agent in candidates}
+        tasks = {agent: asyncio.create_task(self.speculate(agent, forks[agent], query, student_id)) \
+            for agent in candidates}
+        metrics.increment("speculation_started", len(tasks))
+        logger.debug("Speculatively dispatching while classifying", extra = {"agents": candidates})
+        try:
+            route = await self.tutor_route(query, student_id)
+            winner = tasks.get(route["agent"])
+            if winner is None:
+                metrics.increment("speculation_misses")
+                return await self.answer(query, student_id, route, use_cache)
+            cache_key = self.cache_key(route, query, use_cache)
+            cached = await self.cached_answer(cache_key, query, student_id, route)
+            if cached: return cached
+            final_response, final_tools = await winner
+            await self.commit_fork(student_id, route["agent"], forks[route["agent"]])
+            metrics.increment("speculation_hits")
+            result = {"response": final_response, "agent": route["agent"], \
+                "subject": route["subject"], "tools_used": final_tools, "student_id": student_id}
+            self.store_answer(cache_key, query, result)
+            return {**result, "context_tokens_saved": self.context_tokens_saved(student_id, forks[route["agent"]])}
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+                    metrics.increment("speculation_cancelled")
+            await asyncio.gather(*tasks.values(), return_exceptions = True)
+            for fork_id in forks.values():
+                await self.session_service.delete_session(app_name = APP_NAME, \
+                    user_id = student_id, session_id = fork_id)
+                self.context_tokens_saved(student_id, fork_id)
+
+    def context_tokens_saved(self, student_id: str, session_or_agent: str) -> int:
+        # Tokens trimmed from this request's model calls: the tutor turn plus the answering agent's session
+        if self.context_window is None: return 0
+        session_ids = {f"{student_id}_{self.tutor.name}", \
+            session_or_agent if session_or_agent not in self.runners else f"{student_id}_{session_or_agent}"}
+        return sum(self.context_window.take_tokens_saved(session_id) for session_id in session_ids)
+
+    async def record_turn(self, student_id: str, agent_name: str, query: str, response: str) -> None:
+        # Appends a turn answered without running the agent so follow-ups still see it in the session
+        if self.is_remote(agent_name):
+            return await self.remote_agents.record(agent_name, student_id, f"{student_id}_{agent_name}", query, response)
+        session = await self.session_service.get_session(app_name = APP_NAME, \
+            user_id = student_id, session_id = await self.get_session_id(student_id, agent_name))
+        invocation_id = Event.new_id()
+        await self.session_service.append_event(session, Event(invocation_id = invocation_id, author = "user", \
+            content = types.Content(role = "user", parts = [types.Part.from_text(text = query)])))
+        await self.session_service.append_event(session, Event(invocation_id = invocation_id, author = agent_name, \
+            content = types.Content(role = "model", parts = [types.Part.from_text(text = response)])))
+
+    async def direct_answer(self, query: str, student_id: str) -> Optional[Dict[str, Any]]:
+        # Pure calculations and constant lookups are answered without any model call. The turn is still
+        # recorded in the specialist's session so a follow-up ("why is that?") sees it
+        with span("direct_answer") as current:
+            answer = await self.direct_answerer.answer(query)
+            current.set(answered = answer is not None)
+        if answer is None: return None
+        metrics.increment("direct_answers")
+        logger.debug("Answered the query locally without calling a model", extra = {"subject": answer["subject"]})
+        await self.record_turn(student_id, self.specialist_for(answer["subject"]), query, answer["response"])
+        return {"response": answer["response"], "agent": LOCAL_RESPONDER, "subject": answer["subject"], \
+            "tools_used": answer["tools_used"], "student_id": student_id, "bypassed_models": True}
+
+    def cache_key(self, route: Dict[str, Any], query: str, use_cache: bool) -> Optional[str]:
+        # Only specialist answers to self-contained queries are cacheable
+        if self.response_cache is None or not use_cache or route["agent"] == self.tutor.name: return None
+        if depends_on_history(query): return None
+        return self.answer_key(route["subject"], route["agent"], query)
+
+    async def cached_answer(self, cache_key: Optional[str], query: str, student_id: str, \
+        route: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not cache_key: return None
+        with span("cache", agent = route["agent"]) as current:
+            cached = await self.response_cache.get(cache_key)
+            current.set(hit = cached is not None)
+        if cached is None: return None
+        logger.debug("Response cache hit", extra = {"agent": route["agent"]})
+        await self.record_turn(student_id, route["agent"], query, cached["response"])
+        return {"response": cached["response"], "agent": route["agent"], "subject": route["subject"], \
+            "tools_used": cached["tools_used"], "student_id": student_id, "cached": True}
+
+    def store_answer(self, cache_key: Optional[str], query: str, result: Dict[str, Any]) -> None:
+        if cache_key is None or not result["response"]: return
+        self.response_cache.put(cache_key, result["subject"], query, {"response": result["response"], \
+            "tools_used": result["tools_used"], "subject": result["subject"], "agent": result["agent"], "query": query})
+
+    async def answer(self, query: str, student_id: str, route: Dict[str, Any], \
+        use_cache: bool = True) -> Dict[str, Any]:
+        cache_key = self.cache_key(route, query, use_cache)
+        cached = await self.cached_answer(cache_key, query, student_id, route)
+        if cached: return cached
+        if route["agent"] == self.tutor.name:
+            final_response, final_tools = route["response"], route["tools_used"]
+        else: final_response, final_tools = await self.run_agent_coalesced(route["agent"], query, student_id, \
+            self.coalesce_key(route["subject"], route["agent"], query))
+        result = {"response": final_response, "agent": route["agent"], \
+            "subject": route["subject"], "tools_used": final_tools, "student_id": student_id}
+        self.store_answer(cache_key, query, result)
+        return {**result, "context_tokens_saved": self.context_tokens_saved(student_id, route["agent"])}
+
+    def split_query(self, query: str) -> list[SubQuestion]:
+        if not (self.settings.FANOUT_ENABLED and self.settings.ROUTER_ENABLED): return []
+        with span("split"): return split_query(query, query_router, self.settings.FANOUT_MIN_SHARE)
+
+    async def answer_branch(self, part: SubQuestion, student_id: str, use_cache: bool = True) -> Dict[str, Any]:
+        # One sub-question of a compound query; a failure becomes a note so the other branches still answer
+        route = {"subject": part.subject, "agent": self.specialist_for(part.subject), "routed_by": QUERY_SPLITTER}
+        try:
+            with span("fanout.branch", agent = route["agent"]):
+                return await self.direct_answer(part.query, student_id) or await self.answer(part.query, student_id, route, use_cache)
+        except Exception as e:
+            logger.exception("Error answering part of a compound query", extra = {"subject": part.subject})
+            metrics.increment("fanout_branch_errors")
+            return {"response": f"Sorry, I couldn't answer this part right now: {part.query}", "agent": route["agent"], \
+                "subject": part.subject, "tools_used": [], "error": str(e)}
+
+    async def answer_fanout(self, parts: list[SubQuestion], student_id: str, use_cache: bool = True) -> Dict[str, Any]:
+        # A compound query's sub-questions go to their specialists at the same time, so the turn takes
+        # about as long as the slowest branch instead of the sum of them
+        metrics.increment("fanout_queries")
+        logger.debug("Fanning out a compound query", extra = {"parts": [part._asdict() for part in parts]})
+        with span("fanout"):
+            answers = await asyncio.gather(*(self.answer_branch(part, student_id, use_cache) for part in parts))
+        return self.merge_answers(parts, answers, student_id)
+
+    @staticmethod
+    def answer_section(part: SubQuestion, answer: Dict[str, Any]) -> str:
+        return f"**{part.subject.capitalize()}**\n{answer['response']}"
+
+    def merge_answers(self, parts: list[SubQuestion], answers: list[Dict[str, Any]], student_id: str) -> Dict[str, Any]:
+        if all("error" in answer for answer in answers): raise RuntimeError(answers[0]["error"])
+        return {"response": "\n\n".join(self.answer_section(part, answer) for part, answer in zip(parts, answers)), \
+            "agent": "+".join(answer["agent"] for answer in answers), "subject": "+".join(part.subject for part in parts), \
+                "tools_used": [tool for answer in answers for tool in answer["tools_used"]], "student_id": student_id, \
+                    "context_tokens_saved": sum(answer.get("context_tokens_saved") or 0 for answer in answers), \
+                        "parts": [{"query": part.query, "subject": part.subject, "agent": answer["agent"], \
+                            "response": answer["response"], "tools_used": answer["tools_used"]} \
+                                for part, answer in zip(parts, answers)]}
+
+    async def agents_status(self) -> Dict[str, Any]:
+        local = {agent: [{"url": "in-process", "status": "active"}] for agent in self.runners if not self.is_remote(agent)}
+        return {**local, **(await self.remote_agents.status() if self.remote_agents else {})}
+
+    async def process_student_query(self, query: str, student_id: str = "student", \
+        use_cache: bool = True, include_timings: bool = False) -> Dict[str, Any]:
+        # A student's turns run one at a time so they never race on the same sessions
+        with trace("request", student_id = student_id) as current:
+            async with self.student_locks.hold(student_id): result = await self.answer_query(query, student_id, use_cache)
+            timings = current.summary()
+        self.log_answer(result, timings)
+        return {**result, "timings": timings} if include_timings else result
+
+    @staticmethod
+    def log_answer(result: Dict[str, Any], timings: Dict[str, Any]) -> None:
+        logger.info("Answered query", extra = {"trace_id": timings["trace_id"], "agent": result["agent"], \
+            "subject": result["subject"], "total_ms": timings["total_ms"], "stages": timings["stages"]})
+
+    async def answer_query(self, query: str, student_id: str, use_cache: bool = True) -> Dict[str, Any]:
+        direct = await self.direct_answer(query, student_id)
+        if direct: return direct
+        parts = self.split_query(query)
+        if parts: return await self.answer_fanout(parts, student_id, use_cache)
+        probabilities = self.router_probabilities(query)
+        route = self.local_route(probabilities)
+        # Speculation forks local sessions, so it only applies when the specialists run in this process
+        if route is None and self.settings.SPECULATIVE_DISPATCH and self.remote_agents is None:
+            return await self.process_speculatively(query, student_id, probabilities, use_cache)
+        return await self.answer(query, student_id, route or await self.tutor_route(query, student_id), use_cache)
+
+    async def process_student_query_stream(self, query: str, student_id: str = "student", \
+        use_cache: bool = True, include_timings: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        with trace("request", student_id = student_id, stream = True) as current:
+            async with self.student_locks.hold(student_id):
+                async for item in self.answer_query_stream(query, student_id, use_cache):
+                    if item["type"] == "done":
+                        timings = current.summary()
+                        self.log_answer(item, timings)
+                        if include_timings: item = {**item, "timings": timings}
+                    yield item
+
+    async def answer_query_stream(self, query: str, student_id: str, \
+        use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        # Emits the routing decision first, then text/tool events as the answering agent produces them
+        direct = await self.direct_answer(query, student_id)
+        if direct:
+            yield {"type": "route", "subject": direct["subject"], "agent": LOCAL_RESPONDER, "routed_by": LOCAL_RESPONDER}
+            yield {"type": "text", "text": direct["response"]}
+            yield {"type": "done", **direct}
+            return
+        parts = self.split_query(query)
+        if parts:
+            async for item in self.answer_fanout_stream(parts, student_id, use_cache): yield item
+            return
+        route = await self.route_query(query, student_id)
+        yield {"type": "route", "subject": route["subject"], "agent": route["agent"], "routed_by": route["routed_by"]}
+        cache_key = self.cache_key(route, query, use_cache)
+        cached = await self.cached_answer(cache_key, query, student_id, route)
+        if cached:
+            yield {"type": "text", "text": cached["response"]}
+            yield {"type": "done", **cached}
+            return
+        final_response, final_tools = "", []
+        if route["agent"] == self.tutor.name:
+            final_response, final_tools = route["response"], route["tools_used"]
+            yield {"type": "text", "text": final_response}
+        else:
+            async for item in self.stream_agent_coalesced(route["agent"], query, student_id, \
+                self.coalesce_key(route["subject"], route["agent"], query)):
+                if item["type"] == "text": final_response += item["text"]
+                else: final_tools.append(item["name"])
+                yield item
+        result = {"response": final_response, "agent": route["agent"], \
+            "subject": route["subject"], "tools_used": final_tools, "student_id": student_id}
+        self.store_answer(cache_key, query, result)
+        yield {"type": "done", **result, "context_tokens_saved": self.context_tokens_saved(student_id, route["agent"])}
+
+    async def answer_fanout_stream(self, parts: list[SubQuestion], student_id: str, \
+        use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        # All branches run at once; each section is sent, in the query's order, as soon as it and every
+        # section before it are ready
+        metrics.increment("fanout_queries")
+        yield {"type": "route", "subject": "+".join(part.subject for part in parts), \
+            "agent": "+".join(self.specialist_for(part.subject) for part in parts), "routed_by": QUERY_SPLITTER}
+        branches = [asyncio.ensure_future(self.answer_branch(part, student_id, use_cache)) for part in parts]
+        try:
+            for index, (part, branch) in enumerate(zip(parts, branches)):
+                answer = await branch
+                for name in answer["tools_used"]: yield {"type": "tool_call", "name": name}
+                yield {"type": "text", "text": ("\n\n" if index else "") + self.answer_section(part, answer)}
+        finally:
+            for branch in branches: branch.cancel()
+        yield {"type": "done", **self.merge_answers(parts, [branch.result() for branch in branches], student_id)}
 
 async def cli_main():
     if not settings.GEMINI_API_KEY:
@@ -113,8 +493,7 @@ async def cli_main():
             print("-" * 30)
         except Exception as e:
             print(f"An error occurred: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("CLI query failed")
 
 if __name__ == "__main__":
     try: asyncio.run(cli_main())
@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from common.config import settings
+from common.hash_ring import HashRing
+from common.log import get_logger
+
+# Routes whose JSON body names the student; everything else can go to any worker
+STUDENT_ROUTES = {"/api/chat", "/api/chat/stream"}
+HOP_HEADERS = {"host", "content-length", "connection", "keep-alive", "transfer-encoding", "upgrade"}
+logger = get_logger(__name__)
+
+class Worker:
+    def __init__(self, index: int, port: int) -> None:
+        self.name = f"worker-{index}"
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.process: Optional[subprocess.Popen] = None
+        self.in_flight = 0
+        self.served = 0
+        self.started_at = 0.0
+
+    @property
+    def alive(self) -> bool: return self.process is not None and self.process.poll() is None
+
+    def start(self, env: Dict[str, str]) -> None:
+        self.process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", \
+            "--port", str(self.port), "--log-level", "warning"], env = env)
+        self.started_at = time.time()
+
+    async def stop(self, timeout: float) -> None:
+        # SIGTERM lets uvicorn run the shutdown hook, which flushes this worker's sessions to the database
+        if not self.alive: return
+        self.process.terminate()
+        try: await asyncio.wait_for(asyncio.to_thread(self.process.wait), timeout)
+        except asyncio.TimeoutError: self.process.kill()
+
+class ShardedGateway:
+    # Front door for N app workers. Each student_id is pinned to one worker by consistent hashing, so their
+    # turns always meet the same in-process state. When the worker count changes only the students whose
+    # arc moved change worker: their requests wait while in-flight requests from the old layout drain and
+    # the old owners flush their sessions to the shared database, then continue on the new owner
+    def __init__(self, base_port: int, vnodes: int, drain_timeout: float, admin_token: str) -> None:
+        self.base_port = base_port
+        self.drain_timeout = drain_timeout
+        self.admin_token = admin_token
+        self.ring = HashRing(vnodes = vnodes)
+        self.workers: Dict[str, Worker] = {}
+        self.generation = 0
+        self.in_flight_by_generation: Counter = Counter()
+        self.handoff: Optional[Tuple[HashRing, asyncio.Event]] = None
+        self.next_worker = 0
+        self.next_route = 0
+        self.resize_lock = asyncio.Lock()
+        self.client = httpx.AsyncClient(timeout = httpx.Timeout(None, connect = 5.0), \
+            limits = httpx.Limits(max_connections = 1000, max_keepalive_connections = 100))
+
+    def worker_env(self) -> Dict[str, str]:
+        return {**os.environ, "ADMIN_TOKEN": self.admin_token}
+
+    async def wait_ready(self, worker: Worker, timeout: float = 120.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not worker.alive: raise RuntimeError(f"{worker.name} exited during startup")
+            try:
+                if (await self.client.get(f"{worker.url}/api/health", timeout = 2.0)).status_code == 200: return
+            except httpx.HTTPError: pass
+            await asyncio.sleep(0.25)
+        raise RuntimeError(f"{worker.name} did not become ready within {timeout:g}s")
+
+    async def start_workers(self, count: int) -> List[Worker]:
+        started = []
+        for _ in range(count):
+            worker = Worker(self.next_worker, self.base_port + self.next_worker)
+            self.next_worker += 1
+            worker.start(self.worker_env())
+            started.append(worker)
+        await asyncio.gather(*(self.wait_ready(worker) for worker in started))
+        return started
+
+    async def resize(self, count: int) -> Dict[str, Any]:
+        if count < 1: raise ValueError("At least one worker is required")
+        async with self.resize_lock:
+            old_ring = self.ring.copy()
+            added = await self.start_workers(max(count - len(self.workers), 0))
+            removed = sorted(self.workers.values(), key = lambda worker: worker.port)[count:]
+            new_ring = old_ring.copy()
+            for worker in added:
+                self.workers[worker.name] = worker
+                new_ring.add(worker.name)
+            for worker in removed: new_ring.remove(worker.name)
+            done = asyncio.Event()
+            self.handoff, self.ring = (old_ring, done), new_ring
+            self.generation += 1
+            try:
+                if old_ring.points: await self.drain(self.generation)
+                for worker in removed:
+                    await worker.stop(self.drain_timeout)
+                    del self.workers[worker.name]
+                if old_ring.points: await asyncio.gather(*(self.release(worker) for worker in self.workers.values()))
+            finally:
+                self.handoff = None
+                done.set()
+            return {"workers": sorted(self.workers), "added": [worker.name for worker in added], \
+                "removed": [worker.name for worker in removed], "shares": self.ring.shares()}
+
+    async def drain(self, generation: int) -> None:
+        deadline = time.monotonic() + self.drain_timeout
+        while any(count for started, count in self.in_flight_by_generation.items() if started < generation):
+            if time.monotonic() > deadline:
+                logger.warning("Gateway drain timed out; continuing the rebalance with requests in flight")
+                return
+            await asyncio.sleep(0.05)
+
+    async def release(self, worker: Worker) -> None:
+        try:
+            response = await self.client.post(f"{worker.url}/api/admin/sessions/release", \
+                headers = {"X-Admin-Token": self.admin_token}, timeout = self.drain_timeout)
+            response.raise_for_status()
+        except httpx.HTTPError as e: logger.warning("Could not release sessions", extra = {"worker": worker.name, "error": str(e)})
+
+    async def route(self, student_id: Optional[str]) -> Worker:
+        if student_id is None:
+            # Requests without a student are spread round robin
+            names = self.ring.nodes
+            self.next_route = (self.next_route + 1) % len(names)
+            return self.workers[names[self.next_route]]
+        while self.handoff and self.handoff[0].points and \
+            self.handoff[0].node_for(student_id) != self.ring.node_for(student_id):
+            await self.handoff[1].wait()
+        return self.workers[self.ring.node_for(student_id)]
+
+    async def forward(self, request: Request, path: str) -> StreamingResponse:
+        body = await request.body()
+        student_id = None
+        if request.url.path in STUDENT_ROUTES:
+            try: student_id = json.loads(body or b"{}").get("student_id") or "web_user"
+            except (ValueError, AttributeError): student_id = "web_user"
+        worker = await self.route(student_id)
+        generation = self.generation
+        self.in_flight_by_generation[generation] += 1
+        worker.in_flight += 1
+        def finish() -> None:
+            self.in_flight_by_generation[generation] -= 1
+            if not self.in_flight_by_generation[generation]: del self.in_flight_by_generation[generation]
+            worker.in_flight -= 1
+            worker.served += 1
+        try:
+            upstream = await self.client.send(self.client.build_request(request.method, f"{worker.url}/{path}", \
+                params = request.query_params, content = body, headers = {key: value for key, value \
+                    in request.headers.items() if key.lower() not in HOP_HEADERS}), stream = True)
+        except httpx.HTTPError as e:
+            finish()
+            raise HTTPException(status_code = 502, detail = f"{worker.name} is unavailable: {e}")
+        async def relay():
+            # Streams SSE and regular bodies through as they arrive; the request counts as in flight until done
+            try:
+                async for chunk in upstream.aiter_raw(): yield chunk
+            finally:
+                await upstream.aclose()
+                finish()
+        return StreamingResponse(relay(), status_code = upstream.status_code, headers = {key: value \
+            for key, value in upstream.headers.items() if key.lower() not in HOP_HEADERS})
+
+    async def report(self) -> Dict[str, Any]:
+        shares = self.ring.shares()
+        async def worker_report(worker: Worker) -> Dict[str, Any]:
+            try: sessions = (await self.client.get(f"{worker.url}/api/metrics", timeout = 2.0)).json().get("sessions")
+            except (httpx.HTTPError, ValueError): sessions = None
+            return {"worker": worker.name, "url": worker.url, "pid": worker.process.pid if worker.process else None, \
+                "alive": worker.alive, "in_flight": worker.in_flight, "served": worker.served, \
+                    "key_share": shares.get(worker.name, 0.0), "uptime": time.time() - worker.started_at, "sessions": sessions}
+        workers = sorted(self.workers.values(), key = lambda worker: worker.port)
+        return {"generation": self.generation, "rebalancing": self.handoff is not None, \
+            "workers": await asyncio.gather(*(worker_report(worker) for worker in workers))}
+
+    async def close(self) -> None:
+        await asyncio.gather(*(worker.stop(self.drain_timeout) for worker in self.workers.values()))
+        await self.client.aclose()
+
+class ResizeRequest(BaseModel):
+    workers: int
+
+def create_gateway_app(workers: int, base_port: int) -> FastAPI:
+    # Workers only listen on localhost; if no ADMIN_TOKEN is configured the gateway makes one up for its own
+    # calls to them, and the gateway's admin endpoints stay closed as they are in app.py
+    gateway = ShardedGateway(base_port, settings.GATEWAY_VNODES, settings.GATEWAY_DRAIN_TIMEOUT, \
+        settings.ADMIN_TOKEN or secrets.token_urlsafe(32))
+    app = FastAPI(title = "Multi-Agent Tutoring Bot gateway")
+
+    def require_admin(x_admin_token: Optional[str]) -> None:
+        if not settings.ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+            raise HTTPException(status_code = 403, detail = "Admin token required")
+
+    @app.on_event("startup")
+    async def start() -> None:
+        if settings.SESSION_BACKEND != "sqlite":
+            logger.warning("SESSION_BACKEND is not sqlite; students lose their history when the worker count changes")
+        logger.info("Starting workers", extra = {"workers": workers, "ports": f"{base_port}-{base_port + workers - 1}"})
+        logger.info("Workers started", extra = await gateway.resize(workers))
+
+    @app.on_event("shutdown")
+    async def stop() -> None: await gateway.close()
+
+    @app.get("/gateway/workers")
+    async def workers_report() -> Dict[str, Any]: return await gateway.report()
+
+    @app.post("/gateway/workers")
+    async def resize_workers(resize: ResizeRequest, x_admin_token: Optional[str] = Header(default = None)) -> Dict[str, Any]:
+        require_admin(x_admin_token)
+        try: return await gateway.resize(resize.workers)
+        except (ValueError, RuntimeError) as e: raise HTTPException(status_code = 400, detail = str(e))
+
+    @app.api_route("/{path:path}", methods = ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+    async def proxy(path: str, request: Request) -> StreamingResponse: return await gateway.forward(request, path)
+
+    app.state.gateway = gateway
+    return app
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Production launcher: N app workers behind a student-affinity gateway")
+    parser.add_argument("--workers", type = int, default = settings.WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--host", default = settings.HOST)
+    parser.add_argument("--port", type = int, default = settings.TUTOR_PORT)
+    parser.add_argument("--worker-base-port", type = int, default = settings.WORKER_BASE_PORT)
+    args = parser.parse_args()
+    uvicorn.run(create_gateway_app(args.workers, args.worker_base_port), host = args.host, port = args.port)
+
+if __name__ == "__main__": main()
@@ -0,0 +1,41 @@
+import asyncio
+
+import httpx
+
+from common.a2a_client import A2AClient, AgentPolicy
+
+URL = "http://agent:9000/run"
+
+def half_open_client(handler, max_concurrency = 1):
+    client = A2AClient("http://agent", default_policy = AgentPolicy(timeout = 5.0, max_concurrency = max_concurrency, \
+        queue_timeout = 0.05), retries = 0, breaker_failures = 1, breaker_reset = 0.0, \
+            transport = httpx.MockTransport(handler))
+    client.breaker("math_specialist@agent:9000").trip()
+    return client
+
+def test_probe_that_finds_no_free_slot_is_handed_back():
+    async def scenario():
+        client = half_open_client(lambda request: httpx.Response(200, json = {"response": "ok"}))
+        semaphore = client.semaphore("math_specialist@agent:9000", 1)
+        await semaphore.acquire()
+        assert (await client.post("math_specialist", URL, {}))["status"] == "overloaded"
+        semaphore.release()
+        assert await client.post("math_specialist", URL, {}) == {"response": "ok"}
+        await client.close()
+    asyncio.run(scenario())
+
+def test_cancelled_probe_is_handed_back():
+    async def scenario():
+        started = asyncio.Event()
+        async def slow(request):
+            started.set()
+            await asyncio.sleep(10)
+        client = half_open_client(slow)
+        probe = asyncio.create_task(client.post("math_specialist", URL, {}))
+        await started.wait()
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions = True)
+        breaker = client.breaker("math_specialist@agent:9000")
+        assert not breaker.probing and breaker.allow()
+        await client.close()
+    asyncio.run(scenario())
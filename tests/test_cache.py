@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+
+from common.cache import ResponseCache
+
+VALUE = {"response": "F = ma", "tools_used": [], "subject": "physics", "agent": "physics_specialist", \
+    "query": "newton's second law"}
+
+def with_disk(scenario):
+    with tempfile.TemporaryDirectory() as directory: asyncio.run(scenario(os.path.join(directory, "responses.sqlite3")))
+
+def test_disk_tier_is_written_behind_and_read_back():
+    async def scenario(path):
+        cache = ResponseCache(disk_path = path, flush_interval = 0.01)
+        cache.put("k", "physics", VALUE["query"], VALUE)
+        assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+        await asyncio.sleep(0.1)
+        assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 1
+        await cache.close()
+        assert await ResponseCache(disk_path = path).get("k") == VALUE
+        assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with_disk(scenario)
+
+def test_entries_pushed_out_of_memory_before_the_flush_are_still_served():
+    async def scenario(path):
+        cache = ResponseCache(max_entries = 1, disk_path = path, flush_interval = 60)
+        cache.put("k", "physics", VALUE["query"], VALUE)
+        cache.put("other", "math", "2+2", {**VALUE, "subject": "math", "query": "2+2"})
+        assert await cache.get("k") == VALUE
+        await cache.close()
+    with_disk(scenario)
+
+def test_invalidate_removes_entries_still_waiting_for_the_disk():
+    async def scenario(path):
+        cache = ResponseCache(disk_path = path, flush_interval = 60)
+        cache.put("k", "physics", VALUE["query"], VALUE)
+        assert await cache.invalidate(subject = "physics") == 1
+        assert await cache.get("k") is None
+        await cache.close()
+        assert await ResponseCache(disk_path = path).get("k") is None
+    with_disk(scenario)
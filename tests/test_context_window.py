@@ -0,0 +1,21 @@
+import asyncio
+
+from google.genai import types
+
+from common.context_window import ContextWindowManager
+
+def turn(text, reply):
+    return [types.Content(role = "user", parts = [types.Part.from_text(text = text)]), \
+        types.Content(role = "model", parts = [types.Part.from_text(text = reply)])]
+
+def test_failed_fold_falls_back_to_the_extractive_digest():
+    async def broken_summarizer(previous_summary, contents): raise RuntimeError("summary model unavailable")
+    async def scenario():
+        manager = ContextWindowManager({}, summarizer = broken_summarizer)
+        summary = manager.summary_for("s")
+        older = turn("What is momentum?", "Momentum is mass times velocity.") + turn("And energy?", "Energy is work.")
+        manager.schedule_fold(summary, older)
+        await summary.task
+        assert summary.folded == len(older)
+        assert "Student: What is momentum?" in summary.text
+    asyncio.run(scenario())
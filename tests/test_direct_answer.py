@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from agents.tutor_orchestrator.direct_answer import DirectAnswerer
+from tools.calculator import CalculatorTool
+from tools.constants import UniversalConstantsTool
+
+answerer = DirectAnswerer(CalculatorTool(), UniversalConstantsTool(), mode = "relaxed")
+
+def answer(query):
+    return asyncio.run(answerer.answer(query))
+
+@pytest.mark.parametrize("query", ["what is gravity", "what is gravity?", "gravity", "what is the speed of light"])
+def test_relaxed_mode_leaves_conceptual_questions_to_the_tutors(query):
+    assert answer(query) is None
+
+@pytest.mark.parametrize("query", ["what is g", "h", "what is the gravitational constant", \
+    "boltzmann constant", "value of speed of light", "what is the value of the planck constant"])
+def test_relaxed_mode_answers_explicit_value_requests(query):
+    result = answer(query)
+    assert result is not None and result["tools_used"] == ["lookup_constant"]
+
+strict = DirectAnswerer(CalculatorTool(), UniversalConstantsTool(), mode = "strict")
+
+def strict_answer(query):
+    return asyncio.run(strict.answer(query))
+
+@pytest.mark.parametrize("query", ["2023-2024", "2023 - 2024", "what is 2023-2024", "3-2", "7*8", "2^64"])
+def test_strict_mode_leaves_ranges_and_bare_single_operations_to_the_tutors(query):
+    assert strict_answer(query) is None
+
+@pytest.mark.parametrize("query, response", [("calculate 2023-2024", "2023-2024 = -1"), ("what is 7*8", "7*8 = 56"), \
+    ("12*(4+3)/sqrt(25)", "12*(4+3)/sqrt(25) = 16.8"), ("3*4+5", "3*4+5 = 17")])
+def test_strict_mode_answers_explicit_calculations(query, response):
+    assert strict_answer(query)["response"] == response
+
+@pytest.mark.parametrize("query", ["what is sin(30)", "cos(pi/3)", "calculate atan(1)"])
+def test_trigonometric_answers_say_they_use_radians(query):
+    assert strict_answer(query)["response"].endswith("(angles in radians)")
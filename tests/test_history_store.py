@@ -0,0 +1,35 @@
+from google.adk.sessions.state import State
+
+from tools.history_store import HistoryStore
+
+def fill(state, topics, **options):
+    history = HistoryStore(state, capacity = 10, compaction_batch = 5, **options)
+    for i, topic in enumerate(topics): history.add(topic, f"point {i}")
+    return history
+
+def test_archive_keeps_a_bounded_number_of_topics():
+    state = {}
+    history = fill(state, [f"topic number {i}" for i in range(200)], archive_topics = 8)
+    assert len(state["conversation_archive:index"]) == 8
+    assert len([key for key in state if key.startswith("conversation_archive:slot:")]) == 8
+    # The most recently archived topics survive; the oldest ones were evicted
+    assert history.find("topic number 185") and not history.find("topic number 3")
+
+def test_posting_lists_are_dropped_once_empty():
+    state = {}
+    fill(state, [f"topic {chr(97 + i % 26)}{i}" for i in range(300)], archive_topics = 4)
+    postings = [key for key in state if key.startswith("conversation_topic:")]
+    assert all(state[key] for key in postings)
+    assert len(postings) < 300
+
+def test_adk_state_keeps_working_without_deletes():
+    state = State({}, {})
+    history = fill(state, [f"topic number {i}" for i in range(60)], archive_topics = 4)
+    assert [entry["topic"] for entry in history.find("topic number 59")] == ["topic number 59"]
+    assert len(state.get("conversation_archive:index")) == 4
+
+def test_repeated_topics_merge_into_one_archive_entry():
+    state = {}
+    history = fill(state, ["momentum", "energy"] * 20, archive_topics = 8)
+    assert sorted(state["conversation_archive:index"]) == ["energy", "momentum"]
+    assert history.find("momentum")[0]["merged_count"] > 1
@@ -0,0 +1,57 @@
+from google.adk.agents import LlmAgent
+
+from agents.math_agent.math_agent import math_agent
+from agents.physics_agent.physics_agent import physics_agent
+from agents.tutor_orchestrator.tutor_agent import classifier_agent, tutor_orchestrator
+from common.admission import AdmissionControlledLlm, limit_llm
+from common.config import settings
+from common.model_selection import HedgedLlm, _wrapped_agents, hedge_agent_model
+from common.tracing import TracedLlm, trace_agent_model
+from common.utils import model_layers
+from main import MultiAgentTutoringSystem
+
+WRAPPER_SETTINGS = {"LLM_BACKEND": "gemini", "MODEL_LIMITS_ENABLED": True, "TRACING_ENABLED": True, \
+    "MODEL_HEDGING_ENABLED": True}
+
+def build_twice_on_gemini():
+    # The agents are module-level objects shared by every system. The fake backend resets their models on
+    # each build, which would hide a second wrapping, so these builds start from the bare models instead
+    agents = [tutor_orchestrator, math_agent, physics_agent, classifier_agent]
+    saved = {name: getattr(settings, name) for name in WRAPPER_SETTINGS}
+    saved_models = [agent.model for agent in agents]
+    for name, value in WRAPPER_SETTINGS.items(): setattr(settings, name, value)
+    for agent in agents: agent.model = list(model_layers(agent.model))[-1]
+    _wrapped_agents.clear()
+    try:
+        MultiAgentTutoringSystem()
+        MultiAgentTutoringSystem()
+        return [(agent.name, agent.model) for agent in agents]
+    finally:
+        for name, value in saved.items(): setattr(settings, name, value)
+        for agent, model in zip(agents, saved_models): agent.model = model
+        _wrapped_agents.clear()
+
+def count_layers(model, kind): return sum(isinstance(layer, kind) for layer in model_layers(model))
+
+def test_building_the_system_twice_limits_each_model_once():
+    for name, model in build_twice_on_gemini(): assert count_layers(model, AdmissionControlledLlm) == 1, name
+
+def test_building_the_system_twice_hedges_each_model_once():
+    for name, model in build_twice_on_gemini(): assert count_layers(model, HedgedLlm) == 1, name
+
+def test_building_the_system_twice_traces_each_model_once():
+    for name, model in build_twice_on_gemini(): assert count_layers(model, TracedLlm) == 1, name
+
+def test_tracing_is_not_repeated_under_another_wrapper():
+    agent = LlmAgent(name = "traced", model = "gemini-2.0-flash")
+    trace_agent_model(agent)
+    hedge_agent_model(agent, ["gemini-1.5-flash-latest"])
+    trace_agent_model(agent)
+    assert count_layers(agent.model, TracedLlm) == 1
+
+def test_hedging_is_not_repeated_under_another_wrapper():
+    agent = LlmAgent(name = "wrapped", model = "gemini-2.0-flash")
+    hedge_agent_model(agent, ["gemini-1.5-flash-latest"])
+    agent.model = limit_llm(agent.model)
+    hedge_agent_model(agent, ["gemini-1.5-flash-latest"])
+    assert count_layers(agent.model, HedgedLlm) == 1
@@ -0,0 +1,29 @@
+import pytest
+
+from agents.tutor_orchestrator.query_splitter import SubQuestion, split_clauses, split_query
+
+PHYSICS_WORDS = ("ball", "thrown", "high", "black hole", "velocity", "force", "time", "m/s")
+
+class KeywordRouter:
+    # Stands in for the trained router: physics if a physics word appears, math otherwise
+    def predict_proba(self, query):
+        if any(word in query.lower() for word in PHYSICS_WORDS): return {"physics": 0.9, "math": 0.05, "general": 0.05}
+        return {"math": 0.9, "physics": 0.05, "general": 0.05}
+
+def test_independent_clauses_are_split():
+    assert split_query("Tell me about black holes and also calculate 5*5", KeywordRouter()) == \
+        [SubQuestion("physics", "Tell me about black holes"), SubQuestion("math", "calculate 5*5")]
+
+def test_then_is_not_a_clause_boundary():
+    assert split_clauses("Find the velocity and then solve x^2 = 4") == ["Find the velocity and then solve x^2 = 4"]
+
+@pytest.mark.parametrize("query", [
+    "A ball is thrown at 20 m/s. How high does it go? Then solve for the time using the quadratic formula.",
+    "What force acts on a 2 kg ball at 3 m/s^2? Then factor x^2 - 4",
+    "Integrate x^2 from 0 to 3. Use the result as the velocity of a ball",
+    "Solve x^2 = 9 and explain why",
+    "Solve x^2 = 9; what is its velocity in m/s",
+    "Differentiate x^3. What force does that give on a 2 kg ball",
+])
+def test_dependent_clauses_are_not_split(query):
+    assert split_query(query, KeywordRouter()) == []
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from google.adk.events import Event
+from google.genai import types
+
+from common.session_store import SQLiteSessionService
+
+def with_store(scenario, **options):
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(scenario(SQLiteSessionService(os.path.join(directory, "sessions.sqlite3"), **options)))
+
+def event(text):
+    return Event(author = "user", content = types.Content(role = "user", parts = [types.Part.from_text(text = text)]))
+
+def test_session_is_not_evicted_while_its_batch_is_being_written():
+    async def scenario(store):
+        write = store._write
+        store._write = lambda batch: (time.sleep(0.2), write(batch))
+        session = await store.create_session(app_name = "app", user_id = "u", session_id = "a")
+        await store.append_event(session, event("first"))
+        flushing = asyncio.create_task(store.flush())
+        await asyncio.sleep(0.05)
+        # Pushes "a" out of the one-session memory tier while its event is still on the way to disk
+        await store.create_session(app_name = "app", user_id = "u", session_id = "b")
+        loaded = await store.get_session(app_name = "app", user_id = "u", session_id = "a")
+        await flushing
+        assert [ev.content.parts[0].text for ev in loaded.events] == ["first"]
+        await store.close()
+    with_store(scenario, max_sessions_in_memory = 1, flush_interval = 60)
+
+def test_deleted_session_stays_deleted():
+    async def scenario(store):
+        session = await store.create_session(app_name = "app", user_id = "u", session_id = "a")
+        await store.append_event(session, event("first"))
+        await store.flush()
+        await store.delete_session(app_name = "app", user_id = "u", session_id = "a")
+        assert await store.get_session(app_name = "app", user_id = "u", session_id = "a") is None
+        await store.close()
+    with_store(scenario, flush_interval = 60)
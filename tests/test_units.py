@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from tools.formulas import FormulaEngine
+from tools.units import to_si
+
+
+def solve(*args):
+    return asyncio.run(FormulaEngine().solve(*args))
+
+@pytest.mark.parametrize("unit, dimension, factor", [
+    ("mJ", "energy", 1e-3), ("MJ", "energy", 1e6), ("mV", "voltage", 1e-3), ("MV", "voltage", 1e6),
+    ("mA", "current", 1e-3), ("MA", "current", 1e6), ("mW", "power", 1e-3), ("MW", "power", 1e6),
+    ("mm", "length", 1e-3), ("Mm", "length", 1e6), ("mHz", "frequency", 1e-3), ("MHz", "frequency", 1e6),
+])
+def test_milli_and_mega_are_told_apart_by_case(unit, dimension, factor):
+    assert to_si(1, unit, dimension) == pytest.approx(factor)
+
+@pytest.mark.parametrize("unit, dimension", [("mj", "energy"), ("mv", "voltage"), ("MM", "length")])
+def test_case_folded_prefixes_are_refused(unit, dimension):
+    with pytest.raises(ValueError, match = "Ambiguous unit"): to_si(1, unit, dimension)
+
+def test_kinetic_energy_in_millijoules_and_megajoules():
+    knowns = ["m = 2 kg", "v = 36 km/h"]
+    assert solve("kinetic_energy", "ke", knowns, "mJ")["result"] == pytest.approx(1e5)
+    assert solve("kinetic_energy", "ke", knowns, "MJ")["result"] == pytest.approx(1e-4)
+
+def test_millijoule_input_is_not_read_as_megajoules():
+    result = solve("kinetic_energy", "m", ["ke = 5 mJ", "v = 1 m/s"], "")
+    assert result["result"] == pytest.approx(0.01)
@@ -1,10 +1,92 @@
 import ast
+import asyncio
+import concurrent.futures
 import math
+import multiprocessing
 import operator
-from typing import Any, Dict, List, Union
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple, Union
 
+import numpy as np
 
-class CalculatorTool:    
+COMPILED_CACHE_SIZE = 1024
+MAX_BATCH_SIZE = 100_000
+MAX_STEPS = 50
+FLOAT_MAX_LOG2 = 1024.0
+
+class CompiledExpression:
+    # A validated expression compiled once to a code object; `variables` are its free names
+    def __init__(self, code: Any, variables: FrozenSet[str], tree: ast.AST) -> None:
+        self.code = code
+        self.variables = variables
+        self.tree = tree
+
+    def evaluate(self, namespace: Dict[str, Any]) -> Any:
+        return eval(self.code, {"__builtins__": {}}, namespace)
+
+class CalculationCost(NamedTuple):
+    # Upper-bound estimates: log2 of the largest intermediate integer, AST node count,
+    # nesting depth, and big-integer work in 64-bit limb operations
+    result_bits: float
+    operations: int
+    depth: int
+    work: float
+
+class EvaluationPool:
+    # Worker processes for evaluations too heavy for the event loop. A timed-out worker cannot be
+    # interrupted, so the whole pool is terminated and lazily recreated on the next submission
+    def __init__(self, workers: int = 2) -> None:
+        self.workers = workers
+        self.executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Any, *args: Any) -> concurrent.futures.Future:
+        with self._lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ProcessPoolExecutor(max_workers = self.workers, \
+                    mp_context = multiprocessing.get_context("spawn"))
+            return self.executor.submit(fn, *args)
+
+    def run(self, timeout: float, fn: Any, *args: Any) -> Any:
+        future = self.submit(fn, *args)
+        try: return future.result(timeout = timeout)
+        except (concurrent.futures.TimeoutError, BrokenProcessPool): self.restart(); raise
+
+    async def run_async(self, timeout: float, fn: Any, *args: Any) -> Any:
+        future = self.submit(fn, *args)
+        try: return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, BrokenProcessPool): self.restart(); raise
+
+    def restart(self) -> None:
+        with self._lock:
+            executor, self.executor = self.executor, None
+        if executor is None: return
+        terminate = getattr(executor, "terminate_workers", None)
+        if terminate: terminate()
+        else:
+            for process in list((executor._processes or {}).values()): process.terminate()
+        executor.shutdown(wait = False, cancel_futures = True)
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self.executor = self.executor, None
+        if executor: executor.shutdown(wait = False, cancel_futures = True)
+
+evaluation_pool = EvaluationPool()
+
+def evaluate_in_worker(normalized_expr: str, variables: Optional[Dict[str, Any]] = None, \
+    bindings: Optional[Dict[str, List[float]]] = None) -> Any:
+    # Runs in a pool process; the compiled-expression cache is per process. `variables` are scalar
+    # step results, `bindings` are the value arrays of a vectorised batch
+    compiled = CalculatorTool.compile_expression(normalized_expr)
+    if bindings is None: return compiled.evaluate(CalculatorTool.namespace(CalculatorTool.functions, variables))
+    arrays = {name: np.asarray(values, dtype = float) for name, values in bindings.items()}
+    with np.errstate(all = "ignore"):
+        return compiled.evaluate(CalculatorTool.namespace(CalculatorTool.array_functions, arrays))
+
+class CalculatorTool:
     operators: Dict[Any, Any] = {
         ast.Add: lambda a, b: a + b,
         ast.Sub: lambda a, b: a - b,
@@ -14,11 +96,14 @@ class CalculatorTool:
         ast.BitXor: lambda a, b: a ^ b,
         ast.USub: lambda a: -a,
     }
-    
+
     functions: Dict[str, Any] = {
         'sin': math.sin,
         'cos': math.cos,
         'tan': math.tan,
+        'asin': math.asin,
+        'acos': math.acos,
+        'atan': math.atan,
         'sqrt': math.sqrt,
         'log': math.log,
         'log10': math.log10,
@@ -30,62 +115,346 @@ class CalculatorTool:
         'pi': lambda: math.pi,
         'e': lambda: math.e,
     }
-    
-    @staticmethod
+
+    # Vectorised counterparts used by calculate_batch; functions without a ufunc fall back to np.vectorize
+    array_functions: Dict[str, Any] = {
+        'sin': np.sin,
+        'cos': np.cos,
+        'tan': np.tan,
+        'asin': np.arcsin,
+        'acos': np.arccos,
+        'atan': np.arctan,
+        'sqrt': np.sqrt,
+        'log': np.log,
+        'log10': np.log10,
+        'log2': np.log2,
+        'exp': np.exp,
+        'abs': np.abs,
+        'round': np.round,
+        'factorial': np.vectorize(lambda n: math.factorial(int(n)) if float(n).is_integer() else \
+            math.factorial(n), otypes = [object]),
+        'pi': lambda: math.pi,
+        'e': lambda: math.e,
+    }
+
+    constants: Dict[str, float] = {'pi': math.pi, 'e': math.e}
+
+    def __init__(self, max_expression_length: int = 500, max_result_bits: int = 10_000, \
+        max_operations: int = 500, max_depth: int = 50, inline_work: float = 50_000, \
+            timeout: float = 2.0, pool: Optional[EvaluationPool] = None) -> None:
+        self.max_expression_length = max_expression_length
+        self.max_result_bits = max_result_bits
+        self.max_operations = max_operations
+        self.max_depth = max_depth
+        self.inline_work = inline_work
+        self.timeout = timeout
+        self.pool = pool or evaluation_pool
+
+    @classmethod
     def evaluate_node(cls, node: ast.AST) -> Union[int, float]:
+        # Reference tree-walking evaluator; calculate() runs the compiled form of the same whitelist
         if isinstance(node, ast.Constant): return node.value
         elif isinstance(node, ast.BinOp):
-            left = CalculatorTool.evaluate_node(node.left)
-            right = CalculatorTool.evaluate_node(node.right)
+            left = cls.evaluate_node(node.left)
+            right = cls.evaluate_node(node.right)
             op_type = type(node.op)
-            if op_type in CalculatorTool.operators: return CalculatorTool.\
-                operators[op_type](left, right)
+            if op_type in cls.operators: return cls.operators[op_type](left, right)
             raise ValueError(f"Unsupported binary operator: {op_type.__name__}")
         elif isinstance(node, ast.UnaryOp):
-            operand = CalculatorTool.evaluate_node(node.operand)
+            operand = cls.evaluate_node(node.operand)
             op_type = type(node.op)
-            if op_type in CalculatorTool.operators: return CalculatorTool.\
-                operators[op_type](operand)
+            if op_type in cls.operators: return cls.operators[op_type](operand)
             raise ValueError(f"Unsupported unary operator: {op_type.__name__}")
         elif isinstance(node, ast.Call):
             func_node = node.func
             if isinstance(func_node, ast.Name): func_name = func_node.id
             elif isinstance(func_node, ast.Attribute): func_name = func_node.attr
             else: raise ValueError(f"Unsupported function call structure: {ast.dump(node)}")
-            if func_name not in CalculatorTool.functions:
+            if func_name not in cls.functions:
                 raise ValueError(f"Unsupported function: {func_name}")
-            args = [CalculatorTool.evaluate_node(arg) for arg in node.args]
-            return CalculatorTool.functions[func_name](*args)
+            args = [cls.evaluate_node(arg) for arg in node.args]
+            return cls.functions[func_name](*args)
         elif isinstance(node, ast.Name) and node.id in ['pi', 'e']:
-             if node.id in CalculatorTool.functions: return CalculatorTool.functions[node.id]()
+             if node.id in cls.functions: return cls.functions[node.id]()
         raise ValueError(f"Unsupported AST node type: {type(node).__name__}")
 
     @classmethod
-    def get_supported_functions(cls) -> List[str]: return list(cls.functions.keys())
+    def validate_node(cls, node: ast.AST, variables: set) -> ast.AST:
+        # Enforces the whitelist and rewrites the tree into a form safe to compile:
+        # module-qualified calls become bare names and pi/e become literals
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError(f"Unsupported constant: {node.value!r}")
+            return node
+        elif isinstance(node, ast.BinOp):
+            if type(node.op) not in cls.operators:
+                raise ValueError(f"Unsupported binary operator: {type(node.op).__name__}")
+            return ast.BinOp(left = cls.validate_node(node.left, variables), op = node.op, \
+                right = cls.validate_node(node.right, variables))
+        elif isinstance(node, ast.UnaryOp):
+            if type(node.op) not in cls.operators:
+                raise ValueError(f"Unsupported unary operator: {type(node.op).__name__}")
+            return ast.UnaryOp(op = node.op, operand = cls.validate_node(node.operand, variables))
+        elif isinstance(node, ast.Call):
+            func_node = node.func
+            if isinstance(func_node, ast.Name): func_name = func_node.id
+            elif isinstance(func_node, ast.Attribute): func_name = func_node.attr
+            else: raise ValueError(f"Unsupported function call structure: {ast.dump(node)}")
+            if func_name not in cls.functions: raise ValueError(f"Unsupported function: {func_name}")
+            if node.keywords: raise ValueError(f"Keyword arguments are not supported: {func_name}")
+            return ast.Call(func = ast.Name(id = f"fn_{func_name}", ctx = ast.Load()), \
+                args = [cls.validate_node(arg, variables) for arg in node.args], keywords = [])
+        elif isinstance(node, ast.Name):
+            if node.id in cls.constants: return ast.Constant(value = cls.constants[node.id])
+            if node.id.startswith("fn_") or not node.id.isidentifier():
+                raise ValueError(f"Unsupported variable name: {node.id}")
+            variables.add(node.id)
+            return ast.Name(id = node.id, ctx = ast.Load())
+        raise ValueError(f"Unsupported AST node type: {type(node).__name__}")
+
+    @staticmethod
+    def estimate_cost(tree: ast.AST, variable_magnitudes: Optional[Dict[str, Tuple[float, bool]]] = None) -> CalculationCost:
+        # Propagates (log2 |value| upper bound, is_int) bottom-up over a validated tree. Floats are capped
+        # at the double range since overflowing them raises quickly; integers are what grow without bound.
+        # Variables count as unbounded floats unless their magnitudes are supplied
+        variable_magnitudes = variable_magnitudes or {}
+        totals = {"operations": 0, "depth": 0, "work": 0.0, "bits": 0.0}
+
+        def visit(node: ast.AST, depth: int) -> Tuple[float, bool]:
+            totals["operations"] += 1
+            totals["depth"] = max(totals["depth"], depth)
+            if isinstance(node, ast.Constant):
+                value = abs(node.value)
+                magnitude, is_int = (math.log2(value) if value > 1 else 0.0), isinstance(node.value, int)
+            elif isinstance(node, ast.Name):
+                magnitude, is_int = variable_magnitudes.get(node.id, (FLOAT_MAX_LOG2, False))
+            elif isinstance(node, ast.UnaryOp): magnitude, is_int = visit(node.operand, depth + 1)
+            elif isinstance(node, ast.BinOp):
+                left, left_int = visit(node.left, depth + 1)
+                right, right_int = visit(node.right, depth + 1)
+                is_int = left_int and right_int and not isinstance(node.op, ast.Div)
+                if isinstance(node.op, (ast.Add, ast.Sub)): magnitude = max(left, right) + 1
+                elif isinstance(node.op, ast.Mult): magnitude = left + right
+                elif isinstance(node.op, ast.Div): magnitude = FLOAT_MAX_LOG2
+                elif isinstance(node.op, ast.Pow):
+                    exponent = 2.0 ** right if right < FLOAT_MAX_LOG2 else math.inf
+                    magnitude = left * exponent if left > 0 else 0.0
+                    if is_int and magnitude > 64: totals["work"] += (magnitude / 64) ** 1.585
+                else: magnitude = max(left, right)
+            elif isinstance(node, ast.Call):
+                name = node.func.id[len("fn_"):]
+                args = [visit(arg, depth + 1) for arg in node.args]
+                argument, argument_int = args[0] if args else (0.0, False)
+                is_int = name == "factorial" or (name in ("abs", "round") and argument_int) or \
+                    (name == "round" and len(args) == 1)
+                if name == "factorial":
+                    n = 2.0 ** argument if argument < FLOAT_MAX_LOG2 else math.inf
+                    magnitude = math.lgamma(n + 1) / math.log(2) if n < 1e300 else math.inf
+                    # CPython multiplies by binary splitting: about log2(n) rounds of large products
+                    totals["work"] += (magnitude / 64) ** 1.585 * math.log2(max(n, 2.0))
+                elif name in ("sin", "cos", "asin", "acos", "atan"): magnitude = 2.0
+                elif name == "sqrt": magnitude = argument / 2
+                elif name in ("log", "log10", "log2"): magnitude = math.log2(max(argument, 1.0)) + 1
+                elif name in ("abs", "round"): magnitude = argument
+                elif name in ("pi", "e"): magnitude = 2.0
+                else: magnitude = FLOAT_MAX_LOG2
+            else: raise ValueError(f"Unsupported AST node type: {type(node).__name__}")
+            if not is_int: magnitude = min(magnitude, FLOAT_MAX_LOG2)
+            else:
+                if not isinstance(node, (ast.Constant, ast.Name)): totals["work"] += magnitude / 64 + 1
+                totals["bits"] = max(totals["bits"], magnitude)
+            return magnitude, is_int
+
+        visit(tree, 1)
+        return CalculationCost(result_bits = totals["bits"], operations = totals["operations"], \
+            depth = totals["depth"], work = totals["work"])
+
+    @staticmethod
+    def normalize(expr: str) -> str: return expr.lower().replace('^', '**').replace(' ', '')
+
+    @staticmethod
+    @lru_cache(maxsize = COMPILED_CACHE_SIZE)
+    def compile_expression(normalized_expr: str) -> CompiledExpression:
+        if not normalized_expr: raise ValueError("Expression cannot be empty.")
+        parsed_ast = ast.parse(normalized_expr, mode = 'eval')
+        if not isinstance(parsed_ast, ast.Expression) or not parsed_ast.body:
+            raise SyntaxError("Invalid expression structure.")
+        variables: set = set()
+        body = CalculatorTool.validate_node(parsed_ast.body, variables)
+        tree = ast.fix_missing_locations(ast.Expression(body = body))
+        return CompiledExpression(compile(tree, "<calculator>", "eval"), frozenset(variables), body)
+
+    @classmethod
+    def namespace(cls, functions: Dict[str, Any], variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        namespace = {f"fn_{name}": func for name, func in functions.items()}
+        namespace.update(variables or {})
+        return namespace
 
     @classmethod
-    def calculate(cls, expr: str) -> Dict[str, Any]:
+    def get_supported_functions(cls) -> List[str]: return list(cls.functions.keys())
+
+    def prepare(self, expr: str, variable_magnitudes: Optional[Dict[str, Tuple[float, bool]]] = None, \
+        repeat: int = 1) -> Tuple[str, CompiledExpression, bool]:
+        # Compiles and prices an expression, rejecting anything over the limits before it runs;
+        # the returned flag says whether evaluation is heavy enough to leave the event loop
+        if len(expr) > self.max_expression_length:
+            raise ValueError(f"Expression too long: {len(expr)} characters (max {self.max_expression_length}).")
+        normalized = self.normalize(expr)
+        compiled = self.compile_expression(normalized)
+        cost = self.estimate_cost(compiled.tree, variable_magnitudes)
+        if cost.depth > self.max_depth:
+            raise ValueError(f"Expression nested too deeply: depth {cost.depth} (max {self.max_depth}).")
+        if cost.operations > self.max_operations:
+            raise ValueError(f"Expression too complex: {cost.operations} operations (max {self.max_operations}).")
+        if cost.result_bits > self.max_result_bits:
+            raise ValueError(f"Result too large: about {self.describe_bits(cost.result_bits)} " \
+                f"(max {self.describe_bits(self.max_result_bits)}).")
+        return normalized, compiled, cost.work * repeat > self.inline_work
+
+    @staticmethod
+    def describe_bits(bits: float) -> str:
+        return f"{int(bits * math.log10(2)) + 1} digits" if bits < math.inf else "an unbounded number of digits"
+
+    def calculate(self, expr: str) -> Dict[str, Any]:
         try:
-            processed_expr = expr.lower().replace('^', '**').replace(' ', '')
-            if not processed_expr: raise ValueError("Expression cannot be empty.")
-            parsed_ast = ast.parse(processed_expr, mode = 'eval') 
-            if not isinstance(parsed_ast, ast.Expression) or not parsed_ast.body:
-                raise SyntaxError("Invalid expression structure.")       
-            result = cls.evaluate_node(parsed_ast.body)
-            return {
-                "status": "success",
-                "result": result,
-                "expression": expr
-            }
-        except (ValueError, SyntaxError, TypeError, ZeroDivisionError) as e:
-            return {
-                "status": "error",
-                "error": str(e),
-                "expression": expr
-            }
-        except Exception as e:
-            return {
-                "status": "error",
-                "error": f"An unexpected error occurred during calculation: {str(e)}",
-                "expression": expr
-            }
+            normalized, compiled, heavy = self.prepare(expr)
+            if compiled.variables:
+                raise ValueError(f"Unknown variable: {', '.join(sorted(compiled.variables))}")
+            if heavy: result = self.pool.run(self.timeout, evaluate_in_worker, normalized)
+            else: result = compiled.evaluate(self.namespace(self.functions))
+            return self.success(expr, result)
+        except Exception as e: return self.failure(expr, e)
+
+    async def calculate_async(self, expr: str) -> Dict[str, Any]:
+        # Same contract as calculate(), but heavy evaluations are awaited instead of blocking the loop
+        try:
+            normalized, compiled, heavy = self.prepare(expr)
+            if compiled.variables:
+                raise ValueError(f"Unknown variable: {', '.join(sorted(compiled.variables))}")
+            if heavy: result = await self.pool.run_async(self.timeout, evaluate_in_worker, normalized)
+            else: result = compiled.evaluate(self.namespace(self.functions))
+            return self.success(expr, result)
+        except Exception as e: return self.failure(expr, e)
+
+    def parse_step(self, index: int, step: str, values: Dict[str, Any]) -> Tuple[str, str, str, CompiledExpression, bool]:
+        # "name = expression" binds a result for later steps; a bare expression is named step<index>
+        name, expr = f"step{index}", step.strip()
+        target, separator, rest = step.partition("=")
+        if separator and not rest.startswith("="):
+            name, expr = target.strip().lower(), rest.strip()
+            if not name.isidentifier() or name.startswith("fn_") or name in self.functions or name in self.constants:
+                raise ValueError(f"Invalid result name: {target.strip()!r}")
+        magnitudes = {key: self.value_magnitude(value) for key, value in values.items()}
+        normalized, compiled, heavy = self.prepare(expr, magnitudes)
+        unknown = compiled.variables - values.keys()
+        if unknown: raise ValueError(f"Unknown variable: {', '.join(sorted(unknown))}")
+        return name, expr, normalized, compiled, heavy
+
+    @staticmethod
+    def value_magnitude(value: Any) -> Tuple[float, bool]:
+        largest = abs(value)
+        return (math.log2(largest) if largest > 1 else 0.0), isinstance(value, int)
+
+    async def calculate_steps_async(self, steps: List[str]) -> Dict[str, Any]:
+        # Evaluates "name = expression" steps in order in one call; later steps may use earlier names.
+        # Stops at the first failing step and returns the results computed so far. Heavy steps are awaited
+        # in the worker pool, so a long solution never blocks the event loop
+        if len(steps) > MAX_STEPS: return self.steps_failure(MAX_STEPS + 1, steps[MAX_STEPS], \
+            ValueError(f"Too many steps: {len(steps)} (max {MAX_STEPS})."), [])
+        values: Dict[str, Any] = {}
+        results: List[Dict[str, Any]] = []
+        for index, step in enumerate(steps, start = 1):
+            try:
+                name, expr, normalized, compiled, heavy = self.parse_step(index, step, values)
+                if heavy: result = await self.pool.run_async(self.timeout, evaluate_in_worker, normalized, values)
+                else: result = compiled.evaluate(self.namespace(self.functions, values))
+            except Exception as e: return self.steps_failure(index, step, e, results)
+            values[name] = result
+            results.append({"name": name, "expression": expr, "result": result})
+        return {
+            "status": "success",
+            "results": results
+        }
+
+    def steps_failure(self, index: int, step: str, error: Exception, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        failure = self.failure(step, error)
+        failure["error"] = f"Step {index} failed: {failure['error']}"
+        failure["results"] = results
+        return failure
+
+    def prepare_batch(self, expr: str, bindings: Dict[str, List[float]]) -> \
+        Tuple[Dict[str, np.ndarray], int, str, CompiledExpression, bool]:
+        arrays = {name.lower(): np.asarray(values, dtype = float) for name, values in bindings.items()}
+        lengths = {len(array) for array in arrays.values()}
+        if len(lengths) > 1: raise ValueError("All variables must have the same number of values.")
+        count = lengths.pop() if lengths else 1
+        if count > MAX_BATCH_SIZE: raise ValueError(f"Batch too large: {count} values (max {MAX_BATCH_SIZE}).")
+        magnitudes = {name: self.array_magnitude(array) for name, array in arrays.items()}
+        normalized, compiled, heavy = self.prepare(expr, magnitudes, repeat = count)
+        missing = compiled.variables - arrays.keys()
+        if missing: raise ValueError(f"Missing values for variable: {', '.join(sorted(missing))}")
+        return arrays, count, normalized, compiled, heavy
+
+    def evaluate_batch(self, compiled: CompiledExpression, arrays: Dict[str, np.ndarray]) -> Any:
+        with np.errstate(all = "ignore"): return compiled.evaluate(self.namespace(self.array_functions, arrays))
+
+    @staticmethod
+    def batch_success(expr: str, values: Any, count: int) -> Dict[str, Any]:
+        # Non-finite points (poles, domain errors) become None so the table stays JSON-safe
+        results = [value if not isinstance(value, float) or math.isfinite(value) else None \
+            for value in np.broadcast_to(np.asarray(values), (count,)).tolist()]
+        return {
+            "status": "success",
+            "results": results,
+            "count": count,
+            "expression": expr
+        }
+
+    def calculate_batch(self, expr: str, bindings: Dict[str, List[float]]) -> Dict[str, Any]:
+        # Evaluates one expression over equal-length arrays of variable values in a single NumPy pass,
+        # e.g. calculate_batch("sin(x)^2", {"x": [0.0, 0.1, ...]}) for a value table
+        try:
+            arrays, count, normalized, compiled, heavy = self.prepare_batch(expr, bindings)
+            if heavy: values = self.pool.run(self.timeout, evaluate_in_worker, normalized, None, \
+                {name: array.tolist() for name, array in arrays.items()})
+            else: values = self.evaluate_batch(compiled, arrays)
+            return self.batch_success(expr, values, count)
+        except Exception as e: return self.failure(expr, e)
+
+    async def calculate_batch_async(self, expr: str, bindings: Dict[str, List[float]]) -> Dict[str, Any]:
+        # Same contract as calculate_batch(), but heavy batches are awaited instead of blocking the loop
+        try:
+            arrays, count, normalized, compiled, heavy = self.prepare_batch(expr, bindings)
+            if heavy: values = await self.pool.run_async(self.timeout, evaluate_in_worker, normalized, None, \
+                {name: array.tolist() for name, array in arrays.items()})
+            else: values = self.evaluate_batch(compiled, arrays)
+            return self.batch_success(expr, values, count)
+        except Exception as e: return self.failure(expr, e)
+
+    @staticmethod
+    def array_magnitude(array: np.ndarray) -> Tuple[float, bool]:
+        # Bindings are float64 arrays, so only their magnitude matters (e.g. to bound factorial(n))
+        if not array.size or not np.all(np.isfinite(array)): return FLOAT_MAX_LOG2, False
+        largest = float(np.max(np.abs(array)))
+        return (math.log2(largest) if largest > 1 else 0.0), False
+
+    @staticmethod
+    def success(expr: str, result: Any) -> Dict[str, Any]:
+        return {
+            "status": "success",
+            "result": result,
+            "expression": expr
+        }
+
+    def failure(self, expr: str, error: Exception) -> Dict[str, Any]:
+        if isinstance(error, (concurrent.futures.TimeoutError, asyncio.TimeoutError)):
+            message = f"Calculation timed out after {self.timeout:g} seconds."
+        elif isinstance(error, BrokenProcessPool): message = "Calculation worker crashed; the expression may be too large."
+        elif isinstance(error, (ValueError, SyntaxError, TypeError, ZeroDivisionError, OverflowError)): message = str(error)
+        elif isinstance(error, (RecursionError, MemoryError)): message = "Expression too complex to evaluate."
+        else: message = f"An unexpected error occurred during calculation: {str(error)}"
+        return {
+            "status": "error",
+            "error": message,
+            "expression": expr
+        }
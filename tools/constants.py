@@ -1,85 +1,83 @@
-import difflib
-from typing import Any, Dict, List, Optional, Union
+import gzip
+import os
+from typing import Any, Dict, List, Optional
 
+from tools.formulas import FORMULAS, FormulaEngine
+from tools.fuzzy_index import TrigramIndex, normalize_key
 
-class UniversalConstantsTool:    
-    def __init__(self) -> None:
-        self.constants: Dict[str, Union[int, Any]] = {
-            "speed_of_light": {
-                "value": 299792458,
-                "unit": "m/s",
-                "symbol": "c",
-                "description": "Speed of light in vacuum"
-            },
-            "gravitational_constant": {
-                "value": 6.67430e-11,
-                "unit": "N⋅m²/kg²",
-                "symbol": "G",
-                "description": "Universal gravitational constant"
-            },
-            "planck_constant": {
-                "value": 6.62607015e-34,
-                "unit": "J⋅s",
-                "symbol": "h",
-                "description": "Planck constant"
-            },
-            "electron_charge": {
-                "value": 1.602176634e-19,
-                "unit": "C",
-                "symbol": "e",
-                "description": "Elementary charge"
-            },
-            "electron_mass": {
-                "value": 9.1093837015e-31,
-                "unit": "kg",
-                "symbol": "mₑ",
-                "description": "Electron rest mass"
-            },
-            "proton_mass": {
-                "value": 1.67262192369e-27,
-                "unit": "kg",
-                "symbol": "mₚ",
-                "description": "Proton rest mass"
-            },
-            "avogadro_number": {
-                "value": 6.02214076e23,
-                "unit": "mol⁻¹",
-                "symbol": "Nₐ",
-                "description": "Avogadro constant"
-            },
-            "boltzmann_constant": {
-                "value": 1.380649e-23,
-                "unit": "J/K",
-                "symbol": "k",
-                "description": "Boltzmann constant"
-            }
-        }
-        self.formulas = {
-            "kinetic_energy": "KE = (1/2) * m * v²",
-            "potential_energy": "PE = m * g * h",
-            "force": "F = m * a",
-            "momentum": "p = m * v",
-            "work": "W = F * d * cos(θ)",
-            "power": "P = W / t",
-            "wave_speed": "v = f * λ",
-            "ohms_law": "V = I * R",
-            "ideal_gas_law": "P * V = n * R * T",
-            "work_energy_theorem": "W = ΔKE"
-        }
-        
-    def normalize_key(self, name: str) -> str: return name.lower().replace(" ", "_").replace("-", "_")
+CODATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "codata.tsv.gz")
+
+class UniversalConstantsTool:
+    # The CODATA table is read from CODATA_PATH and indexed on first use, not at import time
+    def __init__(self, data_path: str = CODATA_PATH) -> None:
+        self.data_path = data_path
+        self._constants: Optional[Dict[str, Dict[str, Any]]] = None
+        self.aliases: Dict[str, str] = {}
+        self.symbols: Dict[str, str] = {}
+        self._constant_index: Optional[TrigramIndex] = None
+        self._formula_index: Optional[TrigramIndex] = None
+        self.formulas = {key: formula["display"] for key, formula in FORMULAS.items()}
+
+    @property
+    def constants(self) -> Dict[str, Dict[str, Any]]:
+        if self._constants is None: self._constants = self.load_constants()
+        return self._constants
+
+    def load_constants(self) -> Dict[str, Dict[str, Any]]:
+        constants: Dict[str, Dict[str, Any]] = {}
+        with gzip.open(self.data_path, "rt", encoding = "utf-8") as f:
+            for line in f:
+                if line.startswith("#") or not line.strip(): continue
+                name, value, uncertainty, unit, symbol, aliases = line.rstrip("\n").split("\t")
+                key = normalize_key(name)
+                constants[key] = {
+                    "value": float(value),
+                    "unit": unit,
+                    "symbol": symbol or None,
+                    "description": name[0].upper() + name[1:],
+                    "uncertainty": float(uncertainty),
+                }
+                if symbol: self.symbols[symbol] = key
+                for alias in filter(None, aliases.split(",")): self.aliases[normalize_key(alias)] = key
+        return constants
+
+    @property
+    def constant_index(self) -> TrigramIndex:
+        if self._constant_index is None:
+            self._constant_index = TrigramIndex({**{key: key for key in self.constants}, **self.aliases})
+        return self._constant_index
+
+    @property
+    def formula_index(self) -> TrigramIndex:
+        if self._formula_index is None: self._formula_index = TrigramIndex({key: key for key in self.formulas})
+        return self._formula_index
+
+    def normalize_key(self, name: str) -> str: return normalize_key(name)
+
+    def resolve_constant(self, const_name: str) -> Optional[str]:
+        # Symbols are case-sensitive ("G" is gravitation, "g" standard gravity); names and aliases are not
+        constants = self.constants
+        stripped = const_name.strip()
+        if stripped in self.symbols: return self.symbols[stripped]
+        normalized = normalize_key(stripped)
+        if normalized in constants: return normalized
+        return self.aliases.get(normalized)
+
+    def is_symbol(self, const_name: str) -> bool:
+        # Symbols are collected while the table loads, so load it first
+        if not self.constants: return False
+        return const_name.strip() in self.symbols
 
     def lookup_constant(self, const_name: str) -> Optional[Dict[str, Any]]:
-        normalized = self.normalize_key(const_name)
-        if normalized in self.constants:
+        key = self.resolve_constant(const_name)
+        if key is not None:
             return {
                 "status": "success",
-                "constant": normalized,
-                "data": self.constants[normalized],
+                "constant": key,
+                "data": self.constants[key],
                 "search_term": const_name
             }
-        possible_matches = difflib.get_close_matches(normalized, \
-            self.constants.keys(), n = 3, cutoff = 0.6)
+        possible_matches = self.constant_index.search(normalize_key(const_name))
         if possible_matches:
             suggestions = {match: self.constants[match]['description'] \
                 for match in possible_matches}
@@ -92,19 +90,22 @@ class UniversalConstantsTool:
         return {
             "status": "error",
             "error": f"No constant found for '{const_name}'",
-            "available": list(self.constants.keys())
+            "available": self.common_constants()
         }
 
+    def common_constants(self) -> List[str]:
+        # The full table has hundreds of entries; errors point at the ones with symbols instead
+        return [key for key in self.constants if self.constants[key]["symbol"]]
+
     def lookup_formula(self, formula_name: str):
         normalized = self.normalize_key(formula_name)
         if normalized in self.formulas:
             return {
                 "status": "success",
-                "formula": self.formulas[normalized],
+                **FormulaEngine.describe(FORMULAS[normalized]),
                 "search_term": formula_name
             }
-        possible_matches = difflib.get_close_matches(normalized, \
-            self.formulas.keys(), n = 3, cutoff = 0.6)
+        possible_matches = self.formula_index.search(normalized)
         if possible_matches:
             return {
                 "status": "success",
@@ -0,0 +1,55 @@
+# Regenerates tools/data/codata.tsv.gz from scipy.constants, which only this script needs:
+#   python tools/data/build_codata.py
+import gzip
+import os
+
+import scipy
+from scipy import constants
+
+# Display symbol and lookup aliases for the constants students ask for most; every other
+# CODATA entry is reachable by its full name
+COMMON = {
+    "speed of light in vacuum": ("c", ["speed_of_light", "light_speed", "c0"]),
+    "Newtonian constant of gravitation": ("G", ["gravitational_constant", "gravity_constant", "newton_constant", "big_g"]),
+    "Planck constant": ("h", ["planck_constant"]),
+    "reduced Planck constant": ("ħ", ["hbar", "h_bar", "ℏ", "dirac_constant", "reduced_planck"]),
+    "elementary charge": ("e", ["electron_charge", "charge_of_electron", "proton_charge"]),
+    "electron mass": ("mₑ", ["m_e", "me", "mass_of_electron"]),
+    "proton mass": ("mₚ", ["m_p", "mp", "mass_of_proton"]),
+    "neutron mass": ("mₙ", ["m_n", "mn", "mass_of_neutron"]),
+    "Avogadro constant": ("Nₐ", ["avogadro_number", "avogadros_number", "n_a", "na"]),
+    "Boltzmann constant": ("k", ["k_b", "kb", "boltzmann"]),
+    "molar gas constant": ("R", ["gas_constant", "ideal_gas_constant", "universal_gas_constant"]),
+    "vacuum electric permittivity": ("ε₀", ["epsilon_0", "epsilon0", "permittivity_of_free_space", \
+        "vacuum_permittivity", "electric_constant"]),
+    "vacuum mag. permeability": ("μ₀", ["mu_0", "mu0", "permeability_of_free_space", \
+        "vacuum_permeability", "magnetic_constant"]),
+    "Stefan-Boltzmann constant": ("σ", ["stefan_boltzmann", "sigma"]),
+    "fine-structure constant": ("α", ["alpha", "fine_structure"]),
+    "Bohr radius": ("a₀", ["a_0", "a0"]),
+    "Rydberg constant": ("R∞", ["rydberg", "r_inf"]),
+    "Faraday constant": ("F", ["faraday"]),
+    "standard acceleration of gravity": ("g", ["gravity", "standard_gravity", "g_n", "acceleration_due_to_gravity", \
+        "gravitational_acceleration"]),
+    "atomic mass constant": ("u", ["atomic_mass_unit", "amu", "dalton", "m_u"]),
+    "electron volt": ("eV", ["ev", "electronvolt"]),
+    "standard atmosphere": ("atm", ["atmosphere", "atmospheric_pressure"]),
+    "Wien wavelength displacement law constant": ("b", ["wien_constant", "wien_displacement_constant"]),
+    "Bohr magneton": ("μB", ["mu_b", "mu_bohr"]),
+}
+
+def main() -> None:
+    rows = []
+    for name in sorted(constants.find(), key = str.lower):
+        value, unit, uncertainty = constants.physical_constants[name]
+        symbol, aliases = COMMON.get(name, ("", []))
+        rows.append("\t".join([name, repr(value), repr(uncertainty), unit, symbol, ",".join(aliases)]))
+    missing = set(COMMON) - set(constants.find())
+    if missing: raise SystemExit(f"Unknown CODATA names: {sorted(missing)}")
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "codata.tsv.gz")
+    header = f"# {getattr(constants._codata, '_current_codata', 'CODATA')} via scipy {scipy.__version__}"
+    with open(path, "wb") as f:
+        f.write(gzip.compress("\n".join([header] + rows).encode("utf-8") + b"\n", mtime = 0))
+    print(f"Wrote {len(rows)} constants to {path}")
+
+if __name__ == "__main__": main()
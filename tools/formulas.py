@@ -0,0 +1,252 @@
+import math
+from typing import Any, Dict, List, Optional
+
+from tools.calculator import CalculatorTool
+from tools.fuzzy_index import TrigramIndex, normalize_key
+from tools.units import SI_UNITS, from_si, parse_quantity, to_si
+
+# Each formula lists its variables as name -> (description, dimension), one rearrangement per solvable
+# variable written in calculator syntax, and default values (SI) for constants the student may omit.
+# Variable names are lower-case identifiers because the calculator lower-cases expressions
+FORMULAS: Dict[str, Dict[str, Any]] = {
+    "kinetic_energy": {
+        "display": "KE = (1/2) * m * v²",
+        "variables": {"ke": ("kinetic energy", "energy"), "m": ("mass", "mass"), "v": ("speed", "velocity")},
+        "solutions": {"ke": "0.5 * m * v^2", "m": "2 * ke / v^2", "v": "sqrt(2 * ke / m)"},
+    },
+    "potential_energy": {
+        "display": "PE = m * g * h",
+        "variables": {"pe": ("potential energy", "energy"), "m": ("mass", "mass"), \
+            "g": ("gravitational acceleration", "acceleration"), "h": ("height", "length")},
+        "solutions": {"pe": "m * g * h", "m": "pe / (g * h)", "g": "pe / (m * h)", "h": "pe / (m * g)"},
+        "defaults": {"g": 9.80665},
+    },
+    "force": {
+        "display": "F = m * a",
+        "variables": {"f": ("force", "force"), "m": ("mass", "mass"), "a": ("acceleration", "acceleration")},
+        "solutions": {"f": "m * a", "m": "f / a", "a": "f / m"},
+    },
+    "momentum": {
+        "display": "p = m * v",
+        "variables": {"p": ("momentum", "momentum"), "m": ("mass", "mass"), "v": ("velocity", "velocity")},
+        "solutions": {"p": "m * v", "m": "p / v", "v": "p / m"},
+    },
+    "work": {
+        "display": "W = F * d * cos(θ)",
+        "variables": {"w": ("work", "energy"), "f": ("force", "force"), "d": ("distance", "length"), \
+            "theta": ("angle between force and displacement", "angle")},
+        "solutions": {"w": "f * d * cos(theta)", "f": "w / (d * cos(theta))", "d": "w / (f * cos(theta))", \
+            "theta": "acos(w / (f * d))"},
+        "defaults": {"theta": 0.0},
+    },
+    "power": {
+        "display": "P = W / t",
+        "variables": {"p": ("power", "power"), "w": ("work", "energy"), "t": ("time", "time")},
+        "solutions": {"p": "w / t", "w": "p * t", "t": "w / p"},
+    },
+    "wave_speed": {
+        "display": "v = f * λ",
+        "variables": {"v": ("wave speed", "velocity"), "f": ("frequency", "frequency"), "lam": ("wavelength", "length")},
+        "solutions": {"v": "f * lam", "f": "v / lam", "lam": "v / f"},
+    },
+    "ohms_law": {
+        "display": "V = I * R",
+        "variables": {"v": ("voltage", "voltage"), "i": ("current", "current"), "r": ("resistance", "resistance")},
+        "solutions": {"v": "i * r", "i": "v / r", "r": "v / i"},
+    },
+    "ideal_gas_law": {
+        "display": "P * V = n * R * T",
+        "variables": {"p": ("pressure", "pressure"), "v": ("volume", "volume"), "n": ("amount of gas", "amount"), \
+            "r": ("molar gas constant", "molar_gas_constant"), "t": ("temperature", "temperature")},
+        "solutions": {"p": "n * r * t / v", "v": "n * r * t / p", "n": "p * v / (r * t)", "t": "p * v / (n * r)"},
+        "defaults": {"r": 8.314462618},
+    },
+    "work_energy_theorem": {
+        "display": "W = ΔKE",
+        "variables": {"w": ("net work", "energy"), "ke_final": ("final kinetic energy", "energy"), \
+            "ke_initial": ("initial kinetic energy", "energy")},
+        "solutions": {"w": "ke_final - ke_initial", "ke_final": "w + ke_initial", "ke_initial": "ke_final - w"},
+        "defaults": {"ke_initial": 0.0},
+    },
+    "weight": {
+        "display": "W = m * g",
+        "variables": {"w": ("weight", "force"), "m": ("mass", "mass"), "g": ("gravitational acceleration", "acceleration")},
+        "solutions": {"w": "m * g", "m": "w / g", "g": "w / m"},
+        "defaults": {"g": 9.80665},
+    },
+    "speed": {
+        "display": "v = d / t",
+        "variables": {"v": ("speed", "velocity"), "d": ("distance", "length"), "t": ("time", "time")},
+        "solutions": {"v": "d / t", "d": "v * t", "t": "d / v"},
+    },
+    "velocity_time": {
+        "display": "v = u + a * t",
+        "variables": {"v": ("final velocity", "velocity"), "u": ("initial velocity", "velocity"), \
+            "a": ("acceleration", "acceleration"), "t": ("time", "time")},
+        "solutions": {"v": "u + a * t", "u": "v - a * t", "a": "(v - u) / t", "t": "(v - u) / a"},
+        "defaults": {"u": 0.0},
+    },
+    "displacement_time": {
+        "display": "s = u * t + (1/2) * a * t²",
+        "variables": {"s": ("displacement", "length"), "u": ("initial velocity", "velocity"), \
+            "a": ("acceleration", "acceleration"), "t": ("time", "time")},
+        "solutions": {"s": "u * t + 0.5 * a * t^2", "u": "(s - 0.5 * a * t^2) / t", "a": "2 * (s - u * t) / t^2", \
+            "t": "(-u + sqrt(u^2 + 2 * a * s)) / a"},
+        "defaults": {"u": 0.0},
+    },
+    "velocity_displacement": {
+        "display": "v² = u² + 2 * a * s",
+        "variables": {"v": ("final velocity", "velocity"), "u": ("initial velocity", "velocity"), \
+            "a": ("acceleration", "acceleration"), "s": ("displacement", "length")},
+        "solutions": {"v": "sqrt(u^2 + 2 * a * s)", "u": "sqrt(v^2 - 2 * a * s)", "a": "(v^2 - u^2) / (2 * s)", \
+            "s": "(v^2 - u^2) / (2 * a)"},
+        "defaults": {"u": 0.0},
+    },
+    "density": {
+        "display": "ρ = m / V",
+        "variables": {"rho": ("density", "density"), "m": ("mass", "mass"), "vol": ("volume", "volume")},
+        "solutions": {"rho": "m / vol", "m": "rho * vol", "vol": "m / rho"},
+    },
+    "pressure": {
+        "display": "P = F / A",
+        "variables": {"p": ("pressure", "pressure"), "f": ("force", "force"), "area": ("area", "area")},
+        "solutions": {"p": "f / area", "f": "p * area", "area": "f / p"},
+    },
+    "electrical_power": {
+        "display": "P = V * I",
+        "variables": {"p": ("power", "power"), "v": ("voltage", "voltage"), "i": ("current", "current")},
+        "solutions": {"p": "v * i", "v": "p / i", "i": "p / v"},
+    },
+    "hookes_law": {
+        "display": "F = k * x",
+        "variables": {"f": ("spring force", "force"), "k": ("spring constant", "spring_constant"), \
+            "x": ("extension", "length")},
+        "solutions": {"f": "k * x", "k": "f / x", "x": "f / k"},
+    },
+    "spring_potential_energy": {
+        "display": "PE = (1/2) * k * x²",
+        "variables": {"pe": ("elastic potential energy", "energy"), "k": ("spring constant", "spring_constant"), \
+            "x": ("extension", "length")},
+        "solutions": {"pe": "0.5 * k * x^2", "k": "2 * pe / x^2", "x": "sqrt(2 * pe / k)"},
+    },
+    "centripetal_force": {
+        "display": "F = m * v² / r",
+        "variables": {"f": ("centripetal force", "force"), "m": ("mass", "mass"), "v": ("speed", "velocity"), \
+            "r": ("radius", "length")},
+        "solutions": {"f": "m * v^2 / r", "m": "f * r / v^2", "v": "sqrt(f * r / m)", "r": "m * v^2 / f"},
+    },
+    "gravitational_force": {
+        "display": "F = G * m1 * m2 / r²",
+        "variables": {"f": ("gravitational force", "force"), "g": ("gravitational constant", "gravitational_constant"), \
+            "m1": ("first mass", "mass"), "m2": ("second mass", "mass"), "r": ("distance between centres", "length")},
+        "solutions": {"f": "g * m1 * m2 / r^2", "m1": "f * r^2 / (g * m2)", "m2": "f * r^2 / (g * m1)", \
+            "r": "sqrt(g * m1 * m2 / f)"},
+        "defaults": {"g": 6.6743e-11},
+    },
+    "coulombs_law": {
+        "display": "F = k * q1 * q2 / r²",
+        "variables": {"f": ("electrostatic force", "force"), "k": ("Coulomb constant", "coulomb_constant"), \
+            "q1": ("first charge", "charge"), "q2": ("second charge", "charge"), "r": ("separation", "length")},
+        "solutions": {"f": "k * q1 * q2 / r^2", "q1": "f * r^2 / (k * q2)", "q2": "f * r^2 / (k * q1)", \
+            "r": "sqrt(k * abs(q1 * q2) / abs(f))"},
+        "defaults": {"k": 8.9875517862e9},
+    },
+    "photon_energy": {
+        "display": "E = h * f",
+        "variables": {"energy": ("photon energy", "energy"), "h": ("Planck constant", "action"), \
+            "f": ("frequency", "frequency")},
+        "solutions": {"energy": "h * f", "f": "energy / h"},
+        "defaults": {"h": 6.62607015e-34},
+    },
+    "period_frequency": {
+        "display": "T = 1 / f",
+        "variables": {"t": ("period", "time"), "f": ("frequency", "frequency")},
+        "solutions": {"t": "1 / f", "f": "1 / t"},
+    },
+}
+
+# Symbols students type that are not valid calculator names
+SYMBOL_ALIASES = {"λ": "lam", "lambda": "lam", "θ": "theta", "ρ": "rho", "δke": "w", "e": "energy", "v_0": "u", "v0": "u"}
+
+class FormulaEngine:
+    def __init__(self, calculator: Optional[CalculatorTool] = None) -> None:
+        self.calculator = calculator or CalculatorTool()
+        self.index = TrigramIndex({key: key for key in FORMULAS})
+
+    def resolve_formula(self, formula_name: str) -> Optional[str]:
+        key = normalize_key(formula_name)
+        return key if key in FORMULAS else None
+
+    def variable_name(self, formula: Dict[str, Any], name: str) -> str:
+        # Accepts the variable's name, a common symbol for it, or its description ("mass", "wavelength")
+        raw = name.strip().lower()
+        key = SYMBOL_ALIASES.get(raw, normalize_key(raw))
+        if key in formula["variables"]: return key
+        for variable, (description, _) in formula["variables"].items():
+            if normalize_key(description) == key: return variable
+        raise ValueError(f"Unknown variable '{name.strip()}' for {formula['display']}. " \
+            f"Variables: {', '.join(self.describe(formula)['variables'])}")
+
+    @staticmethod
+    def describe(formula: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "formula": formula["display"],
+            "variables": {variable: f"{description} [{SI_UNITS[dimension] or 'dimensionless'}]" \
+                for variable, (description, dimension) in formula["variables"].items()},
+            "solvable_for": list(formula["solutions"]),
+        }
+
+    async def solve(self, formula_name: str, solve_for: str, knowns: List[str], result_unit: str = "") -> Dict[str, Any]:
+        # knowns are "name = value unit" strings such as "m = 2 kg" or "v = 36 km/h"; values are converted
+        # to SI, the stored rearrangement is evaluated by the calculator, and the result converted back
+        key = self.resolve_formula(formula_name)
+        if key is None:
+            suggestions = self.index.search(normalize_key(formula_name))
+            return {
+                "status": "error",
+                "error": f"No formula found for '{formula_name}'" + \
+                    (f". Did you mean one of: {', '.join(suggestions)}?" if suggestions else ""),
+                "available": list(FORMULAS.keys())
+            }
+        formula = FORMULAS[key]
+        try:
+            target = self.variable_name(formula, solve_for)
+            if target not in formula["solutions"]:
+                raise ValueError(f"{formula['display']} cannot be solved for {solve_for}. " \
+                    f"Solvable for: {', '.join(formula['solutions'])}")
+            values: Dict[str, float] = {}
+            for known in knowns:
+                name, separator, quantity = known.partition("=")
+                if not separator: raise ValueError(f"Expected 'name = value unit', got '{known}'")
+                variable = self.variable_name(formula, name)
+                value, unit = parse_quantity(quantity)
+                if not math.isfinite(value): raise ValueError(f"Value for {variable} is not a finite number")
+                values[variable] = to_si(value, unit, formula["variables"][variable][1])
+            expression = formula["solutions"][target]
+            needed = self.calculator.compile_expression(self.calculator.normalize(expression)).variables
+            defaults = formula.get("defaults", {})
+            missing = sorted(variable for variable in needed if variable not in values and variable not in defaults)
+            if missing: raise ValueError(f"Missing values for: {', '.join(missing)}")
+            inputs = {variable: values.get(variable, defaults.get(variable)) for variable in sorted(needed)}
+            calculation = await self.calculator.calculate_steps_async([f"{variable} = {value!r}" \
+                for variable, value in inputs.items()] + [f"{target} = {expression}"])
+            if calculation["status"] != "success":
+                raise ValueError(calculation["error"].split(": ", 1)[-1])
+            dimension = formula["variables"][target][1]
+            si_result = calculation["results"][-1]["result"]
+            return {
+                "status": "success",
+                "formula": formula["display"],
+                "solved_for": target,
+                "expression": f"{target} = {expression}",
+                "result": from_si(si_result, result_unit, dimension),
+                "unit": result_unit.strip() or SI_UNITS[dimension],
+                "inputs": {variable: {"value": value, "unit": SI_UNITS[formula["variables"][variable][1]], \
+                    "default": variable not in values} for variable, value in inputs.items()},
+            }
+        except ValueError as e:
+            return {
+                "status": "error",
+                "error": str(e),
+                "formula": formula["display"]
+            }
@@ -0,0 +1,40 @@
+import heapq
+import re
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Dict, List, Set
+
+from tools.history_store import trigrams
+
+
+def normalize_key(name: str) -> str: return re.sub(r"[\W_]+", "_", name.strip().lower()).strip("_")
+
+def padded_trigrams(text: str) -> Set[str]: return trigrams(f"  {text} ")
+
+class TrigramIndex:
+    # Inverted index from padded trigrams to names. A query only touches the postings of its own
+    # trigrams, so suggestions cost roughly the same however large the catalogue grows
+    def __init__(self, names: Dict[str, str]) -> None:
+        # names maps every searchable spelling (key, alias, ...) to the key it should suggest
+        self.names = list(names)
+        self.targets = [names[name] for name in self.names]
+        self.sizes = []
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        for position, name in enumerate(self.names):
+            grams = padded_trigrams(name)
+            self.sizes.append(len(grams))
+            for gram in grams: self.postings[gram].append(position)
+
+    def search(self, query: str, limit: int = 3, cutoff: float = 0.45) -> List[str]:
+        # Ranks names by the Dice coefficient of trigram sets and returns distinct targets. A Dice score of
+        # at least `cutoff` needs shared >= cutoff * |query| / (2 - cutoff), which prunes most candidates
+        grams = padded_trigrams(query)
+        shared = Counter(chain.from_iterable(self.postings.get(gram, ()) for gram in grams))
+        min_shared = cutoff * len(grams) / (2 - cutoff)
+        scored = heapq.nlargest(limit * 4, ((2 * count / (len(grams) + self.sizes[position]), position) \
+            for position, count in shared.items() if count >= min_shared))
+        matches: List[str] = []
+        for score, position in scored:
+            if score < cutoff or len(matches) == limit: break
+            if self.targets[position] not in matches: matches.append(self.targets[position])
+        return matches
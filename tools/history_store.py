@@ -0,0 +1,173 @@
+from datetime import datetime
+from typing import Any, Dict, List, MutableMapping, Optional, Set
+
+# Session state layout (every value stays JSON-serialisable and each write touches only a few small keys):
+#   conversation_history:slot:<i>     ring buffer slot i holding one entry
+#   conversation_history:meta         {"next_seq", "oldest_seq"} of the live ring window
+#   conversation_topic:<trigram>      posting list of entry ids whose topic contains the trigram
+#   conversation_archive:slot:<i>     entries compacted out of the ring, merged per topic
+#   conversation_archive:index        {topic: archive slot} for at most `archive_topics` topics
+#   learning_progress:<subject>:<concept> and learning_progress:index
+HISTORY_CAPACITY = 200
+COMPACTION_BATCH = 50
+ARCHIVE_TOPICS = 100
+ARCHIVE_KEY_POINTS_CHARS = 2000
+RECENT_CONTEXT = 5
+
+def topic_key(topic: str) -> str: return " ".join(topic.lower().split())
+
+def trigrams(text: str) -> Set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class HistoryStore:
+    def __init__(self, state: MutableMapping[str, Any], capacity: int = HISTORY_CAPACITY, \
+        compaction_batch: int = COMPACTION_BATCH, archive_topics: int = ARCHIVE_TOPICS) -> None:
+        self.state = state
+        self.capacity = capacity
+        self.compaction_batch = min(compaction_batch, capacity)
+        self.archive_topics = archive_topics
+        self.migrate_legacy()
+
+    def migrate_legacy(self) -> None:
+        # Sessions written before the ring buffer kept one unbounded list under "conversation_history"
+        legacy = self.state.get("conversation_history")
+        if legacy and "conversation_history:meta" not in self.state:
+            self.state["conversation_history:meta"] = {"next_seq": 0, "oldest_seq": 0}
+            for entry in legacy: self.append(entry)
+            self.state["conversation_history"] = []
+
+    @property
+    def meta(self) -> Dict[str, int]: return self.state.get("conversation_history:meta", {"next_seq": 0, "oldest_seq": 0})
+
+    def slot(self, seq: int) -> str: return f"conversation_history:slot:{seq % self.capacity}"
+
+    def total(self) -> int: return self.meta["next_seq"]
+
+    def add(self, topic: str, key_points: str) -> Dict[str, Any]:
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "topic": topic,
+            "key_points": key_points,
+            "interaction_count": self.total() + 1
+        }
+        self.append(entry)
+        return entry
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        meta = dict(self.meta)
+        if meta["next_seq"] - meta["oldest_seq"] >= self.capacity:
+            meta["oldest_seq"] = self.compact(meta["oldest_seq"], meta["oldest_seq"] + self.compaction_batch)
+        seq = meta["next_seq"]
+        self.state[self.slot(seq)] = entry
+        self.index(entry["topic"], seq)
+        meta["next_seq"] = seq + 1
+        self.state["conversation_history:meta"] = meta
+
+    def compact(self, start: int, stop: int) -> int:
+        # Folds the oldest ring entries into one archived entry per topic and frees their slots. The archive
+        # keeps at most `archive_topics` topics; a new topic takes over the slot of the least recently updated
+        archive = dict(self.state.get("conversation_archive:index", {}))
+        for seq in range(start, stop):
+            entry = self.state.get(self.slot(seq))
+            if not entry: continue
+            self.unindex(entry["topic"], seq)
+            key = topic_key(entry["topic"])
+            slot = archive.get(key)
+            if slot is None:
+                slot = len(archive)
+                if slot >= self.archive_topics:
+                    oldest = min(archive, key = lambda other: self.state[self.archive_slot(archive[other])]["timestamp"])
+                    slot = archive.pop(oldest)
+                    self.unindex(self.state[self.archive_slot(slot)]["topic"], f"archive:slot:{slot}")
+                archived = {"timestamp": entry["timestamp"], "first_timestamp": entry["timestamp"], \
+                    "topic": entry["topic"], "key_points": "", "interaction_count": entry["interaction_count"], \
+                        "merged_count": 0}
+                archive[key] = slot
+                self.index(entry["topic"], f"archive:slot:{slot}")
+            else: archived = dict(self.state[self.archive_slot(slot)])
+            merged = f"{archived['key_points']}; {entry['key_points']}" if archived["key_points"] else entry["key_points"]
+            archived.update({"timestamp": entry["timestamp"], "interaction_count": entry["interaction_count"], \
+                "key_points": merged[-ARCHIVE_KEY_POINTS_CHARS:], "merged_count": archived["merged_count"] + 1})
+            self.state[self.archive_slot(slot)] = archived
+            self.state[self.slot(seq)] = None
+        self.state["conversation_archive:index"] = archive
+        return stop
+
+    @staticmethod
+    def archive_slot(slot: int) -> str: return f"conversation_archive:slot:{slot}"
+
+    def index(self, topic: str, entry_id: Any) -> None:
+        for gram in trigrams(topic):
+            postings = self.state.get(f"conversation_topic:{gram}") or []
+            if entry_id not in postings: self.state[f"conversation_topic:{gram}"] = postings + [entry_id]
+
+    def unindex(self, topic: str, entry_id: Any) -> None:
+        for gram in trigrams(topic):
+            postings = [other for other in self.state.get(f"conversation_topic:{gram}") or [] if other != entry_id]
+            if postings: self.state[f"conversation_topic:{gram}"] = postings
+            else: self.discard(f"conversation_topic:{gram}")
+
+    def discard(self, key: str) -> None:
+        # Session state delivered through ADK only takes writes (a delta cannot delete), so there the key is
+        # left holding None; plain dicts drop it
+        try: del self.state[key]
+        except KeyError: pass
+        except (AttributeError, TypeError): self.state[key] = None
+
+    def recent(self, count: int = RECENT_CONTEXT) -> List[Dict[str, Any]]:
+        meta = self.meta
+        seqs = range(max(meta["oldest_seq"], meta["next_seq"] - count), meta["next_seq"])
+        return [entry for seq in seqs if (entry := self.state.get(self.slot(seq)))]
+
+    def find(self, topic: str) -> List[Dict[str, Any]]:
+        # Case-insensitive substring match on topics; the trigram index narrows candidates first
+        needle = topic.lower()
+        if len(needle) < 3: return self.scan(needle)
+        candidates: Optional[Set[Any]] = None
+        for gram in trigrams(needle):
+            postings = set(self.state.get(f"conversation_topic:{gram}") or [])
+            candidates = postings if candidates is None else candidates & postings
+            if not candidates: return []
+        archived, live = [], []
+        for entry_id in candidates:
+            if isinstance(entry_id, str):
+                entry = self.state.get(f"conversation_{entry_id}")
+                if entry and needle in entry["topic"].lower(): archived.append(entry)
+            elif entry_id >= self.meta["oldest_seq"]:
+                entry = self.state.get(self.slot(entry_id))
+                if entry and needle in entry["topic"].lower(): live.append(entry)
+        by_count = lambda entry: entry["interaction_count"]
+        return sorted(archived, key = by_count) + sorted(live, key = by_count)
+
+    def scan(self, needle: str) -> List[Dict[str, Any]]:
+        meta = self.meta
+        return [entry for seq in range(meta["oldest_seq"], meta["next_seq"]) \
+            if (entry := self.state.get(self.slot(seq))) and needle in entry["topic"].lower()]
+
+class ProgressStore:
+    def __init__(self, state: MutableMapping[str, Any]) -> None:
+        self.state = state
+        legacy = state.get("learning_progress")
+        if legacy and "learning_progress:index" not in state:
+            for subject, concepts in legacy.items():
+                for concept, record in concepts.items(): self.set(subject, concept, record)
+            state["learning_progress"] = {}
+
+    @property
+    def index(self) -> Dict[str, List[str]]: return self.state.get("learning_progress:index", {})
+
+    def set(self, subject: str, concept: str, record: Dict[str, Any]) -> None:
+        self.state[f"learning_progress:{subject}:{concept}"] = record
+        index = self.index
+        if concept not in index.get(subject, []):
+            self.state["learning_progress:index"] = {**index, subject: index.get(subject, []) + [concept]}
+
+    def update(self, subject: str, concept: str, understanding_level: str) -> None:
+        self.set(subject, concept, {"level": understanding_level, "last_updated": datetime.now().isoformat()})
+
+    def subject(self, subject: str) -> Dict[str, Any]:
+        return {concept: self.state.get(f"learning_progress:{subject}:{concept}") \
+            for concept in self.index.get(subject, [])}
+
+    def all(self) -> Dict[str, Dict[str, Any]]: return {subject: self.subject(subject) for subject in self.index}
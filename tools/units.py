@@ -0,0 +1,125 @@
+import re
+from typing import Dict, NamedTuple, Optional, Tuple
+
+
+class Unit(NamedTuple):
+    # SI value = value * factor + offset (the offset is only non-zero for °C and °F)
+    dimension: str
+    factor: float
+    offset: float = 0.0
+
+SI_UNITS: Dict[str, str] = {
+    "length": "m", "mass": "kg", "time": "s", "velocity": "m/s", "acceleration": "m/s^2", "force": "N",
+    "energy": "J", "power": "W", "momentum": "kg*m/s", "pressure": "Pa", "volume": "m^3", "area": "m^2",
+    "density": "kg/m^3", "temperature": "K", "amount": "mol", "current": "A", "voltage": "V", "resistance": "ohm",
+    "charge": "C", "frequency": "Hz", "angle": "rad", "dimensionless": "", "spring_constant": "N/m",
+    "molar_gas_constant": "J/(mol*K)", "gravitational_constant": "N*m^2/kg^2", "coulomb_constant": "N*m^2/C^2",
+    "action": "J*s",
+}
+
+UNITS: Dict[str, Unit] = {
+    "m": Unit("length", 1), "km": Unit("length", 1e3), "cm": Unit("length", 1e-2),
+    "um": Unit("length", 1e-6), "nm": Unit("length", 1e-9), "in": Unit("length", 0.0254),
+    "ft": Unit("length", 0.3048), "yd": Unit("length", 0.9144), "mi": Unit("length", 1609.344),
+    "kg": Unit("mass", 1), "g": Unit("mass", 1e-3), "t": Unit("mass", 1e3),
+    "lb": Unit("mass", 0.45359237), "oz": Unit("mass", 0.028349523125),
+    "s": Unit("time", 1), "min": Unit("time", 60), "h": Unit("time", 3600),
+    "day": Unit("time", 86400),
+    "m/s": Unit("velocity", 1), "km/h": Unit("velocity", 1 / 3.6), "kmh": Unit("velocity", 1 / 3.6),
+    "kph": Unit("velocity", 1 / 3.6), "mph": Unit("velocity", 0.44704), "ft/s": Unit("velocity", 0.3048),
+    "cm/s": Unit("velocity", 1e-2), "knot": Unit("velocity", 1852 / 3600),
+    "m/s^2": Unit("acceleration", 1), "ft/s^2": Unit("acceleration", 0.3048),
+    "n": Unit("force", 1), "kn": Unit("force", 1e3), "lbf": Unit("force", 4.4482216152605), "dyn": Unit("force", 1e-5),
+    "j": Unit("energy", 1), "kj": Unit("energy", 1e3), "cal": Unit("energy", 4.184),
+    "kcal": Unit("energy", 4184), "ev": Unit("energy", 1.602176634e-19), "kwh": Unit("energy", 3.6e6),
+    "wh": Unit("energy", 3600), "erg": Unit("energy", 1e-7),
+    "w": Unit("power", 1), "kw": Unit("power", 1e3), "hp": Unit("power", 745.69987158227),
+    "kg*m/s": Unit("momentum", 1), "n*s": Unit("momentum", 1),
+    "pa": Unit("pressure", 1), "kpa": Unit("pressure", 1e3),
+    "bar": Unit("pressure", 1e5), "atm": Unit("pressure", 101325), "psi": Unit("pressure", 6894.757293168),
+    "mmhg": Unit("pressure", 133.322387415), "torr": Unit("pressure", 101325 / 760),
+    "m^3": Unit("volume", 1), "l": Unit("volume", 1e-3), "cm^3": Unit("volume", 1e-6),
+    "m^2": Unit("area", 1), "cm^2": Unit("area", 1e-4), "km^2": Unit("area", 1e6),
+    "kg/m^3": Unit("density", 1), "g/cm^3": Unit("density", 1e3), "g/ml": Unit("density", 1e3),
+    "k": Unit("temperature", 1), "c": Unit("temperature", 1, 273.15), "degc": Unit("temperature", 1, 273.15),
+    "f": Unit("temperature", 5 / 9, 273.15 - 32 * 5 / 9), "degf": Unit("temperature", 5 / 9, 273.15 - 32 * 5 / 9),
+    "mol": Unit("amount", 1),
+    "a": Unit("current", 1),
+    "v": Unit("voltage", 1), "kv": Unit("voltage", 1e3),
+    "ohm": Unit("resistance", 1), "kohm": Unit("resistance", 1e3),
+    "coulomb": Unit("charge", 1), "uc": Unit("charge", 1e-6), "nc": Unit("charge", 1e-9),
+    "hz": Unit("frequency", 1), "khz": Unit("frequency", 1e3),
+    "ghz": Unit("frequency", 1e9), "rpm": Unit("frequency", 1 / 60),
+    "rad": Unit("angle", 1), "deg": Unit("angle", 3.141592653589793 / 180),
+    "n/m": Unit("spring_constant", 1),
+    "j/(mol*k)": Unit("molar_gas_constant", 1), "n*m^2/kg^2": Unit("gravitational_constant", 1),
+    "n*m^2/c^2": Unit("coulomb_constant", 1), "j*s": Unit("action", 1),
+}
+
+SI_PREFIXES: Dict[str, float] = {"G": 1e9, "M": 1e6, "k": 1e3, "c": 1e-2, "m": 1e-3, "u": 1e-6, "n": 1e-9}
+
+# Symbols that take an SI prefix. Prefixed symbols are only read with their exact case: m (milli) and
+# M (mega) differ only by case, so mJ and MJ must never meet in the lower-cased table
+PREFIXABLE_UNITS: Dict[str, Unit] = {
+    "m": Unit("length", 1), "g": Unit("mass", 1e-3), "s": Unit("time", 1), "J": Unit("energy", 1),
+    "eV": Unit("energy", 1.602176634e-19), "W": Unit("power", 1), "N": Unit("force", 1), "Pa": Unit("pressure", 1),
+    "L": Unit("volume", 1e-3), "l": Unit("volume", 1e-3), "mol": Unit("amount", 1), "A": Unit("current", 1),
+    "V": Unit("voltage", 1), "ohm": Unit("resistance", 1), "C": Unit("charge", 1), "Hz": Unit("frequency", 1),
+}
+
+# Spellings whose meaning depends on case, checked before the lower-cased table
+CASE_SENSITIVE_UNITS: Dict[str, Unit] = {**{prefix + symbol: Unit(unit.dimension, factor * unit.factor) \
+    for prefix, factor in SI_PREFIXES.items() for symbol, unit in PREFIXABLE_UNITS.items()}, \
+        "C": Unit("charge", 1), "Nm": Unit("energy", 1), "°C": Unit("temperature", 1, 273.15), \
+            "°F": Unit("temperature", 5 / 9, 273.15 - 32 * 5 / 9)}
+
+# Lower-cased forms that could be milli or mega ("mj", or "MV" typed in capitals): refused rather than guessed
+AMBIGUOUS_UNITS = {prefix.lower() + symbol.lower() for prefix in "mM" for symbol in PREFIXABLE_UNITS}
+
+QUANTITY_PATTERN = re.compile(r"^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*(.*?)\s*$")
+
+UNIT_WORDS: Dict[str, str] = {
+    "meter": "m", "metre": "m", "kilometer": "km", "kilometre": "km", "centimeter": "cm", "centimetre": "cm",
+    "kilogram": "kg", "gram": "g", "second": "s", "sec": "s", "minute": "min", "hour": "h", "hr": "h",
+    "newton": "n", "joule": "j", "watt": "w", "pascal": "pa", "liter": "l", "litre": "l", "kelvin": "k",
+    "celsius": "degc", "fahrenheit": "degf", "ampere": "a", "amp": "a", "volt": "v", "hertz": "hz",
+    "degree": "deg", "radian": "rad", "ohms": "ohm",
+}
+
+def clean_unit(unit: str) -> str:
+    unit = unit.strip().replace("²", "^2").replace("³", "^3").replace("·", "*").replace("⋅", "*")
+    return unit.replace("Ω", "ohm").replace("µ", "u").replace("μ", "u").replace(" ", "")
+
+def normalize_unit(unit: str) -> str:
+    unit = clean_unit(unit).replace("°", "deg").lower()
+    if unit not in UNITS and unit.endswith("s") and unit[:-1] in UNIT_WORDS.keys() | UNITS.keys(): unit = unit[:-1]
+    return UNIT_WORDS.get(unit, unit)
+
+def parse_unit(unit: str, dimension: str) -> Optional[Unit]:
+    # Case-sensitive spellings win unless they have the wrong dimension ("C" is coulomb, but 25 C of
+    # temperature is Celsius). A bare number is taken to be in SI units already
+    if not unit.strip(): return None
+    exact, folded = CASE_SENSITIVE_UNITS.get(clean_unit(unit)), clean_unit(unit).lower()
+    if exact is None and folded in AMBIGUOUS_UNITS:
+        raise ValueError(f"Ambiguous unit: {unit.strip()} (write m for milli or M for mega, e.g. mJ or MJ)")
+    candidates = [exact, None if folded in AMBIGUOUS_UNITS else UNITS.get(normalize_unit(unit))]
+    known = [candidate for candidate in candidates if candidate is not None]
+    if not known: raise ValueError(f"Unknown unit: {unit}")
+    for candidate in known:
+        if candidate.dimension == dimension: return candidate
+    raise ValueError(f"Unit {unit} is a {known[0].dimension} unit, expected {dimension} " \
+        f"({SI_UNITS[dimension] or 'no unit'})")
+
+def to_si(value: float, unit: str, dimension: str) -> float:
+    parsed = parse_unit(unit, dimension)
+    return value if parsed is None else value * parsed.factor + parsed.offset
+
+def from_si(value: float, unit: str, dimension: str) -> float:
+    parsed = parse_unit(unit, dimension)
+    return value if parsed is None else (value - parsed.offset) / parsed.factor
+
+def parse_quantity(text: str) -> Tuple[float, str]:
+    # "2.5 km/h" -> (2.5, "km/h"); "3e8" -> (3e8, "")
+    match = QUANTITY_PATTERN.match(text)
+    if not match: raise ValueError(f"Could not read a number from '{text.strip()}'")
+    return float(match.group(1)), match.group(2)
@@ -1,3 +1,11 @@
+class BusyError extends Error {
+    // The server turned the question away under load (429, or a streamed error with retry_after)
+    constructor(message, retryAfter) {
+        super(message);
+        this.retryAfter = retryAfter;
+    }
+}
+
 class ChatInterface {
     constructor() {
         this.messagesArea = document.getElementById('messagesArea');
@@ -25,19 +33,86 @@ class ChatInterface {
         this.messageInput.value = '';
         this.showTypingIndicator();
         try {
-            const response = await this.sendMessage(message);
-            this.hideTypingIndicator();
-            this.addBotMessage(response);   
+            const streamed = await this.streamMessage(message);
+            if (!streamed) {
+                const response = await this.sendMessage(message);
+                this.hideTypingIndicator();
+                this.addBotMessage(response);
+            }
         } catch (error) {
             this.hideTypingIndicator();
-            this.showError('Failed to get response. Please try again.');
-            console.error('Chat error:', error);
+            if (error instanceof BusyError) {
+                // Give the question back so the student can resend it once the wait is over
+                if (!this.messageInput.value) this.messageInput.value = message;
+                this.showError(`The tutor is busy right now, please retry in ${error.retryAfter} s.`);
+            } else {
+                this.showError('Failed to get response. Please try again.');
+                console.error('Chat error:', error);
+            }
         } finally {
             this.setInputState(true);
             this.messageInput.focus();
         }
     }
     
+    async streamMessage(message) {
+        // Returns false when streaming is unavailable so the caller can fall back to /api/chat. A busy
+        // server is not a reason to fall back: that would send the same question again right away
+        if (!window.ReadableStream || !window.TextDecoder) return false;
+        const response = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                message: message,
+                student_id: this.getStudentId()
+            })
+        });
+        if (response.status === 404 || response.status === 405 || (response.ok && !response.body)) return false;
+        if (!response.ok) throw await this.responseError(response);
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let bubble = null;
+        const ensureBubble = (metadata) => {
+            if (!bubble) {
+                this.hideTypingIndicator();
+                bubble = this.startBotMessage(metadata);
+            }
+            return bubble;
+        };
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+                if (!dataLine) continue;
+                const event = JSON.parse(dataLine.slice(6));
+                if (event.type === 'route') {
+                    ensureBubble({ agent: event.agent, subject: event.subject });
+                } else if (event.type === 'text') {
+                    ensureBubble(null).messageText.textContent += event.text;
+                    this.scrollToBottom();
+                } else if (event.type === 'tool_call') {
+                    this.addStreamingTool(ensureBubble(null), event.name);
+                } else if (event.type === 'done') {
+                    this.finishBotMessage(ensureBubble(null), event);
+                } else if (event.type === 'error') {
+                    if (event.retry_after !== undefined) throw new BusyError(event.error, event.retry_after);
+                    throw new Error(event.error);
+                }
+            }
+        }
+        if (!bubble) this.hideTypingIndicator();
+        return true;
+    }
+    
     async sendMessage(message) {
         const response = await fetch('/api/chat', {
             method: 'POST',
@@ -50,14 +125,18 @@ class ChatInterface {
             })
         });
         
-        if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.detail || 'Network error');
-        }
+        if (!response.ok) throw await this.responseError(response);
         
         return await response.json();
     }
     
+    async responseError(response) {
+        const errorData = await response.json().catch(() => ({}));
+        const message = errorData.detail || 'Network error';
+        if (response.status === 429) return new BusyError(message, parseInt(response.headers.get('Retry-After'), 10) || 1);
+        return new Error(message);
+    }
+    
     addMessage(text, sender, metadata = null) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
@@ -115,6 +194,63 @@ class ChatInterface {
         });
     }
     
+    startBotMessage(metadata) {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'message bot-message';
+        
+        const avatar = document.createElement('div');
+        avatar.className = 'message-avatar';
+        avatar.innerHTML = '<i class="fas fa-robot"></i>';
+        
+        const content = document.createElement('div');
+        content.className = 'message-content';
+        
+        const messageText = document.createElement('div');
+        messageText.className = 'message-text';
+        
+        const meta = document.createElement('div');
+        meta.className = 'message-meta';
+        if (metadata) {
+            meta.innerHTML = `
+                <span class="agent-name">${this.formatAgentName(metadata.agent)}</span>
+                <span class="timestamp">${this.formatTime(new Date())}</span>
+            `;
+        }
+        
+        content.appendChild(messageText);
+        content.appendChild(meta);
+        messageDiv.appendChild(avatar);
+        messageDiv.appendChild(content);
+        
+        this.messagesArea.appendChild(messageDiv);
+        this.scrollToBottom();
+        return { content, messageText, meta, tools: [] };
+    }
+    
+    addStreamingTool(bubble, toolName) {
+        if (bubble.tools.includes(toolName)) return;
+        bubble.tools.push(toolName);
+        if (!bubble.toolsDiv) {
+            bubble.toolsDiv = document.createElement('div');
+            bubble.toolsDiv.className = 'tools-used';
+            bubble.content.insertBefore(bubble.toolsDiv, bubble.messageText);
+        }
+        bubble.toolsDiv.innerHTML = `
+            <i class="fas fa-tools"></i> 
+            Tools used: ${bubble.tools.join(', ')}
+        `;
+    }
+    
+    finishBotMessage(bubble, response) {
+        if (!bubble.messageText.textContent) bubble.messageText.textContent = response.response;
+        bubble.meta.innerHTML = `
+            <span class="agent-name">${this.formatAgentName(response.agent)}</span>
+            <span class="timestamp">${this.formatTime(new Date())}</span>
+        `;
+        (response.tools_used || []).forEach(toolName => this.addStreamingTool(bubble, toolName));
+        this.scrollToBottom();
+    }
+    
     showTypingIndicator() {
         this.typingIndicator.style.display = 'flex';
         this.scrollToBottom();